@@ -4,6 +4,7 @@ sys.path.insert(0, 'backend')
 
 from backend.app import create_app
 from backend.database.models import db, InferenceEngine
+from backend.services.config_cache import notify_config_changed
 
 app = create_app()
 
@@ -52,11 +53,12 @@ with app.app_context():
         selected = engines[index]
         selected.activo = True
         db.session.commit()
+        notify_config_changed()
         
         print(f"\n✅ Motor activado exitosamente:")
         print(f"   {selected.tipo} v{selected.version}")
         print(f"   Archivo: {selected.ruta_archivo}")
-        print("\n⚠️  REINICIA EL SERVIDOR FLASK para que cargue el modelo")
+        print("\nℹ️  Los workers en ejecución cargarán el nuevo motor automáticamente")
         
     except ValueError:
         print("❌ Entrada inválida")
@@ -4,20 +4,34 @@ Versión final con estructura de paquete para importaciones robustas.
 """
 
 import os
-from flask import Flask, jsonify, send_from_directory, render_template, abort, request
+from flask import Flask, jsonify, render_template, abort, request
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_migrate import Migrate
 from dotenv import load_dotenv
 
+# Cargar variables de entorno antes de importar la configuración: las clases
+# de config.py leen el entorno (DATABASE_URL, DB_POOL_*, ...) al importarse
+load_dotenv()
+
 # --- CAMBIO CRÍTICO: IMPORTACIONES RELATIVAS ---
 # Ahora que 'backend' es un paquete, usamos el punto '.' para indicar
 # que importamos desde el mismo paquete.
 from .config import config
 from .database.models import db
-
-# Cargar variables de entorno
-load_dotenv()
+from .database.engine import register_sqlite_pragmas
+from .services.jobs import job_runner
+from .services.assets import asset_manifest, assets_cli
+from .services.audit import audit_writer
+from .services.compression import init_compression
+from .services.json_provider import FastJSONProvider
+from .services.log_pipeline import log_pipeline
+from .services.startup import StartupTimer, startup_report_command
+from .vision.executor import inference_executor
+from .vision.manager import detector_manager, cascade_manager
+from .vision.preview import preview_hub
+from .vision.result_cache import frame_result_cache
+from .vision.resources import cpu_resources
 
 # --- Inicialización de Extensiones Globales ---
 jwt = JWTManager()
@@ -31,6 +45,7 @@ def create_app(config_name=None):
     if config_name is None:
         config_name = os.getenv('FLASK_ENV', 'development')
 
+    timer = StartupTimer()
     app = Flask(
         __name__,
         # Las rutas son relativas a la carpeta 'backend' donde vive este archivo.
@@ -39,33 +54,33 @@ def create_app(config_name=None):
     )
     
     app.config.from_object(config[config_name])
+    app.extensions['startup'] = timer
+    # JSON rápido (orjson si está instalado) y con soporte de NumPy en jsonify()
+    app.json = FastJSONProvider(app)
 
     # ============================================================
     # INICIALIZAR EXTENSIONES CON LA APP
     # ============================================================
-    db.init_app(app)
-    jwt.init_app(app)
-    CORS(app, resources={r"/api/*": {"origins": "*"}})
-    # Pasamos 'db' y el directorio de migraciones a Migrate
-    # El path 'migrations' es relativo a la raíz del proyecto.
-    migrate.init_app(app, db, directory=os.path.join(os.path.dirname(app.root_path), 'migrations'))
-
+    with timer.phase('extensions'):
+        _init_extensions(app)
 
     # ============================================================
     # REGISTRAR BLUEPRINTS (RUTAS DE LA API)
     # ============================================================
-    # --- CAMBIO CRÍTICO: IMPORTACIONES RELATIVAS ---
-    from .routes.auth import auth_bp
-    from .routes.detection import detection_bp
-    from .routes.dashboard import dashboard_bp
-    from .routes.history import history_bp
-    from .routes.admin import admin_bp
+    with timer.phase('blueprints'):
+        _register_blueprints(app)
 
-    app.register_blueprint(auth_bp, url_prefix='/api/auth')
-    app.register_blueprint(detection_bp, url_prefix='/api/detection')
-    app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
-    app.register_blueprint(history_bp, url_prefix='/api/history')
-    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    # ============================================================
+    # COMANDOS CLI (flask retention ..., flask assets ..., flask loadtest, flask startup-report, flask memory-report)
+    # ============================================================
+    from .services.retention import retention_cli
+    app.cli.add_command(retention_cli)
+    app.cli.add_command(startup_report_command)
+    app.cli.add_command(assets_cli)
+    from .services.loadtest import loadtest_command
+    app.cli.add_command(loadtest_command)
+    from .services.memory import memory_report_command
+    app.cli.add_command(memory_report_command)
 
     # ============================================================
     # MANEJADORES DE ERRORES PERSONALIZADOS
@@ -106,14 +121,82 @@ def create_app(config_name=None):
         }
         if path in spa_routes:
             return render_template(spa_routes[path])
-        if path != "" and os.path.exists(os.path.join(app.static_folder, path)):
-            return send_from_directory(app.static_folder, path)
+        if path != "" and asset_manifest.has_static(path):
+            return asset_manifest.serve_static(path)
         if '.' in path:
             abort(404)
         return render_template('index.html')
 
     return app
 
+
+def _init_extensions(app):
+    """Inicializa base de datos, JWT, CORS, migraciones y recursos de inferencia"""
+    # Logging por cola + hilo de fondo (antes que nada que pueda registrar)
+    log_pipeline.init_app(app)
+    db.init_app(app)
+    # Auditoría de administración: se escribe en lotes desde un hilo de fondo
+    audit_writer.init_app(app)
+    with app.app_context():
+        register_sqlite_pragmas(
+            db.engine,
+            busy_timeout_ms=app.config.get('SQLITE_BUSY_TIMEOUT_MS', 5000),
+            mmap_size=app.config.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)
+        )
+    jwt.init_app(app)
+    CORS(app, resources={r"/api/*": {"origins": "*"}})
+    # Pasamos 'db' y el directorio de migraciones a Migrate
+    # El path 'migrations' es relativo a la raíz del proyecto.
+    migrate.init_app(app, db, directory=os.path.join(os.path.dirname(app.root_path), 'migrations'))
+    # Pool local de trabajos en segundo plano (se crea al primer uso, tras el fork)
+    job_runner.init_app(app)
+    # gzip/brotli negociado para respuestas de texto/JSON grandes
+    init_compression(app)
+    # Manifest de assets con hash (flask assets build) y helper asset_url()
+    asset_manifest.init_app(app)
+    inference_executor.configure(app.config['INFERENCE_THREADS'])
+    frame_result_cache.configure(app.config['FRAME_CACHE_SIZE'])
+    preview_hub.configure(
+        app.config['PREVIEW_FOLDER'],
+        max_width=app.config['PREVIEW_MAX_WIDTH'],
+        quality=app.config['PREVIEW_JPEG_QUALITY'],
+        fps=app.config['PREVIEW_FPS'],
+        stream_seconds=app.config['PREVIEW_STREAM_SECONDS']
+    )
+    for manager in (detector_manager, cascade_manager):
+        manager.configure(
+            upload_folder=app.config['UPLOAD_FOLDER'],
+            stub=app.config['INFERENCE_STUB'],
+            stub_latency_ms=app.config['INFERENCE_STUB_LATENCY_MS']
+        )
+    # Hilos de torch/OpenCV y afinidad de núcleos para este worker. Sin
+    # WORKER_INDEX la app se crea fuera de un worker (master con preload_app):
+    # no se fija afinidad, o los hijos heredarían solo el tramo del worker 0
+    cpu_resources.configure(
+        workers=app.config['WORKER_COUNT'],
+        worker_index=int(os.getenv('WORKER_INDEX', 0)),
+        torch_threads=app.config['TORCH_THREADS'],
+        interop_threads=app.config['TORCH_INTEROP_THREADS'],
+        pin=app.config['CPU_PINNING'] and 'WORKER_INDEX' in os.environ
+    )
+
+
+def _register_blueprints(app):
+    """Registra los blueprints de la API"""
+    # --- CAMBIO CRÍTICO: IMPORTACIONES RELATIVAS ---
+    from .routes.auth import auth_bp
+    from .routes.detection import detection_bp
+    from .routes.dashboard import dashboard_bp
+    from .routes.history import history_bp
+    from .routes.admin import admin_bp
+
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(detection_bp, url_prefix='/api/detection')
+    app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
+    app.register_blueprint(history_bp, url_prefix='/api/history')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+
+
 # ============================================================
 # PUNTO DE ENTRADA (SOLO PARA EJECUCIÓN DIRECTA)
 # ============================================================
@@ -1,31 +1,135 @@
 import os
 from datetime import timedelta
 
+
+def _database_uri():
+    """DATABASE_URL si está definida; si no, SQLite local para desarrollo"""
+    url = os.getenv('DATABASE_URL')
+    if not url:
+        db_path = os.path.join(os.path.dirname(__file__), 'tornillo_dev.db')
+        return f'sqlite:///{db_path}'
+    # Heroku y otros proveedores aún usan el esquema antiguo 'postgres://'
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def _engine_options(uri):
+    """Opciones del pool de conexiones según el motor de base de datos"""
+    if uri.startswith('sqlite'):
+        # SQLite: el bloqueo lo gestiona busy_timeout (ver database/engine.py)
+        return {
+            'connect_args': {'timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000)) / 1000}
+        }
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes'),
+    }
+
+
 class Config:
     """Configuración base"""
     FLASK_ENV = os.getenv('FLASK_ENV', 'development')
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     
-    # Base de datos - usar ruta relativa
-    db_path = os.path.join(os.path.dirname(__file__), 'tornillo_dev.db')
-    SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+    # Base de datos - DATABASE_URL (PostgreSQL en Docker) o SQLite local
+    SQLALCHEMY_DATABASE_URI = _database_uri()
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # SQLite: PRAGMAs aplicados en cada conexión
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    
     # JWT
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     
-    # YOLO
-    YOLO_MODEL_PATH = os.getenv('YOLO_MODEL_PATH', 'models/yolo_model.pt')
-    YOLO_CONFIDENCE = float(os.getenv('YOLO_CONFIDENCE', 0.5))
+    # Hilos nativos para la inferencia con workers gevent
+    INFERENCE_THREADS = int(os.getenv('INFERENCE_THREADS', 1))
+    
+    # Reparto de CPU por worker (0 = núcleos disponibles / workers)
+    WORKER_COUNT = int(os.getenv('GUNICORN_WORKERS', 1))
+    TORCH_THREADS = int(os.getenv('TORCH_THREADS', 0))
+    TORCH_INTEROP_THREADS = int(os.getenv('TORCH_INTEROP_THREADS', 1))
+    CPU_PINNING = os.getenv('CPU_PINNING', 'false').lower() in ('1', 'true', 'yes')
+    # Detector simulado en lugar del modelo real (pruebas de carga / CI sin pesos)
+    INFERENCE_STUB = os.getenv('INFERENCE_STUB', 'false').lower() in ('1', 'true', 'yes')
+    INFERENCE_STUB_LATENCY_MS = float(os.getenv('INFERENCE_STUB_LATENCY_MS', 20))
+    # Precarga en el master de gunicorn (GUNICORN_PRELOAD, ver vision/preload.py)
+    PRELOAD_SHARE_MEMORY = os.getenv('PRELOAD_SHARE_MEMORY', 'false').lower() in ('1', 'true', 'yes')
+    # Resultados cacheados por hash del JPEG (frames repetidos); 0 = sin caché
+    FRAME_CACHE_SIZE = int(os.getenv('FRAME_CACHE_SIZE', 64))
     
     # Cámara
     CAMERA_INDEX = int(os.getenv('CAMERA_INDEX', 0))
     FRAME_RATE = int(os.getenv('FRAME_RATE', 30))
     
     # Rutas
-    UPLOAD_FOLDER = 'uploads'
+    # Misma carpeta desde la que el detector carga los modelos (backend/uploads)
+    UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', os.path.join(os.path.dirname(__file__), 'uploads'))
     MAX_CONTENT_LENGTH = 200 * 1024 * 1024  # 200 MB para archivos .pt de modelos YOLO
+    
+    # Versión de configuración compartida entre workers (caché de config)
+    CONFIG_VERSION_FILE = os.getenv(
+        'CONFIG_VERSION_FILE',
+        os.path.join(os.path.dirname(__file__), 'uploads', '.config_version')
+    )
+    CONFIG_VERSION_CHECK_MS = int(os.getenv('CONFIG_VERSION_CHECK_MS', 500))
+    
+    # Trabajos en segundo plano (pool local por worker)
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+    JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', 600))
+    EXPORT_FOLDER = os.getenv('EXPORT_FOLDER', os.path.join(os.path.dirname(__file__), 'exports'))
+    
+    # Retención de detecciones (0 = deshabilitado)
+    DETECTION_RETENTION_DAYS = int(os.getenv('DETECTION_RETENTION_DAYS', 0))
+    DETECTION_ARCHIVE_FOLDER = os.getenv(
+        'DETECTION_ARCHIVE_FOLDER',
+        os.path.join(os.path.dirname(__file__), 'archive', 'detections')
+    )
+    
+    # Vista previa anotada (MJPEG) de las estaciones, compartida entre workers
+    PREVIEW_FOLDER = os.getenv('PREVIEW_FOLDER', os.path.join(os.path.dirname(__file__), 'uploads', '.preview'))
+    PREVIEW_MAX_WIDTH = int(os.getenv('PREVIEW_MAX_WIDTH', 960))
+    PREVIEW_JPEG_QUALITY = int(os.getenv('PREVIEW_JPEG_QUALITY', 75))
+    PREVIEW_FPS = int(os.getenv('PREVIEW_FPS', 5))
+    PREVIEW_STREAM_SECONDS = int(os.getenv('PREVIEW_STREAM_SECONDS', 60))
+    PREVIEW_URL_TTL = int(os.getenv('PREVIEW_URL_TTL', 3600))
+    
+    # Logging no bloqueante (services/log_pipeline.py): cola en memoria + hilo de fondo
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_FOLDER = os.getenv('LOG_FOLDER', os.path.join(os.path.dirname(__file__), 'logs'))
+    LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+    LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+    LOG_STDOUT = os.getenv('LOG_STDOUT', 'true').lower() in ('1', 'true', 'yes')
+    LOG_DRAIN_MS = int(os.getenv('LOG_DRAIN_MS', 250))
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+    # Registros que además se guardan en system_logs, en lotes
+    LOG_DB_LEVEL = os.getenv('LOG_DB_LEVEL', 'WARNING').upper()
+    LOG_DB_FLUSH_SECONDS = float(os.getenv('LOG_DB_FLUSH_SECONDS', 2))
+    LOG_DB_BATCH_SIZE = int(os.getenv('LOG_DB_BATCH_SIZE', 100))
+    # Errores repetidos: ráfaga por ventana y luego 1 de cada LOG_RATE_SAMPLE
+    LOG_RATE_WINDOW = int(os.getenv('LOG_RATE_WINDOW', 60))
+    LOG_RATE_BURST = int(os.getenv('LOG_RATE_BURST', 5))
+    LOG_RATE_SAMPLE = int(os.getenv('LOG_RATE_SAMPLE', 100))
+    
+    # Auditoría de administración (services/audit.py): cola + inserciones en lote
+    AUDIT_FLUSH_SECONDS = float(os.getenv('AUDIT_FLUSH_SECONDS', 1))
+    AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', 100))
+    AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', 10000))
+    AUDIT_FALLBACK_FILE = os.getenv(
+        'AUDIT_FALLBACK_FILE',
+        os.path.join(os.path.dirname(__file__), 'logs', 'audit_fallback.jsonl')
+    )
+    
+    # Compresión de respuestas (bytes mínimos, nivel gzip y calidad brotli)
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 5))
 
 
 class DevelopmentConfig(Config):
@@ -45,6 +149,7 @@ class TestingConfig(Config):
     DEBUG = True
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_ENGINE_OPTIONS = {}
 
 
 config = {
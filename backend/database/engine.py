@@ -0,0 +1,50 @@
+"""
+Ajustes del engine de SQLAlchemy
+Para SQLite activa WAL (lectores y escritor concurrentes entre workers de
+gunicorn), synchronous=NORMAL, busy_timeout y E/S mapeada en memoria.
+"""
+
+from sqlalchemy import event
+
+
+def register_sqlite_pragmas(engine, busy_timeout_ms=5000, mmap_size=256 * 1024 * 1024):
+    """Registra un listener que aplica los PRAGMAs en cada conexión nueva"""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout_ms)}')
+        cursor.execute(f'PRAGMA mmap_size={int(mmap_size)}')
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.close()
+
+
+def create_background_engine(config):
+    """
+    Engine sin pool para los hilos de fondo (logs, auditoría): no comparte
+    conexiones ni locks con el pool de la app, que puede estar parcheado por gevent
+    """
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import NullPool
+
+    options = config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+    engine = create_engine(
+        config['SQLALCHEMY_DATABASE_URI'],
+        poolclass=NullPool,
+        connect_args=options.get('connect_args', {})
+    )
+    register_sqlite_pragmas(
+        engine,
+        busy_timeout_ms=config.get('SQLITE_BUSY_TIMEOUT_MS', 5000),
+        mmap_size=config.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)
+    )
+    return engine
+
+
+def is_memory_database(uri):
+    """Una BD SQLite en memoria no es visible desde otra conexión"""
+    return ':memory:' in uri or uri.rstrip('/') == 'sqlite:'
@@ -87,7 +87,7 @@ class InferenceEngine(db.Model):
     
     # Relaciones
     creado_por = db.relationship('User', back_populates='modelos_cargados')
-    ac_models = db.relationship('ACModel', back_populates='motor_inferencia')
+    ac_models = db.relationship('ACModel', back_populates='motor_inferencia', foreign_keys='ACModel.motor_inferencia_id')
     detections = db.relationship('Detection', back_populates='motor_inferencia')
     
     def __repr__(self):
@@ -130,8 +130,29 @@ class ACModel(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Cascada: el motor activo procesa cada frame y este motor (más pesado)
+    # solo los ambiguos (conteo cerca del objetivo o confianzas en la banda)
+    cascada_activa = db.Column(db.Boolean, default=False)
+    motor_cascada_id = db.Column(db.Integer, db.ForeignKey('inference_engines.id'), nullable=True)
+    cascada_modo = db.Column(db.String(20), default='frame')  # frame | regions
+    cascada_margen = db.Column(db.Integer, default=1)  # |conteo - objetivo| que se considera ambiguo
+    cascada_conf_min = db.Column(db.Float, default=0.25)  # Banda de confianza ambigua [min, max)
+    cascada_conf_max = db.Column(db.Float, default=0.6)
+    
+    # Salida anticipada: cerrar el ciclo como PASS cuando el objetivo se
+    # confirma en N frames consecutivos (evaluado en el servidor)
+    salida_anticipada_activa = db.Column(db.Boolean, default=False)
+    salida_anticipada_frames = db.Column(db.Integer, default=5)
+    salida_anticipada_conf_min = db.Column(db.Float, nullable=True)  # None = confidence_threshold
+    
+    # Plantilla de posiciones: JSON [[x, y], ...] normalizado a [0, 1]. Con
+    # plantilla el resultado se evalúa por posición y no solo por conteo
+    plantilla_posiciones = db.Column(db.Text, nullable=True)
+    plantilla_tolerancia = db.Column(db.Float, nullable=True)  # None = vision.template.DEFAULT_TOLERANCE
+    
     # Relaciones
-    motor_inferencia = db.relationship('InferenceEngine', back_populates='ac_models')
+    motor_inferencia = db.relationship('InferenceEngine', back_populates='ac_models', foreign_keys=[motor_inferencia_id])
+    motor_cascada = db.relationship('InferenceEngine', foreign_keys=[motor_cascada_id])
     creado_por = db.relationship('User', back_populates='ac_models_creados')
     detections = db.relationship('Detection', back_populates='ac_model')
     
@@ -149,6 +170,17 @@ class ACModel(db.Model):
             'inspection_cycle_time': self.inspection_cycle_time,
             'motor_inferencia_id': self.motor_inferencia_id,
             'activo': self.activo,
+            'cascada_activa': bool(self.cascada_activa),
+            'motor_cascada_id': self.motor_cascada_id,
+            'cascada_modo': self.cascada_modo or 'frame',
+            'cascada_margen': self.cascada_margen if self.cascada_margen is not None else 1,
+            'cascada_conf_min': self.cascada_conf_min if self.cascada_conf_min is not None else 0.25,
+            'cascada_conf_max': self.cascada_conf_max if self.cascada_conf_max is not None else 0.6,
+            'salida_anticipada_activa': bool(self.salida_anticipada_activa),
+            'salida_anticipada_frames': self.salida_anticipada_frames or 5,
+            'salida_anticipada_conf_min': self.salida_anticipada_conf_min,
+            'plantilla': json.loads(self.plantilla_posiciones) if self.plantilla_posiciones else None,
+            'plantilla_tolerancia': self.plantilla_tolerancia,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
@@ -164,7 +196,13 @@ class Detection(db.Model):
     Incluye métricas para análisis y auditoría
     """
     __tablename__ = 'detections'
+    __table_args__ = (
+        # Índices compuestos para la paginación por cursor del histórico
+        db.Index('ix_detections_team_timestamp', 'team', 'timestamp', 'id'),
+        db.Index('ix_detections_user_id_timestamp', 'user_id', 'timestamp', 'id'),
+    )
     
+    # Con 'flask retention partition-postgres' la PK real es (id, timestamp)
     id = db.Column(db.Integer, primary_key=True)
     ac_model_id = db.Column(db.Integer, db.ForeignKey('ac_models.id'), nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
@@ -177,6 +215,8 @@ class Detection(db.Model):
     diferencia = db.Column(db.Integer, default=0)  # expected - detection
     image_path = db.Column(db.String(255), nullable=True)  # Path a screenshot
     duracion_inferencia = db.Column(db.Float, default=0.0)  # ms
+    tiempo_salida_anticipada = db.Column(db.Float, nullable=True)  # s desde el inicio del ciclo (None = ciclo completo)
+    posiciones = db.Column(db.String(255), nullable=True)  # '1'/'0' por posición de la plantilla (None = sin plantilla)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     # Relaciones
@@ -199,10 +239,41 @@ class Detection(db.Model):
             'expected_count': self.expected_count,
             'diferencia': self.diferencia,
             'duracion_inferencia': self.duracion_inferencia,
+            'tiempo_salida_anticipada': self.tiempo_salida_anticipada,
+            'posiciones': self.posiciones,
             'timestamp': self.timestamp.isoformat()
         }
 
 
+# ============================================================
+# MODELO: DetectionRollup (Agregados diarios de detecciones archivadas)
+# ============================================================
+
+class DetectionRollup(db.Model):
+    """
+    Resumen diario de las detecciones que se movieron al archivo frío.
+    Permite que el dashboard siga mostrando totales históricos aunque las
+    filas ya no estén en la tabla 'detections'.
+    """
+    __tablename__ = 'detection_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'team', 'user_id', 'ac_model_id', 'status', name='uq_detection_rollups_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    team = db.Column(db.String(80), nullable=False, index=True)
+    user_id = db.Column(db.Integer, nullable=True, index=True)  # Sin FK: el usuario puede eliminarse
+    ac_model_id = db.Column(db.Integer, nullable=True)
+    status = db.Column(db.String(20), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    sum_confidence = db.Column(db.Float, nullable=False, default=0.0)
+    sum_duracion_inferencia = db.Column(db.Float, nullable=False, default=0.0)
+    
+    def __repr__(self):
+        return f'<DetectionRollup {self.day} {self.team} {self.status}>'
+
+
 # ============================================================
 # MODELO: EquipmentMetrics (Métricas por Equipo)
 # ============================================================
@@ -290,7 +361,8 @@ class AuditLog(db.Model):
     __tablename__ = 'audit_logs'
     
     id = db.Column(db.Integer, primary_key=True)
-    usuario_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    # NULL si el usuario se eliminó: la entrada de auditoría se conserva
+    usuario_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'), nullable=True, index=True)
     accion = db.Column(db.String(120), nullable=False, index=True)
     descripcion = db.Column(db.Text, default='')
     tabla_afectada = db.Column(db.String(50), nullable=False, index=True)
@@ -311,6 +383,61 @@ class AuditLog(db.Model):
             'accion': self.accion,
             'descripcion': self.descripcion,
             'tabla_afectada': self.tabla_afectada,
+            'registro_id': self.registro_id,
             'fecha': self.fecha.isoformat(),
-            'ip_address': self.ip_address
-        }
\ No newline at end of file
+            'ip_address': self.ip_address,
+            'detalles_anteriores': json.loads(self.detalles_anteriores) if self.detalles_anteriores else None,
+            'detalles_nuevos': json.loads(self.detalles_nuevos) if self.detalles_nuevos else None
+        }
+
+
+# ============================================================
+# MODELO: BackgroundJob (Trabajos en segundo plano)
+# ============================================================
+
+class BackgroundJob(db.Model):
+    """
+    Trabajo largo (exportaciones, archivo, carga de modelos) ejecutado fuera
+    del ciclo de la petición por el pool local de services/jobs.py
+    
+    Estados: queued, running, succeeded, failed, cancelled
+    """
+    __tablename__ = 'background_jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(80), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)
+    params = db.Column(db.Text, default='{}')  # JSON
+    result = db.Column(db.Text, nullable=True)  # JSON
+    error = db.Column(db.Text, nullable=True)
+    progress = db.Column(db.Float, default=0.0)  # 0..100
+    message = db.Column(db.String(255), default='')
+    cancel_requested = db.Column(db.Boolean, default=False)
+    worker = db.Column(db.String(120), nullable=True)  # host:pid que lo ejecuta
+    creado_por_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<BackgroundJob {self.id} {self.tipo} ({self.status})>'
+    
+    def to_dict(self):
+        """Convertir a diccionario"""
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'status': self.status,
+            'params': json.loads(self.params or '{}'),
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'progress': round(self.progress or 0.0, 1),
+            'message': self.message,
+            'cancel_requested': self.cancel_requested,
+            'worker': self.worker,
+            'creado_por_id': self.creado_por_id,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -0,0 +1,85 @@
+"""
+Paginación por cursor (keyset) para las consultas de histórico
+Evita OFFSET y el COUNT(*) por página: cada página cuesta lo mismo sin
+importar cuán atrás se navegue, siempre que exista un índice compuesto
+que cubra (filtro, timestamp, id).
+"""
+
+import base64
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+class InvalidCursorError(ValueError):
+    """El cursor recibido no pudo decodificarse"""
+
+
+def encode_cursor(timestamp, row_id):
+    """Codifica (timestamp, id) en un cursor opaco apto para URLs"""
+    raw = f"{timestamp.isoformat()}|{row_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decodifica un cursor generado por encode_cursor()"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8')
+        timestamp_str, row_id = raw.split('|', 1)
+        return datetime.fromisoformat(timestamp_str), int(row_id)
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursorError(f"Cursor inválido: {cursor}") from e
+
+
+def keyset_paginate(query, timestamp_col, id_col, per_page, cursor=None):
+    """
+    Devuelve (items, next_cursor) ordenando por (timestamp DESC, id DESC).
+
+    Se pide una fila extra para saber si existe una página siguiente sin
+    tener que contar el total.
+    """
+    if cursor:
+        last_ts, last_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            timestamp_col < last_ts,
+            and_(timestamp_col == last_ts, id_col < last_id)
+        ))
+
+    rows = query.order_by(timestamp_col.desc(), id_col.desc()).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.timestamp, last.id)
+
+    return rows, next_cursor
+
+
+# ============================================================
+# TOTAL APROXIMADO (COUNT cacheado en memoria del worker)
+# ============================================================
+
+_count_cache = {}
+_count_lock = threading.Lock()
+
+
+def cached_count(key, query, ttl=30):
+    """
+    Devuelve el COUNT(*) de la consulta, reutilizando el valor durante `ttl`
+    segundos. El total es aproximado: puede quedar desfasado hasta `ttl`.
+    """
+    now = time.monotonic()
+    with _count_lock:
+        entry = _count_cache.get(key)
+        if entry and now - entry[1] < ttl:
+            return entry[0]
+
+    total = query.order_by(None).count()
+
+    with _count_lock:
+        _count_cache[key] = (total, now)
+    return total
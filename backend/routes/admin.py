@@ -3,18 +3,27 @@ Rutas de Administración - Panel de Configuración
 VERSIÓN FINAL, REESTRUCTURADA Y PROFESIONAL
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, send_from_directory
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from werkzeug.security import generate_password_hash
 from werkzeug.utils import secure_filename
 import os
+import json
+import logging
 from datetime import datetime
 from functools import wraps
 
-from ..database.models import db, User, ACModel, InferenceEngine, Detection, AuditLog, Settings
-from ..config import DevelopmentConfig
+from ..database.models import db, User, ACModel, InferenceEngine, Detection, AuditLog, Settings, BackgroundJob
+from ..services.jobs import job_runner, registered_job_types, request_cancel, mark_stale_jobs
+from ..services.uploads import (
+    CHUNK_SIZE, UploadError, UploadOffsetMismatch, stream_multipart_upload, publish_file,
+    create_upload, get_upload, append_chunk, finish_upload, discard_upload
+)
+from ..services.config_cache import config_cache, notify_config_changed
+from ..services.audit import audited, audit_writer
 
 admin_bp = Blueprint('admin', __name__)
+logger = logging.getLogger(__name__)
 
 # ============================================================
 # DECORADORES DE PERMISOS
@@ -54,6 +63,7 @@ def config_access_required(f):
 
 @admin_bp.route('/users', methods=['GET', 'POST'])
 @config_access_required
+@audited(User)
 def handle_users(current_user_id, current_user_role):
     if request.method == 'GET':
         users = User.query.order_by(User.username).all()
@@ -79,6 +89,7 @@ def handle_users(current_user_id, current_user_role):
 
 @admin_bp.route('/users/<int:user_id>', methods=['PUT'])
 @config_access_required
+@audited(User, 'user_id')
 def update_user(current_user_id, current_user_role, user_id):
     user = User.query.get_or_404(user_id)
     data = request.get_json()
@@ -92,6 +103,7 @@ def update_user(current_user_id, current_user_role, user_id):
 
 @admin_bp.route('/users/<int:user_id>/toggle-status', methods=['POST'])
 @config_access_required
+@audited(User, 'user_id', accion='users.toggle_status')
 def toggle_user_status(current_user_id, current_user_role, user_id):
     """Activa o desactiva un usuario (soft delete)."""
     user = User.query.get_or_404(user_id)
@@ -109,6 +121,7 @@ def toggle_user_status(current_user_id, current_user_role, user_id):
 # Añade esta nueva función para la eliminación permanente
 @admin_bp.route('/users/<int:user_id>', methods=['DELETE'])
 @config_access_required
+@audited(User, 'user_id')
 def delete_user(current_user_id, current_user_role, user_id):
     """Elimina un usuario permanentemente de la base de datos."""
     user = User.query.get_or_404(user_id)
@@ -126,8 +139,98 @@ def delete_user(current_user_id, current_user_role, user_id):
 # RUTAS: GESTIÓN DE MODELOS DE AA (REESTRUCTURADO)
 # ============================================================
 
+CASCADE_FIELDS = ['cascada_activa', 'motor_cascada_id', 'cascada_modo', 'cascada_margen', 'cascada_conf_min', 'cascada_conf_max']
+EARLY_EXIT_FIELDS = ['salida_anticipada_activa', 'salida_anticipada_frames', 'salida_anticipada_conf_min']
+
+
+def _coerce_number(value, cast):
+    """int/float a partir de un número o texto numérico; ValueError si no lo es"""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(value)
+    number = float(value)
+    if cast is int:
+        if not number.is_integer():
+            raise ValueError(value)
+        return int(number)
+    return number
+
+
+def _coerce_fields(data, fields):
+    """
+    Convierte en `data` los campos presentes al tipo indicado ({campo:
+    (tipo, admite None)}). Devuelve un mensaje de error o None.
+    """
+    for field, (cast, nullable) in fields.items():
+        if field not in data:
+            continue
+        value = data[field]
+        if value is None:
+            if not nullable:
+                return f'{field} es obligatorio'
+            continue
+        if cast is bool:
+            if not isinstance(value, bool):
+                return f'{field} debe ser true o false'
+            continue
+        try:
+            data[field] = _coerce_number(value, cast)
+        except ValueError:
+            return f'{field} debe ser numérico'
+    return None
+
+
+CASCADE_TYPES = {
+    'cascada_activa': (bool, False),
+    'motor_cascada_id': (int, True),
+    'cascada_margen': (int, False),
+    'cascada_conf_min': (float, False),
+    'cascada_conf_max': (float, False),
+}
+EARLY_EXIT_TYPES = {
+    'salida_anticipada_activa': (bool, False),
+    'salida_anticipada_frames': (int, False),
+    'salida_anticipada_conf_min': (float, True),
+}
+
+
+def _validate_cascade_fields(data, model=None):
+    """
+    Normaliza los tipos y devuelve un mensaje de error o None si la cascada y
+    la salida anticipada son válidas. En una edición (model) los campos que
+    no llegan se toman del modelo guardado.
+    """
+    current = model.to_dict() if model is not None else {}
+    error = _coerce_fields(data, CASCADE_TYPES) or _coerce_fields(data, EARLY_EXIT_TYPES)
+    if error:
+        return error
+    if data.get('cascada_modo', 'frame') not in ('frame', 'regions'):
+        return "cascada_modo debe ser 'frame' o 'regions'"
+    engine_id = data.get('motor_cascada_id')
+    if engine_id is not None and db.session.get(InferenceEngine, engine_id) is None:
+        return f'No existe el motor de cascada {engine_id}'
+    if data.get('cascada_margen', 0) < 0:
+        return 'cascada_margen no puede ser negativo'
+    conf_min = data.get('cascada_conf_min', current.get('cascada_conf_min', 0.25))
+    conf_max = data.get('cascada_conf_max', current.get('cascada_conf_max', 0.6))
+    if not 0.0 <= conf_min < conf_max <= 1.0:
+        return 'La banda de confianza de la cascada debe cumplir 0 <= min < max <= 1'
+    if data.get('salida_anticipada_frames', 1) < 1:
+        return 'salida_anticipada_frames debe ser al menos 1'
+    exit_conf = data.get('salida_anticipada_conf_min')
+    if exit_conf is not None and not 0.0 <= exit_conf <= 1.0:
+        return 'salida_anticipada_conf_min debe estar entre 0 y 1'
+    return None
+
+
+def _apply_cascade_fields(model, data):
+    for field in CASCADE_FIELDS + EARLY_EXIT_FIELDS:
+        if field in data:
+            setattr(model, field, data[field])
+
+
 @admin_bp.route('/ac-models', methods=['GET', 'POST'])
 @config_access_required
+@audited(ACModel)
 def handle_ac_models(current_user_id, current_user_role):
     if request.method == 'GET':
         models = ACModel.query.order_by(ACModel.nombre).all()
@@ -138,6 +241,10 @@ def handle_ac_models(current_user_id, current_user_role):
         if not all(k in data for k in ['nombre', 'motor_inferencia_id', 'target_tornillos']):
             return jsonify(success=False, message='Faltan datos requeridos'), 400
         
+        error = _validate_cascade_fields(data)
+        if error:
+            return jsonify(success=False, error=error), 400
+        
         new_model = ACModel(
             nombre=data['nombre'], descripcion=data.get('descripcion', ''),
             target_tornillos=data['target_tornillos'],
@@ -146,24 +253,32 @@ def handle_ac_models(current_user_id, current_user_role):
             motor_inferencia_id=data['motor_inferencia_id'],
             creado_por_id=current_user_id
         )
+        _apply_cascade_fields(new_model, data)
         db.session.add(new_model)
         db.session.commit()
+        notify_config_changed()
         return jsonify(success=True, message='Modelo de AA creado', data=new_model.to_dict()), 201
 
 @admin_bp.route('/ac-models/<int:model_id>', methods=['PUT', 'DELETE'])
 @config_access_required
+@audited(ACModel, 'model_id')
 def handle_single_ac_model(current_user_id, current_user_role, model_id):
     model = ACModel.query.get_or_404(model_id)
 
     if request.method == 'PUT':
         data = request.get_json()
+        error = _validate_cascade_fields(data, model)
+        if error:
+            return jsonify(success=False, error=error), 400
         model.nombre = data.get('nombre', model.nombre)
         model.descripcion = data.get('descripcion', model.descripcion)
         model.target_tornillos = data.get('target_tornillos', model.target_tornillos)
         model.confidence_threshold = data.get('confidence_threshold', model.confidence_threshold)
         model.inspection_cycle_time = data.get('inspection_cycle_time', model.inspection_cycle_time)
         model.motor_inferencia_id = data.get('motor_inferencia_id', model.motor_inferencia_id)
+        _apply_cascade_fields(model, data)
         db.session.commit()
+        notify_config_changed()
         return jsonify(success=True, message='Modelo AA actualizado', data=model.to_dict())
 
     if request.method == 'DELETE':
@@ -175,19 +290,113 @@ def handle_single_ac_model(current_user_id, current_user_role, model_id):
         # Eliminar permanentemente
         db.session.delete(model)
         db.session.commit()
+        notify_config_changed()
         return jsonify(success=True, message=f'Modelo {model.nombre} eliminado permanentemente')
 
 @admin_bp.route('/ac-models/<int:model_id>/toggle-status', methods=['POST'])
 @config_access_required
+@audited(ACModel, 'model_id', accion='ac_models.toggle_status')
 def toggle_ac_model_status(current_user_id, current_user_role, model_id):
     """Activa o desactiva un modelo de AA (soft toggle)."""
     model = ACModel.query.get_or_404(model_id)
     model.activo = not model.activo
     db.session.commit()
+    notify_config_changed()
     
     status = "activado" if model.activo else "desactivado"
     return jsonify(success=True, message=f'Modelo {model.nombre} {status} exitosamente.')
 
+
+def _positions_from_frame(model, frame_data):
+    """
+    Posiciones detectadas en un frame de referencia con el motor activo.
+    Lanza InvalidFrameError si el frame no es una imagen.
+    """
+    import base64
+    import binascii
+    from .detection import load_active_model
+    from ..vision.buffers import InvalidFrameError
+    from ..vision.executor import inference_executor
+    from ..vision.template import positions_from_detections
+
+    active_engine = config_cache.get_active_engine()
+    detector = load_active_model()
+    if detector is None or not active_engine or active_engine['id'] != model.motor_inferencia_id:
+        return None, 'Para capturar la plantilla desde un frame, el motor del modelo debe ser el motor activo'
+    if not isinstance(frame_data, str):
+        raise InvalidFrameError('frame debe ser una data URL')
+    try:
+        frame_bytes = base64.b64decode(frame_data.split(',')[-1])
+    except binascii.Error as e:
+        raise InvalidFrameError(f'Data URL inválida: {e}') from e
+
+    def detect_with_size(frame_bytes):
+        import cv2
+        import numpy as np
+        frame = cv2.imdecode(np.frombuffer(frame_bytes, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise InvalidFrameError('El frame recibido no es una imagen válida')
+        height, width = frame.shape[:2]
+        return detector.detect(frame), width, height
+
+    detections, width, height = inference_executor.run(detect_with_size, frame_bytes)
+    return positions_from_detections(detections, width, height, model.confidence_threshold), None
+
+
+@admin_bp.route('/ac-models/<int:model_id>/template', methods=['PUT', 'DELETE'])
+@config_access_required
+@audited(ACModel, 'model_id', accion='ac_models.template')
+def handle_ac_model_template(current_user_id, current_user_role, model_id):
+    """
+    Plantilla de posiciones del modelo de AA. PUT acepta 'positions'
+    ([[x, y], ...] normalizadas) o 'frame' (data URL de un frame de
+    referencia, procesado con el motor activo). DELETE la elimina.
+    """
+    model = ACModel.query.get_or_404(model_id)
+
+    if request.method == 'DELETE':
+        model.plantilla_posiciones = None
+        db.session.commit()
+        notify_config_changed()
+        return jsonify(success=True, message='Plantilla eliminada', data=model.to_dict())
+
+    data = request.get_json() or {}
+    tolerance = data.get('tolerancia', model.plantilla_tolerancia)
+    if tolerance is not None:
+        try:
+            tolerance = _coerce_number(tolerance, float)
+        except ValueError:
+            return jsonify(success=False, error='tolerancia debe ser numérica'), 400
+        if not 0.0 < tolerance <= 0.5:
+            return jsonify(success=False, error='tolerancia debe estar entre 0 y 0.5'), 400
+
+    if 'frame' in data:
+        from ..vision.buffers import InvalidFrameError
+        try:
+            positions, error = _positions_from_frame(model, data['frame'])
+        except InvalidFrameError as e:
+            return jsonify(success=False, error=f'Frame inválido: {e}'), 400
+        if error:
+            return jsonify(success=False, error=error), 409
+    else:
+        positions = data.get('positions')
+    if not positions or not isinstance(positions, list) or not all(
+        isinstance(p, (list, tuple)) and len(p) == 2
+        and all(isinstance(v, (int, float)) and not isinstance(v, bool) and 0.0 <= v <= 1.0 for v in p)
+        for p in positions
+    ):
+        return jsonify(success=False, error='La plantilla requiere una lista de posiciones [x, y] normalizadas entre 0 y 1'), 400
+    if len(positions) > 255:
+        return jsonify(success=False, error='La plantilla admite hasta 255 posiciones'), 400
+
+    model.plantilla_posiciones = json.dumps([[round(x, 4), round(y, 4)] for x, y in positions])
+    model.plantilla_tolerancia = tolerance
+    # El objetivo de conteo sigue a la plantilla para que ambas reglas coincidan
+    model.target_tornillos = len(positions)
+    db.session.commit()
+    notify_config_changed()
+    return jsonify(success=True, message=f'Plantilla guardada con {len(positions)} posiciones', data=model.to_dict())
+
 # ============================================================
 # RUTAS: GESTIÓN DE MOTORES DE IA (REESTRUCTURADO)
 # ============================================================
@@ -198,62 +407,208 @@ def get_inference_engines(current_user_id, current_user_role):
     engines = InferenceEngine.query.order_by(InferenceEngine.tipo).all()
     return jsonify(success=True, data=[engine.to_dict() for engine in engines])
 
+ALLOWED_ENGINE_EXTENSIONS = ['.pt', '.pth', '.weights']
+
+
+def _validate_engine_filename(filename, tipo):
+    """Devuelve un mensaje de error o None si el archivo es válido para el tipo"""
+    # Las extensiones por tipo las declara el registro de backends
+    from ..vision.backends import backend_extensions
+
+    if not filename or not any(filename.endswith(ext) for ext in ALLOWED_ENGINE_EXTENSIONS):
+        return 'Solo archivos .pt, .pth o .weights son permitidos'
+    expected = backend_extensions(tipo)
+    if expected is None:
+        return f'No hay backend de inferencia para el tipo {tipo}'
+    if not filename.endswith(expected):
+        return f"Para {tipo} se requiere archivo {' o '.join(expected)}"
+    return None
+
+
+def _register_engine(tmp_path, sha256, size, original_filename, tipo, version, descripcion, admin_id):
+    """
+    Publica el archivo subido y crea el InferenceEngine. Si ya existe un motor
+    con el mismo hash se descarta el temporal y se devuelve el existente.
+    Devuelve (engine, deduplicado).
+    """
+    existing = InferenceEngine.query.filter_by(hash_archivo=sha256).first()
+    if existing:
+        os.remove(tmp_path)
+        return existing, True
+
+    # Generar nombre único: {tipo}_{version}_{timestamp}.ext
+    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+    file_extension = os.path.splitext(original_filename)[1]
+    new_filename = f"{tipo}_v{version}_{timestamp}{file_extension}"
+    publish_file(tmp_path, new_filename)
+
+    new_engine = InferenceEngine(
+        tipo=tipo, version=version,
+        ruta_archivo=new_filename,  # Solo guardar el nombre, no la ruta completa
+        tamaño_archivo=size,
+        hash_archivo=sha256,
+        creado_por_id=admin_id,
+        descripcion=descripcion
+    )
+    db.session.add(new_engine)
+    db.session.commit()
+    notify_config_changed()
+    return new_engine, False
+
+
+def _engine_created_response(engine, deduplicated):
+    if deduplicated:
+        return jsonify(
+            success=True, deduplicated=True,
+            message=f'El archivo ya estaba cargado como motor {engine.tipo} v{engine.version}; no se duplicó',
+            data=engine.to_dict()
+        ), 200
+    return jsonify(
+        success=True, deduplicated=False,
+        message=f'Motor {engine.tipo} v{engine.version} cargado exitosamente',
+        data=engine.to_dict()
+    ), 201
+
+
 @admin_bp.route('/inference-engines', methods=['POST'])
 @admin_required
+@audited(InferenceEngine)
 def create_inference_engine(current_admin_id):
-    if 'archivo' not in request.files:
-        return jsonify(success=False, error='No se proporcionó archivo'), 400
-    
-    file = request.files['archivo']
-    allowed_extensions = ['.pt', '.pth', '.weights']
-    if not file or not any(file.filename.endswith(ext) for ext in allowed_extensions):
-        return jsonify(success=False, error='Solo archivos .pt, .pth o .weights son permitidos'), 400
-    
-    data = request.form
+    """
+    Subida en una sola petición (multipart): el archivo se escribe a disco
+    mientras se parsea el cuerpo (sin usar request.files, que lo leería antes
+    completo). Para archivos grandes o redes inestables, la subida por partes.
+    """
+    try:
+        data, tmp_path, sha256, size, filename = stream_multipart_upload(
+            request, 'archivo', max_size=current_app.config['MAX_CONTENT_LENGTH']
+        )
+    except UploadError as e:
+        return jsonify(success=False, error=str(e)), 400
     tipo = data.get('tipo')
     version = data.get('version')
     
-    # Validar extensión según tipo de modelo
-    extension_map = {
-        'yolov5': '.pt', 'yolov8': '.pt', 'yolov11': '.pt',
-        'rtdetr': '.pt', 'efficientdet': '.pth', 'maskrcnn': '.weights'
-    }
-    expected_ext = extension_map.get(tipo, '.pt')
-    if not file.filename.endswith(expected_ext):
-        return jsonify(success=False, error=f'Para {tipo} se requiere archivo {expected_ext}'), 400
+    error = _validate_engine_filename(filename, tipo)
+    if error:
+        os.remove(tmp_path)
+        return jsonify(success=False, error=error), 400
     
-    # Generar nombre único: {tipo}_{version}_{timestamp}.ext
-    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-    file_extension = os.path.splitext(file.filename)[1]
-    new_filename = f"{tipo}_v{version}_{timestamp}{file_extension}"
+    engine, deduplicated = _register_engine(
+        tmp_path, sha256, size, filename, tipo, version,
+        data.get('descripcion', ''), current_admin_id
+    )
+    return _engine_created_response(engine, deduplicated)
+
+# --- SUBIDA REANUDABLE POR PARTES ---
+
+@admin_bp.route('/inference-engines/uploads', methods=['POST'])
+@admin_required
+def start_engine_upload(current_admin_id):
+    """
+    Inicia una subida por partes. Body JSON: filename, size, tipo, version,
+    descripcion y opcionalmente sha256 para verificar al finalizar.
+    """
+    data = request.get_json() or {}
+    if not all(k in data for k in ['filename', 'size', 'tipo', 'version']):
+        return jsonify(success=False, error='Faltan datos requeridos'), 400
     
-    upload_path = os.path.join(DevelopmentConfig.UPLOAD_FOLDER, new_filename)
-    os.makedirs(DevelopmentConfig.UPLOAD_FOLDER, exist_ok=True)
-    file.save(upload_path)
+    error = _validate_engine_filename(data['filename'], data['tipo'])
+    if error:
+        return jsonify(success=False, error=error), 400
     
-    new_engine = InferenceEngine(
-        tipo=tipo, version=version,
-        ruta_archivo=new_filename,  # Solo guardar el nombre, no la ruta completa
-        tamaño_archivo=os.path.getsize(upload_path),
-        creado_por_id=current_admin_id, 
-        descripcion=data.get('descripcion', '')
+    try:
+        size = int(data['size'])
+    except (TypeError, ValueError):
+        return jsonify(success=False, error='Tamaño de archivo inválido'), 400
+    if size <= 0 or size > current_app.config['MAX_CONTENT_LENGTH']:
+        return jsonify(success=False, error='Tamaño de archivo inválido'), 400
+    
+    # Si el cliente ya conoce el hash, evitamos subir un archivo repetido
+    if data.get('sha256'):
+        existing = InferenceEngine.query.filter_by(hash_archivo=data['sha256'].lower()).first()
+        if existing:
+            return _engine_created_response(existing, True)
+    
+    upload_id = create_upload({
+        'filename': data['filename'],
+        'size': size,
+        'tipo': data['tipo'],
+        'version': data['version'],
+        'descripcion': data.get('descripcion', ''),
+        'sha256': data.get('sha256'),
+        'creado_por_id': current_admin_id
+    })
+    return jsonify(success=True, upload_id=upload_id, offset=0, chunk_size=CHUNK_SIZE), 201
+
+@admin_bp.route('/inference-engines/uploads/<upload_id>', methods=['GET'])
+@admin_required
+def get_engine_upload(current_admin_id, upload_id):
+    """Offset actual de la subida, para reanudar tras un corte"""
+    try:
+        upload = get_upload(upload_id)
+    except UploadError as e:
+        return jsonify(success=False, error=str(e)), 400
+    if upload is None:
+        return jsonify(success=False, error='La subida no existe o ya expiró'), 404
+    return jsonify(success=True, upload_id=upload_id, offset=upload['offset'], size=upload['size'])
+
+@admin_bp.route('/inference-engines/uploads/<upload_id>', methods=['PUT'])
+@admin_required
+def put_engine_upload_chunk(current_admin_id, upload_id):
+    """Recibe una parte en el body crudo; ?offset=N indica dónde empieza"""
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify(success=False, error='Falta el parámetro offset'), 400
+    try:
+        new_offset = append_chunk(upload_id, offset, request.stream)
+    except UploadOffsetMismatch as e:
+        return jsonify(success=False, error=str(e), offset=e.offset), 409
+    except UploadError as e:
+        return jsonify(success=False, error=str(e)), 400
+    return jsonify(success=True, upload_id=upload_id, offset=new_offset)
+
+@admin_bp.route('/inference-engines/uploads/<upload_id>/complete', methods=['POST'])
+@admin_required
+@audited(InferenceEngine)
+def complete_engine_upload(current_admin_id, upload_id):
+    """Verifica la subida, deduplica por hash y crea el motor"""
+    try:
+        tmp_path, sha256, size, upload = finish_upload(upload_id)
+    except UploadOffsetMismatch as e:
+        return jsonify(success=False, error=str(e), offset=e.offset), 409
+    except UploadError as e:
+        return jsonify(success=False, error=str(e)), 400
+    
+    engine, deduplicated = _register_engine(
+        tmp_path, sha256, size, upload['filename'], upload['tipo'], upload['version'],
+        upload['descripcion'], current_admin_id
     )
-    db.session.add(new_engine)
-    db.session.commit()
-    return jsonify(success=True, message=f'Motor {tipo} v{version} cargado exitosamente', data=new_engine.to_dict()), 201
+    return _engine_created_response(engine, deduplicated)
+
+@admin_bp.route('/inference-engines/uploads/<upload_id>', methods=['DELETE'])
+@admin_required
+def cancel_engine_upload(current_admin_id, upload_id):
+    try:
+        discard_upload(upload_id)
+    except UploadError as e:
+        return jsonify(success=False, error=str(e)), 400
+    return jsonify(success=True, message='Subida cancelada')
 
 @admin_bp.route('/inference-engines/<int:engine_id>/activate', methods=['POST'])
 @admin_required
+@audited(InferenceEngine, 'engine_id', accion='inference_engines.activate')
 def activate_inference_engine(current_admin_id, engine_id):
     InferenceEngine.query.update({'activo': False})
     db.session.commit()
     engine = InferenceEngine.query.get_or_404(engine_id)
     engine.activo = True
     db.session.commit()
+    notify_config_changed()
     return jsonify(success=True, message=f'Motor {engine.tipo} v{engine.version} activado')
 
 @admin_bp.route('/inference-engines/<int:engine_id>', methods=['DELETE'])
 @admin_required
+@audited(InferenceEngine, 'engine_id')
 def delete_inference_engine(current_admin_id, engine_id):
     """Eliminar motor de IA y su archivo asociado"""
     engine = InferenceEngine.query.get_or_404(engine_id)
@@ -280,13 +635,13 @@ def delete_inference_engine(current_admin_id, engine_id):
     
     # Eliminar archivo físico
     if engine.ruta_archivo:
-        file_path = os.path.join(DevelopmentConfig.UPLOAD_FOLDER, engine.ruta_archivo)
+        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], engine.ruta_archivo)
         try:
             if os.path.exists(file_path):
                 os.remove(file_path)
-                print(f"✓ Archivo eliminado: {file_path}")
-        except Exception as e:
-            print(f"⚠ Error al eliminar archivo: {e}")
+                logger.info('Archivo eliminado: %s', file_path)
+        except Exception:
+            logger.exception('Error al eliminar el archivo %s', file_path)
             # Continuar con la eliminación del registro aunque falle la eliminación del archivo
     
     # Guardar información para el mensaje
@@ -295,6 +650,7 @@ def delete_inference_engine(current_admin_id, engine_id):
     # Eliminar registro de la base de datos
     db.session.delete(engine)
     db.session.commit()
+    notify_config_changed()
     
     return jsonify(success=True, message=f'Motor {motor_info} eliminado exitosamente'), 200
 
@@ -304,12 +660,14 @@ def delete_inference_engine(current_admin_id, engine_id):
 
 @admin_bp.route('/settings', methods=['GET', 'PUT'])
 @config_access_required
+@audited(Settings, loader=lambda: Settings.query.first())
 def handle_settings(current_user_id, current_user_role):
     settings = Settings.query.first()
     if not settings:
         settings = Settings()
         db.session.add(settings)
         db.session.commit()
+        notify_config_changed()
 
     if request.method == 'GET':
         return jsonify(success=True, data=settings.to_dict())
@@ -319,4 +677,86 @@ def handle_settings(current_user_id, current_user_role):
         settings.ac_model_activo_id = data.get('ac_model_activo_id')
         settings.permitir_registro_publico = data.get('permitir_registro_publico', False)
         db.session.commit()
-        return jsonify(success=True, message='Configuración actualizada', data=settings.to_dict())
\ No newline at end of file
+        notify_config_changed()
+        return jsonify(success=True, message='Configuración actualizada', data=settings.to_dict())
+
+# ============================================================
+# RUTAS: TRABAJOS EN SEGUNDO PLANO
+# ============================================================
+
+@admin_bp.route('/jobs', methods=['GET'])
+@config_access_required
+def list_jobs(current_user_id, current_user_role):
+    """Últimos trabajos; filtros opcionales ?status=&tipo=&limit="""
+    mark_stale_jobs(current_app.config['JOB_STALE_SECONDS'])
+    query = BackgroundJob.query
+    if request.args.get('status'):
+        query = query.filter_by(status=request.args['status'])
+    if request.args.get('tipo'):
+        query = query.filter_by(tipo=request.args['tipo'])
+    limit = min(request.args.get('limit', 50, type=int), 200)
+    jobs = query.order_by(BackgroundJob.created_at.desc()).limit(limit).all()
+    return jsonify(success=True, data=[job.to_dict() for job in jobs], types=registered_job_types())
+
+@admin_bp.route('/jobs', methods=['POST'])
+@admin_required
+def create_job(current_admin_id):
+    """Encola un trabajo. Body JSON: {tipo, params}"""
+    data = request.get_json() or {}
+    tipo = data.get('tipo')
+    if tipo not in registered_job_types():
+        return jsonify(success=False, error=f'Tipo de trabajo desconocido: {tipo}'), 400
+    job = job_runner.submit(tipo, data.get('params') or {}, user_id=current_admin_id)
+    return jsonify(success=True, message='Trabajo encolado', data=job.to_dict()), 202
+
+@admin_bp.route('/jobs/<int:job_id>', methods=['GET'])
+@config_access_required
+def get_job(current_user_id, current_user_role, job_id):
+    job = BackgroundJob.query.get_or_404(job_id)
+    return jsonify(success=True, data=job.to_dict())
+
+@admin_bp.route('/jobs/<int:job_id>/cancel', methods=['POST'])
+@admin_required
+def cancel_job(current_admin_id, job_id):
+    job = BackgroundJob.query.get_or_404(job_id)
+    if not request_cancel(job):
+        return jsonify(success=False, error=f'El trabajo ya terminó ({job.status})'), 409
+    return jsonify(success=True, message='Cancelación solicitada', data=job.to_dict())
+
+@admin_bp.route('/jobs/<int:job_id>/download', methods=['GET'])
+@config_access_required
+def download_job_result(current_user_id, current_user_role, job_id):
+    """Descarga el archivo generado por un trabajo (p. ej. history.export)"""
+    job = BackgroundJob.query.get_or_404(job_id)
+    result = json.loads(job.result) if job.result else {}
+    if job.status != 'succeeded' or not result.get('file'):
+        return jsonify(success=False, error='El trabajo no generó un archivo descargable'), 404
+    return send_from_directory(current_app.config['EXPORT_FOLDER'], result['file'], as_attachment=True)
+
+# ============================================================
+# RUTAS: AUDITORÍA
+# ============================================================
+@admin_bp.route('/audit-logs', methods=['GET'])
+@admin_required
+def list_audit_logs(current_admin_id):
+    """Últimas entradas de auditoría; filtros opcionales ?tabla=&usuario_id=&registro_id=&limit="""
+    query = AuditLog.query
+    if request.args.get('tabla'):
+        query = query.filter_by(tabla_afectada=request.args['tabla'])
+    if request.args.get('usuario_id', type=int):
+        query = query.filter_by(usuario_id=request.args.get('usuario_id', type=int))
+    if request.args.get('registro_id', type=int):
+        query = query.filter_by(registro_id=request.args.get('registro_id', type=int))
+    limit = min(request.args.get('limit', 50, type=int), 200)
+    entries = query.order_by(AuditLog.fecha.desc(), AuditLog.id.desc()).limit(limit).all()
+    # 'writer' describe la cola de este worker (entradas aún no guardadas)
+    return jsonify(success=True, data=[entry.to_dict() for entry in entries], writer=audit_writer.status())
+
+# ============================================================
+# RUTAS: DIAGNÓSTICO DE ARRANQUE
+# ============================================================
+@admin_bp.route('/startup', methods=['GET'])
+@admin_required
+def startup_report(current_admin_id):
+    """Tiempos de arranque de este worker y módulos pesados ya cargados"""
+    return jsonify(success=True, data=current_app.extensions['startup'].report())
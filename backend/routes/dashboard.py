@@ -5,7 +5,8 @@
 from flask import Blueprint, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from ..database.models import db, User, Detection  # Importamos los modelos necesarios
-from sqlalchemy import func
+from sqlalchemy import func, case
+from ..services.retention import rollup_totals
 from datetime import datetime, timedelta
 
 dashboard_bp = Blueprint('dashboard', __name__)
@@ -33,11 +34,19 @@ def get_overview():
     try:
         # Usamos SQLAlchemy para hacer los cálculos de forma eficiente en la base de datos
         
-        # 1. Conteo total de inspecciones para el equipo
-        total_inspections = db.session.query(func.count(Detection.id)).filter_by(team=user_team).scalar() or 0
+        # 1. Conteos y sumas de la tabla caliente en una sola consulta
+        hot_total, hot_passed, hot_sum_conf, hot_sum_dur = db.session.query(
+            func.count(Detection.id),
+            func.coalesce(func.sum(case((Detection.status == 'PASS', 1), else_=0)), 0),
+            func.coalesce(func.sum(Detection.confidence), 0.0),
+            func.coalesce(func.sum(Detection.duracion_inferencia), 0.0)
+        ).filter(Detection.team == user_team).one()
 
-        # 2. Conteo de inspecciones PASS para el equipo
-        passed_inspections = db.session.query(func.count(Detection.id)).filter_by(team=user_team, status='PASS').scalar() or 0
+        # 2. Sumamos los agregados de las detecciones ya archivadas
+        arch_total, arch_passed, arch_sum_conf, arch_sum_dur = rollup_totals(team=user_team)
+
+        total_inspections = hot_total + arch_total
+        passed_inspections = hot_passed + arch_passed
 
         # 3. Conteo de inspecciones FAIL para el equipo
         failed_inspections = total_inspections - passed_inspections
@@ -46,14 +55,10 @@ def get_overview():
         pass_rate = (passed_inspections / total_inspections * 100) if total_inspections > 0 else 0
         
         # 5. Cálculo del tiempo promedio de inferencia
-        average_inference_time = db.session.query(
-            func.avg(Detection.duracion_inferencia)
-        ).filter_by(team=user_team).scalar() or 0.0
+        average_inference_time = ((hot_sum_dur + arch_sum_dur) / total_inspections) if total_inspections > 0 else 0.0
         
         # 6. Cálculo de confianza promedio
-        average_confidence = db.session.query(
-            func.avg(Detection.confidence)
-        ).filter_by(team=user_team).scalar() or 0.0
+        average_confidence = ((hot_sum_conf + arch_sum_conf) / total_inspections) if total_inspections > 0 else 0.0
         
         # Devolvemos un JSON limpio con los datos que el frontend necesita
         return jsonify({
@@ -140,18 +145,23 @@ def get_user_performance():
     if not user:
         return jsonify(success=False, message='Usuario no encontrado'), 404
 
-    detections = Detection.query.filter_by(user_id=user_id).all()
-    
-    if not detections:
+    hot_total, hot_passed = db.session.query(
+        func.count(Detection.id),
+        func.coalesce(func.sum(case((Detection.status == 'PASS', 1), else_=0)), 0)
+    ).filter(Detection.user_id == user.id).one()
+    arch_total, arch_passed, _, _ = rollup_totals(user_id=user.id)
+
+    total = hot_total + arch_total
+    if not total:
         return jsonify({ 'user': user.username, 'total_inspections': 0, 'pass_rate': 0 }), 200
     
-    passed = len([d for d in detections if d.status == 'PASS'])
-    pass_rate = (passed / len(detections)) * 100 if detections else 0
+    passed = hot_passed + arch_passed
+    pass_rate = (passed / total) * 100
     
     return jsonify({
         'user': user.username,
-        'total_inspections': len(detections),
+        'total_inspections': total,
         'passed': passed,
-        'failed': len(detections) - passed,
+        'failed': total - passed,
         'pass_rate': round(pass_rate, 2)
     }), 200
\ No newline at end of file
@@ -1,79 +1,68 @@
 # =================================================================
 #    DETECTION.PY - VERSIÓN FINAL CON CICLO DE INSPECCIÓN
 # =================================================================
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, current_app, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
-import cv2
 import base64
-import numpy as np
+import binascii
+import logging
+from itsdangerous import BadSignature, URLSafeTimedSerializer
 
 # Importaciones actualizadas
-from ..database.models import db, Detection, ACModel, Settings, InferenceEngine
-from ..vision.detector import YOLODetector
+from ..database.models import db, Detection, InferenceEngine, User, BackgroundJob
+from ..vision.manager import detector_manager, cascade_manager
+from ..vision.executor import inference_executor
+from ..vision.preview import preview_hub, BOUNDARY
+from ..vision.template import template_for, match_slots
+from ..vision.result_cache import frame_result_cache, frame_digest
+from ..vision.buffers import frame_pool, decode_jpeg, InvalidFrameError
+from ..vision.resources import cpu_resources
+from ..services.config_cache import config_cache, notify_config_changed
+from ..services.jobs import job_runner
+from ..services.cycles import early_exit_rule, decode_cycle, update_cycle, verified_exit_time
 
 detection_bp = Blueprint('detection', __name__)
-
-# Variable global para almacenar el detector activo
-yolo_detector = None
-active_engine = None
-model_loaded = False
+logger = logging.getLogger(__name__)
 
 def load_active_model():
-    """Carga el modelo activo desde la base de datos"""
-    global yolo_detector, active_engine, model_loaded
-    try:
-        print("🔄 Intentando cargar motor de IA desde la base de datos...")
-        engine = InferenceEngine.query.filter_by(activo=True).first()
-        
-        if engine and engine.ruta_archivo:
-            print(f"📁 Motor encontrado: {engine.tipo} v{engine.version}")
-            print(f"📂 Ruta del archivo: {engine.ruta_archivo}")
-            
-            yolo_detector = YOLODetector(model_filename=engine.ruta_archivo)
-            active_engine = engine
-            model_loaded = True
-            print(f"✅ Modelo activo cargado exitosamente: {engine.tipo} v{engine.version}")
-        else:
-            print("⚠️ No hay motor de IA activo configurado en la base de datos")
-            print("💡 Ve a Configuración → Motores de IA y activa uno")
-            yolo_detector = None
-            active_engine = None
-            model_loaded = True
-    except Exception as e:
-        import traceback
-        print(f"❌ ERROR al cargar el modelo:")
-        print(f"   Mensaje: {str(e)}")
-        print(f"   Traceback completo:")
-        traceback.print_exc()
-        yolo_detector = None
-        active_engine = None
-        model_loaded = True
+    """
+    Devuelve el detector del motor activo, cargándolo la primera vez.
+    Si otro worker cambió el motor, la caché de configuración lo detecta
+    (sin consultar la BD en cada frame) y el gestor lo sustituye en caliente.
+    """
+    return detector_manager.sync(config_cache.get_active_engine())
+
+def load_cascade_model(profile):
+    """Detector pesado de la cascada del modelo de AA activo (None si no aplica)"""
+    engine = None
+    if profile and profile['cascada_activa'] and profile['motor_cascada_id']:
+        engine = config_cache.get_engine(profile['motor_cascada_id'])
+    if engine is None:
+        if cascade_manager.detector is not None:
+            cascade_manager.sync(None)  # Se desactivó la cascada: libera el modelo
+        return None
+    return cascade_manager.sync(engine)
 
 # --- RUTA DE DIAGNÓSTICO: VERIFICAR ESTADO DEL MODELO ---
 @detection_bp.route('/model-status', methods=['GET'])
 @jwt_required()
 def get_model_status():
     """Devuelve el estado actual del modelo de detección"""
-    global model_loaded, yolo_detector, active_engine
-    
-    # Intentar cargar si no se ha intentado
-    if not model_loaded:
-        load_active_model()
-    
-    status = {
-        'model_loaded_attempted': model_loaded,
-        'detector_initialized': yolo_detector is not None,
-        'active_engine': None
-    }
-    
-    if active_engine:
-        status['active_engine'] = {
-            'id': active_engine.id,
-            'tipo': active_engine.tipo,
-            'version': active_engine.version,
-            'ruta_archivo': active_engine.ruta_archivo
-        }
-    
+    from ..vision.backends import registered_backends
+    from ..vision.cascade import cascade_stats
+    load_active_model()
+    status = detector_manager.status()
+    status['inference_executor'] = inference_executor.status()
+    status['cpu_layout'] = cpu_resources.status()
+    status['available_backends'] = registered_backends()
+    status['preview'] = preview_hub.status()
+    status['frame_cache'] = frame_result_cache.status()
+    status['buffer_pool'] = frame_pool.status()
+    from ..services.log_pipeline import log_pipeline
+    status['logging'] = log_pipeline.status()
+    from ..services.memory import process_memory
+    status['worker_memory'] = process_memory()
+    status['cascade'] = {'heavy_model': cascade_manager.status(), 'stats': cascade_stats.status()}
     return jsonify(success=True, data=status)
 
 # --- RUTA NUEVA: OBTENER CONFIGURACIÓN ---
@@ -81,52 +70,206 @@ def get_model_status():
 @jwt_required()
 def get_detection_config():
     """Devuelve la configuración activa para que el frontend sepa las reglas."""
-    settings = Settings.query.first()
-    if not settings or not settings.ac_model_activo_id:
+    settings = config_cache.get_settings()
+    if not settings or not settings['ac_model_activo_id']:
         return jsonify(success=False, error="No hay un Modelo de AA activo configurado en el panel de administración."), 404
     
-    active_model = ACModel.query.get(settings.ac_model_activo_id)
+    active_model = config_cache.get_ac_model(settings['ac_model_activo_id'])
     if not active_model:
         return jsonify(success=False, error="El Modelo de AA activo configurado no fue encontrado en la base de datos."), 404
         
     return jsonify(success=True, data={
-        "target_tornillos": active_model.target_tornillos,
-        "confidence_threshold": active_model.confidence_threshold,
-        "inspection_cycle_time": active_model.inspection_cycle_time,
-        "model_name": active_model.nombre
+        "target_tornillos": active_model['target_tornillos'],
+        "confidence_threshold": active_model['confidence_threshold'],
+        "inspection_cycle_time": active_model['inspection_cycle_time'],
+        "model_name": active_model['nombre'],
+        "early_exit": early_exit_rule(active_model),
+        "template_slots": len(active_model['plantilla']) if active_model['plantilla'] else 0
     })
 
+def _decode_and_detect(detector, frame_bytes, heavy=None, profile=None, preview_station=None):
+    """
+    Trabajo de CPU del frame: decodificación (en un buffer del pool) + modelo
+    (+ etapa pesada si hay cascada), asignación a la plantilla de posiciones
+    (si el modelo tiene) y, si alguien mira la estación, el frame anotado de
+    la vista previa.
+    Devuelve (detecciones, info de cascada o None, posiciones o None, ok);
+    ok=False si la inferencia falló: el resultado no debe cachearse.
+    """
+    frame, pooled = decode_jpeg(frame_pool, frame_bytes)
+    try:
+        frame_pool.count_frame()
+        if heavy is None:
+            detections, ok = detector.try_detect(frame)
+            cascade_info = None
+        else:
+            from ..vision.cascade import detect_with_cascade
+            detections, cascade_info = detect_with_cascade(detector, heavy, frame, profile)
+            ok = not cascade_info.get('degraded')
+        template = template_for(profile)
+        slots = None
+        if template is not None:
+            height, width = frame.shape[:2]
+            slots = match_slots(template, detections, width, height, profile['confidence_threshold'])
+        if preview_station is not None:
+            preview_hub.publish(preview_station, frame, detections, profile, template, slots)
+        return detections, cascade_info, slots, ok
+    finally:
+        # Las detecciones no referencian al frame: el buffer vuelve al pool
+        if pooled:
+            frame_pool.release_array(frame)
+
+def _read_frame_body():
+    """
+    Frame enviado como image/jpeg: el cuerpo se lee directo a un bytearray
+    del pool. Devuelve (buffer, memoryview con el JPEG) o (None, None).
+    """
+    length = request.content_length or 0
+    if length <= 0:
+        return None, None
+    body = frame_pool.acquire_bytes(length)
+    view = memoryview(body)[:length]
+    stream = request.stream
+    read = 0
+    while read < length:
+        n = stream.readinto(view[read:])
+        if not n:
+            frame_pool.release_bytes(body)
+            return None, None
+        read += n
+    return body, view
+
 # --- RUTA MODIFICADA: SOLO PROCESA EL FRAME ---
 @detection_bp.route('/process-frame', methods=['POST'])
 @jwt_required()
 def process_frame():
-    """Recibe un frame, lo procesa con YOLO y devuelve las detecciones crudas."""
-    global model_loaded
-    
-    # Cargar el modelo en el primer request si no está cargado
-    if not model_loaded:
-        load_active_model()
+    """
+    Recibe un frame, lo procesa con YOLO y devuelve las detecciones crudas.
+    Acepta el JPEG como cuerpo image/jpeg (token de ciclo en X-Cycle-Token)
+    o, por compatibilidad, como data URL en JSON ({'frame', 'cycle'}).
+    """
+    # Carga en el primer request; luego solo verifica si cambió el motor activo
+    yolo_detector = load_active_model()
     
     if yolo_detector is None:
         return jsonify(success=False, error="El modelo de detección no está cargado en el servidor."), 500
 
-    data = request.get_json()
-    if 'frame' not in data:
-        return jsonify(success=False, error='El frame no fue proporcionado en la petición'), 400
+    body = None
+    if request.mimetype == 'image/jpeg':
+        body, frame_bytes = _read_frame_body()
+        if body is None:
+            return jsonify(success=False, error='El frame no fue proporcionado en la petición'), 400
+        cycle_token = request.headers.get('X-Cycle-Token')
+    else:
+        data = request.get_json()
+        if 'frame' not in data:
+            return jsonify(success=False, error='El frame no fue proporcionado en la petición'), 400
+        frame_bytes = None
+        cycle_token = data.get('cycle')
 
     try:
-        frame_data = data['frame'].split(',')[1]
-        frame_bytes = base64.b64decode(frame_data)
-        np_arr = np.frombuffer(frame_bytes, np.uint8)
-        frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+        if frame_bytes is None:
+            frame_data = data['frame'].split(',')[1]
+            frame_bytes = base64.b64decode(frame_data)
+            frame_pool.record_allocation('body')
+
+        profile = config_cache.get_active_ac_model()
+        heavy_detector = load_cascade_model(profile)
+        station = int(get_jwt_identity())
+        preview_station = station if preview_hub.wanted(station) else None
 
-        detections = yolo_detector.detect(frame)
+        # Frame idéntico a uno reciente (reintento, video en pausa): sin inferencia
+        cache_key = None
+        cached = None
+        if frame_result_cache.enabled:
+            engine_key = detector_manager.key_for(yolo_detector)
+            heavy_key = cascade_manager.key_for(heavy_detector) if heavy_detector is not None else None
+            if engine_key is not None and (heavy_detector is None or heavy_key is not None):
+                cache_key = frame_result_cache.make_key(frame_digest(frame_bytes), engine_key, heavy_key, profile)
+                cached = frame_result_cache.get(cache_key)
+
+        if cached is not None:
+            detections, cascade_info, slots = cached
+        else:
+            # Decodificación e inferencia fuera del hub de gevent (si aplica)
+            detections, cascade_info, slots, ok = inference_executor.run(
+                _decode_and_detect, yolo_detector, frame_bytes, heavy_detector, profile, preview_station
+            )
+            # Un error de inferencia (OOM, motor en cambio) no se sirve a los reintentos
+            if cache_key is not None and ok:
+                frame_result_cache.put(cache_key, (detections, cascade_info, slots))
         
         # Ya no calcula PASS/FAIL ni guarda en la BD. Solo devuelve lo que ve.
-        return jsonify(success=True, detections=detections), 200
-        
+        response = {'success': True, 'detections': detections}
+        if cached is not None:
+            response['cached'] = True
+        if cascade_info:
+            response['cascade'] = cascade_info
+        if slots is not None:
+            response['slots'] = slots
+        # Regla de salida anticipada: el estado del ciclo va y vuelve en un token firmado
+        rule = early_exit_rule(profile)
+        if rule:
+            response['cycle'] = update_cycle(decode_cycle(cycle_token, profile), detections, rule, slots)
+        return jsonify(response), 200
+
+    except (InvalidFrameError, binascii.Error) as e:
+        # Frame corrupto o data URL mal formada: error del cliente, sin traceback
+        # (en ráfaga el log queda limitado, services/log_pipeline.py)
+        logger.warning('Frame inválido descartado: %s', e)
+        return jsonify(success=False, error=f"Frame inválido: {e}"), 400
     except Exception as e:
+        logger.exception('Error procesando el frame')
         return jsonify(success=False, error=f"Error procesando el frame: {str(e)}"), 500
+    finally:
+        if body is not None:
+            frame_bytes = None
+            frame_pool.release_bytes(body)
+
+# ============================================================
+# RUTAS: VISTA PREVIA ANOTADA (MJPEG)
+# ============================================================
+
+def _preview_serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='preview-stream')
+
+@detection_bp.route('/preview', methods=['GET'])
+@jwt_required()
+def list_previews():
+    """
+    Estaciones con frames recientes y la URL firmada de su stream. Un <img>
+    no puede enviar el header Authorization, así que la URL lleva el permiso.
+    """
+    claims = get_jwt()
+    stations = preview_hub.stations()
+    users = User.query.filter(User.id.in_(stations)).all() if stations else []
+    if claims.get('role') != 'admin':
+        users = [u for u in users if u.team == claims.get('team')]
+    serializer = _preview_serializer()
+    return jsonify(success=True, data=[{
+        'station_id': u.id,
+        'username': u.username,
+        'team': u.team,
+        'stream_url': url_for('detection.stream_preview', station_id=u.id, t=serializer.dumps(u.id))
+    } for u in users])
+
+@detection_bp.route('/preview/<int:station_id>/stream', methods=['GET'])
+def stream_preview(station_id):
+    """Stream multipart/x-mixed-replace con el último frame anotado de la estación"""
+    try:
+        allowed = _preview_serializer().loads(request.args.get('t', ''), max_age=current_app.config['PREVIEW_URL_TTL'])
+    except BadSignature:
+        return jsonify(success=False, error="Enlace de vista previa inválido o vencido."), 403
+    if allowed != station_id:
+        return jsonify(success=False, error="Enlace de vista previa inválido o vencido."), 403
+    response = Response(
+        preview_hub.stream(station_id),
+        mimetype=f'multipart/x-mixed-replace; boundary={BOUNDARY}',
+        direct_passthrough=True
+    )
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 # --- RUTA NUEVA: GUARDAR EL RESULTADO FINAL DEL CICLO ---
 @detection_bp.route('/save-inspection', methods=['POST'])
@@ -139,19 +282,33 @@ def save_inspection_result():
         return jsonify(success=False, error="Faltan datos para guardar la inspección"), 400
 
     # Obtener el modelo de AA basado en el nombre para obtener su ID
-    ac_model = ACModel.query.filter_by(nombre=data['model_name']).first()
+    ac_model = config_cache.get_ac_model_by_name(data['model_name'])
     if not ac_model:
         return jsonify(success=False, error=f"No se encontró el modelo de AA con el nombre {data['model_name']}"), 404
 
+    # Con plantilla, el estado lo define el resultado por posición: un
+    # faltante no se compensa con un falso positivo en otro lugar
+    status = data['status']
+    positions = data.get('posiciones')
+    if ac_model['plantilla'] and positions is not None:
+        if len(positions) != len(ac_model['plantilla']) or set(positions) - {'0', '1'}:
+            return jsonify(success=False, error="posiciones no coincide con la plantilla del modelo de AA"), 400
+        status = 'FAIL' if '0' in positions else 'PASS'
+    else:
+        positions = None
+
     new_inspection = Detection(
         user_id=get_jwt_identity(),
         team=get_jwt().get('team', 'Unknown'),
-        status=data['status'],
+        status=status,
+        posiciones=positions,
         detection_count=data['detection_count'],
         expected_count=data['expected_count'],
         confidence=data.get('confidence', 0.0),
-        ac_model_id=ac_model.id,
-        motor_inferencia_id=ac_model.motor_inferencia_id
+        ac_model_id=ac_model['id'],
+        motor_inferencia_id=ac_model['motor_inferencia_id'],
+        # Solo se registra si el token del ciclo firmado por el servidor la confirma
+        tiempo_salida_anticipada=verified_exit_time(data.get('cycle'), ac_model)
     )
     db.session.add(new_inspection)
     db.session.commit()
@@ -176,8 +333,6 @@ def get_available_engines():
 @jwt_required()
 def change_active_engine(engine_id):
     """Cambia el motor de IA activo y recarga el detector"""
-    global yolo_detector, active_engine, model_loaded
-    
     # Desactivar todos los motores
     InferenceEngine.query.update({'activo': False})
     db.session.commit()
@@ -186,19 +341,24 @@ def change_active_engine(engine_id):
     engine = InferenceEngine.query.get_or_404(engine_id)
     engine.activo = True
     db.session.commit()
+    notify_config_changed()
     
-    # FORZAR recarga del detector (resetear flag)
-    model_loaded = False
-    yolo_detector = None
-    active_engine = None
-    
-    # Recargar el detector
-    load_active_model()
-    
-    if yolo_detector:
-        return jsonify(success=True, message=f'Motor {engine.tipo} v{engine.version} activado y cargado')
-    else:
-        return jsonify(success=False, error='Error al cargar el nuevo motor'), 500
+    # La carga en este worker corre como trabajo ('engine.load'); los demás
+    # workers lo detectan por la versión de configuración y lo cambian en segundo plano
+    job = job_runner.submit('engine.load', {'engine_id': engine.id}, user_id=int(get_jwt_identity()))
+    return jsonify(
+        success=True,
+        message=f'Motor {engine.tipo} v{engine.version} activado; cargando',
+        data=job.to_dict()
+    ), 202
+
+
+@detection_bp.route('/change-engine/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_engine_load_job(job_id):
+    """Estado del trabajo de carga lanzado por /change-engine"""
+    job = BackgroundJob.query.filter_by(id=job_id, tipo='engine.load').first_or_404()
+    return jsonify(success=True, data=job.to_dict())
 
 # --- RUTA NUEVA: INFO DEL MOTOR ACTIVO ---
 @detection_bp.route('/active-engine', methods=['GET'])
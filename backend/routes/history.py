@@ -1,120 +1,192 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..database.models import db, User, Detection
+from ..database.pagination import keyset_paginate, cached_count, InvalidCursorError
+from ..services.export import (
+    EXPORT_FORMATS, iter_batches, json_stream, ndjson_stream, csv_stream,
+    parquet_stream, parquet_available, gzip_stream
+)
+from ..services.retention import iter_archived_batches
+from itertools import chain
 from datetime import datetime, timedelta
 
 history_bp = Blueprint('history', __name__)
 
+MAX_PER_PAGE = 100
+
+
+def _pagination_args():
+    """Lee cursor, per_page e include_total de la query string"""
+    cursor = request.args.get('cursor', None)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), MAX_PER_PAGE)
+    include_total = request.args.get('include_total', 'false').lower() in ('1', 'true', 'yes')
+    return cursor, per_page, include_total
+
+
+def _team_history_query(team, start_date):
+    """
+    Consulta proyectada del histórico del equipo: un único JOIN con users
+    y solo las columnas que se devuelven, sin materializar objetos ORM
+    (evita una consulta perezosa por fila para obtener el username).
+    """
+    return db.session.query(
+        Detection.id,
+        User.username,
+        Detection.status,
+        Detection.confidence,
+        Detection.detection_count,
+        Detection.timestamp
+    ).join(User, Detection.user_id == User.id).filter(
+        Detection.team == team,
+        Detection.timestamp >= start_date
+    )
+
 @history_bp.route('/user', methods=['GET'])
 @jwt_required()
 def get_user_history():
-    """Obtener histórico de detecciones del usuario"""
+    """
+    Obtener histórico de detecciones del usuario.
+    Paginación por cursor: enviar `cursor=<next_cursor>` para la página siguiente.
+    """
     user_id = get_jwt_identity()
     
     # Parámetros de paginación
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
+    cursor, per_page, include_total = _pagination_args()
     status = request.args.get('status', None)
     
-    query = Detection.query.filter_by(user_id=user_id)
+    query = db.session.query(
+        Detection.id,
+        Detection.status,
+        Detection.confidence,
+        Detection.detection_count,
+        Detection.timestamp
+    ).filter(Detection.user_id == user_id)
     
     if status:
-        query = query.filter_by(status=status.upper())
+        query = query.filter(Detection.status == status.upper())
     
-    detections = query.order_by(Detection.timestamp.desc()).paginate(
-        page=page,
-        per_page=per_page
-    )
+    try:
+        detections, next_cursor = keyset_paginate(
+            query, Detection.timestamp, Detection.id, per_page, cursor
+        )
+    except InvalidCursorError as e:
+        return jsonify(success=False, error=str(e)), 400
+    
+    total = None
+    if include_total:
+        total = cached_count(('user', user_id, status), query)
     
     return jsonify({
-        'page': page,
         'per_page': per_page,
-        'total': detections.total,
-        'pages': detections.pages,
+        'next_cursor': next_cursor,
+        'total': total,
         'detections': [{
             'id': d.id,
             'status': d.status,
             'confidence': round(d.confidence, 4),
             'detection_count': d.detection_count,
             'timestamp': d.timestamp.isoformat()
-        } for d in detections.items]
+        } for d in detections]
     }), 200
 
 
 @history_bp.route('/team', methods=['GET'])
 @jwt_required()
 def get_team_history():
-    """Obtener histórico del equipo"""
+    """Obtener histórico del equipo (paginación por cursor)"""
     user_id = get_jwt_identity()
     user = User.query.get(user_id)
     
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
+    cursor, per_page, include_total = _pagination_args()
     status = request.args.get('status', None)
     days = request.args.get('days', 7, type=int)
     
     # Filtrar por fecha
     start_date = datetime.utcnow() - timedelta(days=days)
     
-    query = Detection.query.filter(
-        Detection.team == user.team,
-        Detection.timestamp >= start_date
-    )
+    query = _team_history_query(user.team, start_date)
     
     if status:
-        query = query.filter_by(status=status.upper())
+        query = query.filter(Detection.status == status.upper())
     
-    detections = query.order_by(Detection.timestamp.desc()).paginate(
-        page=page,
-        per_page=per_page
-    )
+    try:
+        detections, next_cursor = keyset_paginate(
+            query, Detection.timestamp, Detection.id, per_page, cursor
+        )
+    except InvalidCursorError as e:
+        return jsonify(success=False, error=str(e)), 400
+    
+    total = None
+    if include_total:
+        total = cached_count(('team', user.team, status, days), query)
     
     return jsonify({
         'team': user.team,
-        'page': page,
         'per_page': per_page,
-        'total': detections.total,
-        'pages': detections.pages,
+        'next_cursor': next_cursor,
+        'total': total,
         'period_days': days,
         'detections': [{
             'id': d.id,
-            'user': d.user.username,
+            'user': d.username,
             'status': d.status,
             'confidence': round(d.confidence, 4),
             'detection_count': d.detection_count,
             'timestamp': d.timestamp.isoformat()
-        } for d in detections.items]
+        } for d in detections]
     }), 200
 
 
 @history_bp.route('/export', methods=['GET'])
 @jwt_required()
 def export_history():
-    """Exportar histórico en formato JSON"""
+    """
+    Exportar histórico en streaming.
+
+    Parámetros:
+    - format: json (por defecto), ndjson, csv o parquet
+    - compress: 'gzip' para comprimir al vuelo (no aplica a parquet)
+    - days: ventana de tiempo hacia atrás
+    """
     user_id = get_jwt_identity()
     user = User.query.get(user_id)
     
     days = request.args.get('days', 7, type=int)
+    export_format = request.args.get('format', 'json').lower()
+    compress = request.args.get('compress', '').lower() == 'gzip'
     start_date = datetime.utcnow() - timedelta(days=days)
     
-    detections = Detection.query.filter(
-        Detection.team == user.team,
-        Detection.timestamp >= start_date
-    ).order_by(Detection.timestamp.desc()).all()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify(success=False, error=f"Formato no soportado: {export_format}"), 400
+    if export_format == 'parquet' and not parquet_available():
+        return jsonify(success=False, error="La exportación Parquet requiere pyarrow instalado en el servidor."), 501
     
-    return jsonify({
-        'export': {
+    query = _team_history_query(user.team, start_date).order_by(
+        Detection.timestamp.desc()
+    )
+    # Las filas antiguas ya archivadas se leen del archivo frío a continuación
+    batches = chain(iter_batches(query), iter_archived_batches(user.team, start_date))
+    
+    if export_format == 'json':
+        chunks = json_stream(batches, {
             'team': user.team,
             'exported_at': datetime.utcnow().isoformat(),
-            'period_days': days,
-            'total_records': len(detections),
-            'detections': [{
-                'id': d.id,
-                'user': d.user.username,
-                'status': d.status,
-                'confidence': d.confidence,
-                'detection_count': d.detection_count,
-                'timestamp': d.timestamp.isoformat()
-            } for d in detections]
-        }
-    }), 200
\ No newline at end of file
+            'period_days': days
+        })
+    elif export_format == 'ndjson':
+        chunks = ndjson_stream(batches)
+    elif export_format == 'csv':
+        chunks = csv_stream(batches)
+    else:
+        # Parquet ya está comprimido por columnas
+        chunks = parquet_stream(batches)
+        compress = False
+    
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    filename = f"historial_{user.team}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+    if compress:
+        chunks = gzip_stream(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers), 200
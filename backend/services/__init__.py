@@ -0,0 +1,3 @@
+"""
+Services - Subsistemas de soporte de la aplicación
+"""
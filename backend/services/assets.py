@@ -0,0 +1,216 @@
+"""
+Assets estáticos con huella de contenido y precomprimidos
+En el build se copia cada archivo de backend/static a static/dist con el hash
+de su contenido en el nombre (api.3f2a1b9c0d4e.js), junto a sus versiones
+.gz y .br (si 'brotli' está instalado), y se escribe un manifest.json.
+
+En ejecución:
+- asset_url('js/api.js') en las plantillas devuelve la URL con hash, que se
+  cachea como inmutable; sin manifest (desarrollo) devuelve '/js/api.js'.
+- Cada archivo se sirve en la mejor codificación aceptada por el cliente
+  (br > gzip > identidad) con ETag fuerte y respuesta 304 si no cambió.
+
+Uso:
+    flask assets build
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+import click
+from flask import current_app, request, send_file, abort
+from flask.cli import AppGroup
+from werkzeug.security import safe_join
+
+DIST_DIRNAME = 'dist'
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 12
+
+# Solo se precomprimen formatos de texto; las imágenes ya vienen comprimidas
+COMPRESSIBLE_EXTENSIONS = {'.js', '.css', '.html', '.svg', '.json', '.txt', '.map'}
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+
+
+def _brotli():
+    """Módulo brotli si está instalado (opcional)"""
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+def _iter_static_files(static_folder):
+    """Rutas relativas (con '/') de los archivos servibles, sin dist ni ocultos"""
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = [d for d in dirs if not d.startswith('.') and
+                   os.path.join(root, d) != os.path.join(static_folder, DIST_DIRNAME)]
+        for name in files:
+            if name.startswith('.'):
+                continue
+            yield os.path.relpath(os.path.join(root, name), static_folder).replace(os.sep, '/')
+
+
+def build_assets(static_folder):
+    """
+    Genera static/dist con archivos fingerprinted, sus variantes .gz/.br y
+    el manifest. Devuelve el manifest.
+    """
+    dist = os.path.join(static_folder, DIST_DIRNAME)
+    if os.path.isdir(dist):
+        shutil.rmtree(dist)
+    brotli = _brotli()
+    manifest = {}
+
+    for rel in sorted(_iter_static_files(static_folder)):
+        with open(os.path.join(static_folder, rel), 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        stem, ext = os.path.splitext(rel)
+        hashed = f"{stem}.{digest[:HASH_LENGTH]}{ext}"
+
+        target = os.path.join(dist, hashed)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+
+        encodings = {}
+        if ext.lower() in COMPRESSIBLE_EXTENSIONS:
+            # mtime=0: el .gz es reproducible entre builds
+            gz = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(gz) < len(data):
+                with open(target + '.gz', 'wb') as f:
+                    f.write(gz)
+                encodings['gzip'] = hashed + '.gz'
+            if brotli is not None:
+                br = brotli.compress(data, quality=11)
+                if len(br) < len(data):
+                    with open(target + '.br', 'wb') as f:
+                        f.write(br)
+                    encodings['br'] = hashed + '.br'
+
+        manifest[rel] = {
+            'file': hashed,
+            'etag': digest[:32],
+            'size': len(data),
+            'mimetype': mimetypes.guess_type(rel)[0] or 'application/octet-stream',
+            'encodings': encodings
+        }
+
+    os.makedirs(dist, exist_ok=True)
+    with open(os.path.join(dist, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+class AssetManifest:
+    """Manifest de assets cargado una vez por proceso"""
+
+    def __init__(self, app=None):
+        self.static_folder = None
+        self.dist_folder = None
+        self.entries = {}
+        self._by_hashed = {}
+        self._static_files = frozenset()
+        self._debug = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        self.dist_folder = os.path.join(app.static_folder, DIST_DIRNAME)
+        self._debug = app.debug
+        self.reload()
+        app.extensions['assets'] = self
+        app.add_template_global(self.url, 'asset_url')
+        app.add_url_rule(f'/static/{DIST_DIRNAME}/<path:filename>', 'dist_asset', self.serve_hashed)
+
+    def reload(self):
+        path = os.path.join(self.dist_folder, MANIFEST_NAME)
+        try:
+            with open(path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+        self._by_hashed = {entry['file']: entry for entry in self.entries.values()}
+        # Índice en memoria: evita un os.path.exists por petición en serve_spa
+        self._static_files = frozenset(_iter_static_files(self.static_folder))
+
+    def url(self, path):
+        """URL pública de un asset (con hash si hay manifest)"""
+        path = path.lstrip('/')
+        entry = self.entries.get(path)
+        if entry is None:
+            return '/' + path
+        return f"/static/{DIST_DIRNAME}/{entry['file']}"
+
+    def has_static(self, path):
+        if self._debug:
+            # safe_join: None si la ruta sale de la carpeta ('..', absolutas)
+            full_path = safe_join(self.static_folder, path)
+            return full_path is not None and os.path.isfile(full_path)
+        return path in self._static_files
+
+    def _send(self, folder, filename, entry, cache_control):
+        """Envía la mejor codificación aceptada con ETag fuerte y soporte de 304"""
+        encoding = None
+        if entry:
+            for candidate in ('br', 'gzip'):
+                if candidate in entry['encodings'] and request.accept_encodings[candidate]:
+                    encoding = candidate
+                    break
+
+        if encoding:
+            full_path = os.path.join(self.dist_folder, entry['encodings'][encoding])
+            etag = f"{entry['etag']}-{encoding}"
+        else:
+            full_path = safe_join(folder, filename)
+            if full_path is None or not os.path.isfile(full_path):
+                abort(404)
+            etag = entry['etag'] if entry else True
+
+        response = send_file(
+            full_path,
+            mimetype=entry['mimetype'] if entry else None,
+            etag=etag,
+            conditional=True,
+            max_age=None
+        )
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if entry and entry['encodings']:
+            response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = cache_control
+        return response
+
+    def serve_hashed(self, filename):
+        """/static/dist/<archivo con hash>: contenido inmutable"""
+        entry = self._by_hashed.get(filename)
+        if entry is None:
+            abort(404)
+        return self._send(self.dist_folder, filename, entry, IMMUTABLE_CACHE)
+
+    def serve_static(self, path):
+        """Ruta sin hash (/js/api.js): se revalida siempre con el ETag"""
+        return self._send(self.static_folder, path, self.entries.get(path), REVALIDATE_CACHE)
+
+
+asset_manifest = AssetManifest()
+
+
+assets_cli = AppGroup('assets', help='Assets estáticos con huella y precomprimidos.')
+
+
+@assets_cli.command('build')
+def build_command():
+    """Genera static/dist y su manifest."""
+    manifest = build_assets(current_app.static_folder)
+    compressed = sum(1 for e in manifest.values() if e['encodings'])
+    click.echo(f"{len(manifest)} assets ({compressed} precomprimidos) en {os.path.join(current_app.static_folder, DIST_DIRNAME)}")
+    if _brotli() is None:
+        click.echo("Aviso: 'brotli' no está instalado; solo se generó gzip.")
@@ -0,0 +1,291 @@
+"""
+Auditoría de las mutaciones de administración
+Las rutas de administración se decoran con @audited(Modelo, ...): el
+decorador toma una foto del registro antes de ejecutar la vista y otra al
+terminar (de la respuesta o del registro), y encola la entrada. La petición
+no paga ningún commit extra: un hilo de fondo por worker inserta las
+entradas en 'audit_logs' cada AUDIT_FLUSH_SECONDS, en lotes de hasta
+AUDIT_BATCH_SIZE.
+
+Si la BD no acepta el lote (o la cola está llena) las entradas se agregan
+como JSON por línea a AUDIT_FALLBACK_FILE, y se reintentan en el siguiente
+lote que sí se guarde. Un lote rechazado se reintenta fila por fila: las
+que fallan con la BD disponible (p. ej. una FK rota) pasan a
+AUDIT_FALLBACK_FILE.rejected en lugar de bloquear a las demás. Al salir del
+proceso se vacía la cola.
+
+Uso (debajo del decorador de permisos, que aporta el usuario):
+
+    @admin_bp.route('/users/<int:user_id>', methods=['PUT'])
+    @config_access_required
+    @audited(User, 'user_id')
+    def update_user(current_user_id, current_user_role, user_id): ...
+"""
+
+import atexit
+import collections
+import json
+import os
+import sys
+from datetime import datetime
+from functools import wraps
+
+from flask import current_app, request
+
+from ..database.engine import create_background_engine, is_memory_database
+from ..database.models import db
+from .log_pipeline import native_primitives
+
+VERBS = {'POST': 'create', 'PUT': 'update', 'DELETE': 'delete'}
+REDACTED_KEYS = ('password', 'token', 'secret')
+
+
+# ============================================================
+# SNAPSHOTS
+# ============================================================
+def _redact(data):
+    return {k: v for k, v in data.items() if not any(r in k for r in REDACTED_KEYS)}
+
+
+def _snapshot(instance):
+    return _redact(instance.to_dict()) if instance is not None else None
+
+
+def _diff(before, after):
+    """Solo los campos que cambiaron (completos si es alta o baja)"""
+    if before is None or after is None:
+        return before, after
+    changed = [k for k in after if before.get(k) != after.get(k)]
+    return {k: before.get(k) for k in changed}, {k: after[k] for k in changed}
+
+
+def _client_ip():
+    # Detrás de nginx: X-Real-IP con la IP del cliente
+    return (request.headers.get('X-Real-IP') or request.remote_addr or '')[:45] or None
+
+
+def _user_id(kwargs):
+    user_id = kwargs.get('current_user_id', kwargs.get('current_admin_id'))
+    return int(user_id) if user_id is not None else None
+
+
+def audited(model, id_arg=None, accion=None, loader=None):
+    """
+    Registra en audit_logs las peticiones POST/PUT/DELETE exitosas de la vista.
+
+    - id_arg: argumento de la ruta con el id del registro (sin él, el id
+      sale de 'data' en la respuesta: altas)
+    - accion: nombre de la acción (por defecto '<tabla>.<create|update|delete>')
+    - loader: callable() que devuelve el registro (tablas de una sola fila)
+    """
+    tabla = model.__tablename__
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            verb = VERBS.get(request.method)
+            if verb is None:
+                return fn(*args, **kwargs)
+            if verb == 'create' and (id_arg is not None or loader is not None):
+                verb = 'update'  # Acción POST sobre un registro existente (activar, toggle)
+
+            def load():
+                if loader is not None:
+                    return loader()
+                if id_arg is not None:
+                    return db.session.get(model, kwargs[id_arg])
+                return None
+
+            before = _snapshot(load()) if verb != 'create' else None
+            response = current_app.make_response(fn(*args, **kwargs))
+            # Un alta solo cuenta si creó algo (201: no las deduplicadas)
+            if response.status_code >= 300 or (verb == 'create' and response.status_code != 201):
+                return response
+
+            body = response.get_json(silent=True) or {}
+            after = None
+            if verb != 'delete':
+                data = body.get('data')
+                after = _redact(data) if isinstance(data, dict) and 'id' in data else _snapshot(load())
+            record = after or before or {}
+            anteriores, nuevos = _diff(before, after)
+            audit_writer.submit({
+                'usuario_id': _user_id(kwargs),
+                'accion': accion or f'{tabla}.{verb}',
+                'descripcion': body.get('message') or '',
+                'tabla_afectada': tabla,
+                'registro_id': record.get('id'),
+                'fecha': datetime.utcnow(),
+                'ip_address': _client_ip(),
+                'detalles_anteriores': json.dumps(anteriores, default=str) if anteriores is not None else '',
+                'detalles_nuevos': json.dumps(nuevos, default=str) if nuevos is not None else ''
+            })
+            return response
+        return wrapper
+    return decorator
+
+
+# ============================================================
+# ESCRITURA EN LOTES
+# ============================================================
+class AuditWriter:
+    def __init__(self):
+        self.app = None
+        self.flush_seconds = 1.0
+        self.batch_size = 100
+        self.queue_size = 10000
+        self.fallback_file = None
+        self.db_enabled = False
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+        atexit.register(self._at_exit)
+
+    def _reset(self):
+        """Estado por proceso: el hilo de fondo no sobrevive al fork"""
+        allocate_lock = native_primitives()[0]
+        self._lock = allocate_lock()
+        self._write_lock = allocate_lock()
+        self._entries = collections.deque()
+        self._pid = None
+        self._engine = None
+        self.written = 0
+        self.fallback = 0
+        self.errors = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.flush_seconds = app.config['AUDIT_FLUSH_SECONDS']
+        self.batch_size = app.config['AUDIT_BATCH_SIZE']
+        self.queue_size = app.config['AUDIT_QUEUE_SIZE']
+        self.fallback_file = app.config['AUDIT_FALLBACK_FILE']
+        self.db_enabled = not is_memory_database(app.config['SQLALCHEMY_DATABASE_URI'])
+
+    def submit(self, entry):
+        if self._pid != os.getpid():
+            self._start()
+        if len(self._entries) >= self.queue_size:
+            self._write_fallback([entry])
+            return
+        self._entries.append(entry)
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            _, start_new_thread, sleep = native_primitives()
+            self._pid = os.getpid()
+            start_new_thread(self._run, (self._pid, sleep))
+
+    def _run(self, pid, sleep):
+        while self._pid == pid:
+            sleep(self.flush_seconds)
+            try:
+                self.flush()
+            except Exception as e:
+                sys.stderr.write(f'Error guardando la auditoría: {e}\n')
+
+    def _at_exit(self):
+        if self._pid == os.getpid():
+            self.flush()
+
+    def flush(self):
+        """Inserta lo encolado en lotes; lo que no entra va al archivo de respaldo"""
+        with self._write_lock:
+            while self._entries:
+                batch = []
+                while self._entries and len(batch) < self.batch_size:
+                    batch.append(self._entries.popleft())
+                failed = self._insert(batch)
+                if len(failed) == len(batch):
+                    # BD no disponible: no se insiste con el resto de la cola
+                    self._write_fallback(failed + list(_drain(self._entries)))
+                    return
+                self._write_fallback(failed)
+            self._replay_fallback()
+
+    def _insert(self, rows):
+        """Inserta las filas; devuelve las que no se pudieron guardar"""
+        if not self.db_enabled:
+            return rows
+        try:
+            if self._engine is None:
+                self._engine = create_background_engine(self.app.config)
+            self._execute(rows)
+            return []
+        except Exception as e:
+            self.errors += 1
+            sys.stderr.write(f'No se pudieron guardar {len(rows)} entrada(s) de auditoría: {e}\n')
+        if len(rows) == 1:
+            return rows
+        failed = []
+        for row in rows:
+            try:
+                self._execute([row])
+            except Exception:
+                failed.append(row)
+        return failed
+
+    def _execute(self, rows):
+        from ..database.models import AuditLog
+        with self._engine.begin() as conn:
+            conn.execute(AuditLog.__table__.insert(), rows)
+        self.written += len(rows)
+
+    # --------------------------------------------------------
+    # Archivo de respaldo (JSON por línea)
+    # --------------------------------------------------------
+    def _write_fallback(self, entries, suffix=''):
+        if not entries or not self.fallback_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.fallback_file), exist_ok=True)
+            with open(self.fallback_file + suffix, 'a', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, default=str) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self.fallback += len(entries)
+        except OSError as e:
+            sys.stderr.write(f'Se perdieron {len(entries)} entrada(s) de auditoría: {e}\n')
+
+    def _replay_fallback(self):
+        """Reintenta el respaldo; se toma con rename para que un solo worker lo procese"""
+        if not self.fallback_file or not self.db_enabled or not os.path.exists(self.fallback_file):
+            return
+        claimed = f'{self.fallback_file}.{os.getpid()}.replay'
+        try:
+            os.replace(self.fallback_file, claimed)
+        except OSError:
+            return
+        with open(claimed, encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        for entry in entries:
+            entry['fecha'] = datetime.fromisoformat(entry['fecha'])
+        for start in range(0, len(entries), self.batch_size):
+            batch = entries[start:start + self.batch_size]
+            failed = self._insert(batch)
+            if len(failed) == len(batch):
+                self._write_fallback(entries[start:])
+                break
+            # Con la BD disponible, una fila que falla no se va a poder guardar
+            self._write_fallback(failed, suffix='.rejected')
+        os.remove(claimed)
+
+    def status(self):
+        return {
+            'running': self._pid == os.getpid(),
+            'queued': len(self._entries),
+            'written': self.written,
+            'fallback': self.fallback,
+            'errors': self.errors,
+            'fallback_pending': bool(self.fallback_file and os.path.exists(self.fallback_file))
+        }
+
+
+def _drain(entries):
+    while entries:
+        yield entries.popleft()
+
+
+audit_writer = AuditWriter()
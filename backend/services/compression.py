@@ -0,0 +1,100 @@
+"""
+Compresión negociada de respuestas
+Comprime con brotli (si está instalado) o gzip las respuestas de texto/JSON
+que superan COMPRESS_MIN_SIZE, según el Accept-Encoding del cliente. Las
+respuestas en streaming (exportación del histórico) se comprimen con gzip
+al vuelo, vaciando el compresor en cada bloque para no frenar el envío.
+
+No se tocan las respuestas que ya traen Content-Encoding (assets
+precomprimidos), los archivos servidos con send_file ni los códigos sin
+cuerpo.
+"""
+
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from flask import request
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'application/javascript',
+    'text/javascript',
+    'text/html',
+    'text/css',
+    'text/csv',
+    'text/plain',
+    'image/svg+xml'
+}
+
+
+def _choose_encoding(allow_brotli=True):
+    accepted = request.accept_encodings
+    if allow_brotli and brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _gzip_stream_flushing(chunks, level):
+    """gzip al vuelo con Z_SYNC_FLUSH por bloque (el cliente recibe cada lote)"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def init_compression(app):
+    """Registra la compresión de respuestas en la aplicación"""
+    min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+    gzip_level = app.config.get('COMPRESS_GZIP_LEVEL', 6)
+    brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', 5)
+
+    @app.after_request
+    def compress_response(response):
+        if (response.status_code < 200 or response.status_code in (204, 304)
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        if response.is_streamed:
+            encoding = _choose_encoding(allow_brotli=False)
+            if encoding is None:
+                return response
+            response.response = _gzip_stream_flushing(response.response, gzip_level)
+            response.headers.pop('Content-Length', None)
+        else:
+            if response.content_length is not None and response.content_length < min_size:
+                return response
+            encoding = _choose_encoding()
+            if encoding is None:
+                return response
+            data = response.get_data()
+            if encoding == 'br':
+                response.set_data(brotli.compress(data, quality=brotli_quality))
+            else:
+                response.set_data(gzip.compress(data, compresslevel=gzip_level))
+
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # El cuerpo ya no es idéntico byte a byte al original
+            response.set_etag(etag, weak=True)
+        return response
+
+    app.extensions['compression'] = {
+        'min_size': min_size,
+        'encodings': (['br'] if brotli is not None else []) + ['gzip']
+    }
@@ -0,0 +1,183 @@
+"""
+Caché en memoria de la configuración de inspección activa
+Guarda Settings, los perfiles de ACModel (por id y por nombre) y los
+motores de IA (el activo y, por id, los usados en cascada), para no consultar la base de datos en cada frame o guardado.
+
+La invalidación usa una versión monótona guardada en un archivo compartido
+(CONFIG_VERSION_FILE). Las rutas de administración la incrementan tras
+modificar esas tablas; cada worker de gunicorn compara la versión como
+mucho cada CONFIG_VERSION_CHECK_MS milisegundos (un os.stat, sin consultas).
+"""
+
+import os
+import threading
+import time
+
+from flask import current_app
+
+from ..database.models import ACModel, InferenceEngine, Settings
+
+
+# ============================================================
+# VERSIÓN DE CONFIGURACIÓN (compartida entre workers)
+# ============================================================
+
+class ConfigVersion:
+    """Contador de versión respaldado por archivo, con chequeo limitado en el tiempo"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._path = None
+        self._check_interval = 0.5
+        self._last_check = 0.0
+        self._last_mtime = None
+        self._value = 0
+
+    def configure(self, path, check_interval_ms=500):
+        with self._lock:
+            self._path = path
+            self._check_interval = check_interval_ms / 1000
+            self._last_check = 0.0
+            self._last_mtime = None
+
+    def _ensure_configured(self):
+        if self._path is None:
+            self.configure(
+                current_app.config['CONFIG_VERSION_FILE'],
+                current_app.config.get('CONFIG_VERSION_CHECK_MS', 500)
+            )
+
+    def current(self):
+        """Versión vigente; relee el archivo solo si cambió su mtime"""
+        self._ensure_configured()
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_check < self._check_interval:
+                return self._value
+            self._last_check = now
+            try:
+                mtime = os.stat(self._path).st_mtime_ns
+            except FileNotFoundError:
+                return self._value
+            if mtime != self._last_mtime:
+                self._last_mtime = mtime
+                try:
+                    with open(self._path) as f:
+                        self._value = int(f.read().strip() or 0)
+                except (OSError, ValueError):
+                    pass
+            return self._value
+
+    def bump(self):
+        """Publica una versión nueva (escritura atómica: temporal + rename)"""
+        self._ensure_configured()
+        with self._lock:
+            # time_ns() es creciente entre procesos y evita leer-modificar-escribir
+            value = max(self._value + 1, time.time_ns())
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            tmp_path = f"{self._path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(str(value))
+            os.replace(tmp_path, self._path)
+            self._value = value
+            self._last_check = time.monotonic()
+            self._last_mtime = os.stat(self._path).st_mtime_ns
+            return value
+
+
+config_version = ConfigVersion()
+
+
+def bump_config_version():
+    """Invalida la caché de configuración en todos los workers"""
+    return config_version.bump()
+
+
+# ============================================================
+# CACHÉ DE CONFIGURACIÓN
+# ============================================================
+
+class ConfigCache:
+    """
+    Instantánea (diccionarios planos, sin objetos ORM) de la configuración
+    activa. Se recarga completa cuando cambia la versión: las tablas son
+    pequeñas y así no hay estados parciales.
+    """
+
+    def __init__(self, version):
+        self._version = version
+        self._lock = threading.Lock()
+        self._loaded_version = None
+        self._settings = None
+        self._ac_models_by_id = {}
+        self._ac_models_by_name = {}
+        self._active_engine = None
+        self._engines_by_id = {}
+
+    def _refresh(self):
+        version = self._version.current()
+        if self._loaded_version == version:
+            return
+        with self._lock:
+            if self._loaded_version == version:
+                return
+            settings = Settings.query.first()
+            ac_models = ACModel.query.all()
+            engines = InferenceEngine.query.all()
+
+            self._settings = settings.to_dict() if settings else None
+            self._ac_models_by_id = {m.id: m.to_dict() for m in ac_models}
+            self._ac_models_by_name = {m.nombre: m.to_dict() for m in ac_models}
+            self._engines_by_id = {}
+            self._active_engine = None
+            for engine in engines:
+                data = engine.to_dict()
+                data['hash_archivo'] = engine.hash_archivo
+                self._engines_by_id[engine.id] = data
+                if engine.activo and self._active_engine is None:
+                    self._active_engine = data
+            self._loaded_version = version
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_version = None
+
+    @property
+    def version(self):
+        self._refresh()
+        return self._loaded_version
+
+    def get_settings(self):
+        self._refresh()
+        return self._settings
+
+    def get_ac_model(self, model_id):
+        self._refresh()
+        return self._ac_models_by_id.get(model_id)
+
+    def get_ac_model_by_name(self, nombre):
+        self._refresh()
+        return self._ac_models_by_name.get(nombre)
+
+    def get_active_ac_model(self):
+        settings = self.get_settings()
+        if not settings or not settings['ac_model_activo_id']:
+            return None
+        return self.get_ac_model(settings['ac_model_activo_id'])
+
+    def get_active_engine(self):
+        self._refresh()
+        return self._active_engine
+
+    def get_engine(self, engine_id):
+        self._refresh()
+        return self._engines_by_id.get(engine_id)
+
+
+config_cache = ConfigCache(config_version)
+
+
+def notify_config_changed():
+    """Llamar tras hacer commit de cambios en Settings, ACModel o InferenceEngine"""
+    config_cache.invalidate()
+    bump_config_version()
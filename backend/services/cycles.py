@@ -0,0 +1,88 @@
+"""
+Salida anticipada de ciclos de inspección
+El servidor evalúa, frame a frame, si el conteo objetivo ya está confirmado:
+cuando `salida_anticipada_frames` frames consecutivos tienen exactamente
+`target_tornillos` detecciones con confianza >= `salida_anticipada_conf_min`
+(o, si el modelo tiene plantilla, todas las posiciones ocupadas), el ciclo
+puede cerrarse como PASS sin esperar a `inspection_cycle_time`.
+
+El estado del ciclo viaja con el cliente en un token firmado (el frame de
+una estación puede caer en cualquier worker de gunicorn): /process-frame lo
+recibe, lo actualiza y lo devuelve; /save-inspection lo verifica para
+registrar el tiempo de salida en la Detection.
+"""
+
+import time
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+
+TOKEN_SALT = 'inspection-cycle'
+
+
+def _serializer():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt=TOKEN_SALT)
+
+
+def early_exit_rule(profile):
+    """Parámetros de la regla del perfil, o None si está desactivada"""
+    if not profile or not profile.get('salida_anticipada_activa'):
+        return None
+    conf_min = profile.get('salida_anticipada_conf_min')
+    return {
+        'frames': max(1, profile.get('salida_anticipada_frames') or 1),
+        'conf_min': conf_min if conf_min is not None else profile['confidence_threshold'],
+        'target': profile['target_tornillos']
+    }
+
+
+def decode_cycle(token, profile):
+    """
+    Estado del ciclo a partir del token del cliente. Un token ausente,
+    inválido, de otro modelo o de un ciclo ya vencido inicia un ciclo nuevo.
+    """
+    now = time.time()
+    fresh = {'model_id': profile['id'], 'started': now, 'streak': 0, 'exit_s': None}
+    if not token:
+        return fresh
+    try:
+        state = _serializer().loads(token)
+    except BadSignature:
+        return fresh
+    max_age = (profile.get('inspection_cycle_time') or 20) * 2
+    if state.get('model_id') != profile['id'] or now - state.get('started', 0) > max_age:
+        return fresh
+    return state
+
+
+def update_cycle(state, detections, rule, slots=None):
+    """Aplica la regla al frame actual y devuelve la respuesta para el cliente"""
+    elapsed = time.time() - state['started']
+    if state['exit_s'] is None:
+        if slots is not None:
+            complete = '0' not in slots['slots']
+        else:
+            complete = sum(1 for d in detections if d['confidence'] >= rule['conf_min']) == rule['target']
+        state['streak'] = state['streak'] + 1 if complete else 0
+        if state['streak'] >= rule['frames']:
+            state['exit_s'] = round(elapsed, 3)
+    return {
+        'token': _serializer().dumps(state),
+        'stable_frames': state['streak'],
+        'required_frames': rule['frames'],
+        'elapsed_s': round(elapsed, 3),
+        'early_exit': state['exit_s'] is not None
+    }
+
+
+def verified_exit_time(token, profile):
+    """Segundos hasta la salida anticipada si el token la confirma, si no None"""
+    if not token or not profile:
+        return None
+    try:
+        state = _serializer().loads(token)
+    except BadSignature:
+        return None
+    if state.get('model_id') != profile['id']:
+        return None
+    return state.get('exit_s')
@@ -0,0 +1,245 @@
+"""
+Exportación en streaming del histórico de detecciones
+Las filas se leen en lotes (yield_per / cursor del servidor) y se codifican
+a medida que se envían, de modo que la memoria del worker se mantiene
+constante sin importar el tamaño del rango exportado.
+"""
+
+import csv
+import io
+import os
+import zlib
+from datetime import datetime, timedelta
+from itertools import chain
+
+from flask import current_app
+
+from .jobs import register_job
+from .json_provider import dumps_bytes
+
+EXPORT_COLUMNS = ['id', 'user', 'status', 'confidence', 'detection_count', 'timestamp']
+
+EXPORT_FORMATS = {
+    'json': ('application/json', 'json'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def iter_batches(query, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Recorre la consulta en lotes de `batch_size` filas usando un cursor del
+    servidor (en PostgreSQL) en lugar de cargar todo con .all().
+    """
+    batch = []
+    for row in query.yield_per(batch_size):
+        batch.append(_row_to_record(row))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _row_to_record(row):
+    return {
+        'id': row.id,
+        'user': row.username,
+        'status': row.status,
+        'confidence': row.confidence,
+        'detection_count': row.detection_count,
+        'timestamp': row.timestamp.isoformat() if row.timestamp else None
+    }
+
+
+# ============================================================
+# CODIFICADORES (generadores de bytes)
+# ============================================================
+
+def json_stream(batches, header):
+    """JSON con la misma envoltura que la exportación clásica ({'export': {...}})"""
+    head = dumps_bytes({'export': header})
+    # Abrimos el objeto 'export' y dejamos la lista de detecciones abierta
+    yield head[:-2] + b', "detections": ['
+    total = 0
+    for batch in batches:
+        chunk = b','.join(dumps_bytes(r) for r in batch)
+        if total:
+            chunk = b',' + chunk
+        total += len(batch)
+        yield chunk
+    yield f'], "total_records": {total}}}}}'.encode('utf-8')
+
+
+def ndjson_stream(batches):
+    """Un objeto JSON por línea"""
+    for batch in batches:
+        yield b''.join(dumps_bytes(r) + b'\n' for r in batch)
+
+
+def csv_stream(batches):
+    """CSV con cabecera; cada lote se escribe en un buffer reutilizado"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Archivo de solo escritura cuyo contenido se vacía tras cada lote"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def parquet_stream(batches):
+    """
+    Parquet construido por record batches (pyarrow es opcional).
+    Cada lote se escribe como un row group y se envía de inmediato.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('user', pa.string()),
+        ('status', pa.string()),
+        ('confidence', pa.float64()),
+        ('detection_count', pa.int64()),
+        ('timestamp', pa.timestamp('us')),
+    ])
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    try:
+        for batch in batches:
+            columns = {name: [r[name] for r in batch] for name in EXPORT_COLUMNS}
+            columns['timestamp'] = [
+                datetime.fromisoformat(ts) if ts else None for ts in columns['timestamp']
+            ]
+            writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def parquet_available():
+    """Indica si pyarrow está instalado"""
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def gzip_stream(chunks, level=6):
+    """Comprime al vuelo un generador de bytes en formato gzip"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# ============================================================
+# EXPORTACIÓN COMO TRABAJO EN SEGUNDO PLANO
+# ============================================================
+
+@register_job('history.export')
+def export_job(ctx, team, days=7, format='csv', compress=False):
+    """
+    Genera el archivo de exportación en EXPORT_FOLDER en lugar de mantener
+    abierta la petición HTTP. Se descarga luego desde /api/admin/jobs/<id>/download.
+    """
+    from ..database.models import db, User, Detection
+    from .retention import iter_archived_batches
+
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Formato no soportado: {format}")
+
+    start_date = datetime.utcnow() - timedelta(days=days)
+    base_query = db.session.query(Detection.id).filter(
+        Detection.team == team, Detection.timestamp >= start_date
+    )
+    total = base_query.count()
+    query = db.session.query(
+        Detection.id, User.username, Detection.status, Detection.confidence,
+        Detection.detection_count, Detection.timestamp
+    ).join(User, Detection.user_id == User.id).filter(
+        Detection.team == team, Detection.timestamp >= start_date
+    ).order_by(Detection.timestamp.desc())
+
+    state = {'rows': 0}
+
+    def tracked(batches):
+        for batch in batches:
+            yield batch
+            state['rows'] += len(batch)
+            ctx.progress(min(state['rows'] / total * 100, 99) if total else 99, f"{state['rows']} filas")
+            ctx.check_cancelled()
+
+    batches = tracked(chain(iter_batches(query), iter_archived_batches(team, start_date)))
+    if format == 'json':
+        chunks = json_stream(batches, {
+            'team': team, 'exported_at': datetime.utcnow().isoformat(), 'period_days': days
+        })
+    elif format == 'ndjson':
+        chunks = ndjson_stream(batches)
+    elif format == 'csv':
+        chunks = csv_stream(batches)
+    else:
+        chunks = parquet_stream(batches)
+        compress = False
+    if compress:
+        chunks = gzip_stream(chunks)
+
+    folder = current_app.config['EXPORT_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    extension = EXPORT_FORMATS[format][1] + ('.gz' if compress else '')
+    filename = f"historial_{ctx.job_id}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    final_path = os.path.join(folder, filename)
+    tmp_path = final_path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, final_path)
+
+    return {'file': filename, 'rows': state['rows'], 'bytes': os.path.getsize(final_path)}
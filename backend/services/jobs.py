@@ -0,0 +1,210 @@
+"""
+Ejecutor local de trabajos en segundo plano
+Los trabajos largos (exportaciones, archivo de detecciones, carga de
+modelos...) se registran en la tabla 'background_jobs' y se ejecutan en un
+pool de hilos del propio worker, sin broker externo. El estado, el progreso
+y la cancelación viven en la base de datos, así que cualquier worker puede
+consultarlos o cancelarlos.
+
+Registro de un tipo de trabajo:
+
+    @register_job('retention.archive')
+    def archive_job(ctx, days=None):
+        ctx.progress(50, 'Mitad del trabajo')
+        ctx.check_cancelled()
+        return {'archived': 10}
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from ..database.models import db, BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def register_job(tipo):
+    """Decorador que registra la función que ejecuta un tipo de trabajo"""
+    def decorator(fn):
+        _registry[tipo] = fn
+        return fn
+    return decorator
+
+
+def registered_job_types():
+    return sorted(_registry)
+
+
+class JobCancelled(Exception):
+    """Lanzada por JobContext.check_cancelled() cuando se pidió cancelar"""
+
+
+class JobContext:
+    """
+    Interfaz que recibe la función del trabajo para informar progreso.
+    Progreso y cancelación usan una conexión propia (db.engine), no la
+    sesión del trabajo: un commit en esa sesión invalidaría el cursor del
+    servidor con el que el trabajo puede estar recorriendo una consulta
+    (yield_per en PostgreSQL).
+    """
+
+    def __init__(self, job_id, poll_interval=1.0):
+        self.job_id = job_id
+        self._poll_interval = poll_interval
+        self._last_poll = 0.0
+        self._cancelled = False
+
+    def progress(self, percent, message=None):
+        """Actualiza el progreso (0..100) y el latido del trabajo"""
+        values = {'progress': float(percent), 'heartbeat_at': datetime.utcnow()}
+        if message is not None:
+            values['message'] = message[:255]
+        table = BackgroundJob.__table__
+        with db.engine.begin() as conn:
+            conn.execute(table.update().where(table.c.id == self.job_id).values(**values))
+
+    def cancelled(self):
+        """True si se pidió cancelar (consulta la BD como mucho cada poll_interval)"""
+        if self._cancelled:
+            return True
+        now = time.monotonic()
+        if now - self._last_poll >= self._poll_interval:
+            self._last_poll = now
+            table = BackgroundJob.__table__
+            with db.engine.connect() as conn:
+                flag = conn.execute(
+                    select(table.c.cancel_requested).where(table.c.id == self.job_id)
+                ).scalar()
+            self._cancelled = bool(flag)
+        return self._cancelled
+
+    def check_cancelled(self):
+        if self.cancelled():
+            raise JobCancelled()
+
+
+class JobRunner:
+    """Pool local de hilos; se crea de forma perezosa (después del fork de gunicorn)"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['job_runner'] = self
+
+    def _get_executor(self):
+        with self._lock:
+            # Tras un fork el pool heredado no tiene hilos: se crea uno nuevo
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.app.config.get('JOB_WORKERS', 2),
+                    thread_name_prefix='background-job'
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def submit(self, tipo, params=None, user_id=None):
+        """Crea el registro del trabajo y lo encola en el pool de este worker"""
+        if tipo not in _registry:
+            raise ValueError(f"Tipo de trabajo desconocido: {tipo}")
+
+        job = BackgroundJob(
+            tipo=tipo,
+            status='queued',
+            params=json.dumps(params or {}),
+            creado_por_id=user_id,
+            message='En cola'
+        )
+        db.session.add(job)
+        db.session.commit()
+        self._get_executor().submit(self._run, job.id)
+        return job
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            job = db.session.get(BackgroundJob, job_id)
+            if job is None:
+                return
+            if job.cancel_requested:
+                self._finish(job, 'cancelled', message='Cancelado antes de iniciar')
+                return
+
+            job.status = 'running'
+            job.started_at = datetime.utcnow()
+            job.heartbeat_at = job.started_at
+            job.worker = f"{socket.gethostname()}:{os.getpid()}"
+            job.message = 'En ejecución'
+            db.session.commit()
+
+            ctx = JobContext(job_id, self.app.config.get('JOB_CANCEL_POLL_SECONDS', 1.0))
+            try:
+                result = _registry[job.tipo](ctx, **json.loads(job.params or '{}'))
+            except JobCancelled:
+                db.session.rollback()
+                self._finish(db.session.get(BackgroundJob, job_id), 'cancelled', message='Cancelado')
+            except Exception as e:
+                db.session.rollback()
+                logger.exception('Trabajo %s fallido', job_id)
+                self._finish(db.session.get(BackgroundJob, job_id), 'failed', error=str(e), message='Error')
+            else:
+                self._finish(db.session.get(BackgroundJob, job_id), 'succeeded', result=result, message='Completado')
+            finally:
+                db.session.remove()
+
+    def _finish(self, job, status, result=None, error=None, message=''):
+        job.status = status
+        job.finished_at = datetime.utcnow()
+        job.heartbeat_at = job.finished_at
+        job.message = message
+        if status == 'succeeded':
+            job.progress = 100.0
+            job.result = json.dumps(result, default=str) if result is not None else None
+        job.error = error
+        db.session.commit()
+
+
+def request_cancel(job):
+    """Marca el trabajo para cancelar; el hilo que lo ejecuta lo detecta al consultar"""
+    if job.status in ('succeeded', 'failed', 'cancelled'):
+        return False
+    job.cancel_requested = True
+    db.session.commit()
+    return True
+
+
+def mark_stale_jobs(stale_seconds):
+    """
+    Marca como fallidos los trabajos 'running' sin latido reciente (el worker
+    que los ejecutaba se reinició o murió).
+    """
+    limit = datetime.utcnow() - timedelta(seconds=stale_seconds)
+    count = BackgroundJob.query.filter(
+        BackgroundJob.status == 'running',
+        BackgroundJob.heartbeat_at < limit
+    ).update({
+        'status': 'failed',
+        'error': 'El worker que ejecutaba el trabajo dejó de responder',
+        'finished_at': datetime.utcnow()
+    }, synchronize_session=False)
+    if count:
+        db.session.commit()
+    return count
+
+
+job_runner = JobRunner()
@@ -0,0 +1,71 @@
+"""
+Proveedor JSON de la aplicación
+Reemplaza el codificador de la librería estándar en jsonify(),
+request.get_json() y app.json por orjson cuando está instalado (opcional).
+En ambos casos serializa escalares y arrays de NumPy directamente, así el
+detector puede devolver sus resultados sin convertir cada valor a float/int.
+
+Las fechas mantienen el formato HTTP que usa Flask por defecto.
+"""
+
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _numpy_default(o):
+    """Escalares/arrays de NumPy a tipos nativos sin importar numpy"""
+    if type(o).__module__ == 'numpy' and hasattr(o, 'tolist'):
+        return o.tolist()
+    return DefaultJSONProvider.default(o)
+
+
+def dumps_bytes(obj):
+    """Serializa a bytes UTF-8 compactos (usado por los streams de exportación)"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_numpy_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=_numpy_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON con orjson (si está disponible) y soporte de NumPy"""
+
+    # Ordenar claves no aporta nada a los clientes de la API y cuesta CPU
+    sort_keys = False
+    default = staticmethod(_numpy_default)
+
+    @property
+    def backend(self):
+        return 'orjson' if orjson is not None else 'json'
+
+    def _orjson_options(self, indent=False):
+        options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._orjson_options()).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        # orjson devuelve bytes: se evita el paso intermedio por str
+        body = orjson.dumps(obj, default=self.default, option=self._orjson_options(indent))
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,425 @@
+"""
+Generador de carga: simula N estaciones de inspección
+Cada estación sigue el mismo protocolo que detection.html:
+login -> /detection/config -> ciclos de /detection/process-frame a la tasa
+objetivo (el siguiente frame sale cuando llega la respuesta, como en el
+navegador) -> /detection/save-inspection al cerrar cada ciclo. Además,
+usuarios de dashboard consultan /dashboard/overview periódicamente.
+
+Al final informa, por endpoint: peticiones, throughput, percentiles de
+latencia y tasa de error.
+
+Uso:
+    flask loadtest --url http://servidor:5000 --stations 8 --fps 5 --duration 120
+    flask loadtest --in-process --stations 4 --duration 30   # CI, sin pesos
+
+--in-process levanta la aplicación en un hilo con el detector simulado
+(backend 'stub') y crea los usuarios/modelo de prueba si faltan; conviene
+apuntar DATABASE_URL a una base desechable.
+"""
+
+import base64
+import glob
+import gzip
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from http.client import HTTPConnection, HTTPSConnection
+from urllib.parse import urlsplit
+
+import click
+from flask import current_app
+from werkzeug.security import generate_password_hash
+
+from ..database.models import db, User, ACModel, InferenceEngine, Settings
+
+LOADTEST_USER = 'loadtest'
+LOADTEST_ADMIN = 'loadtest_admin'
+LOADTEST_TEAM = 'LoadTest'
+
+
+# ============================================================
+# MÉTRICAS
+# ============================================================
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class LoadStats:
+    """Latencias y errores por endpoint, compartidas por todos los hilos"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_samples = {}
+
+    def record(self, endpoint, seconds, ok, detail=None):
+        with self._lock:
+            self.latencies[endpoint].append(seconds * 1000)
+            if not ok:
+                self.errors[endpoint] += 1
+                self.error_samples.setdefault(endpoint, detail)
+
+    def report(self, elapsed):
+        endpoints = {}
+        with self._lock:
+            for endpoint, values in sorted(self.latencies.items()):
+                values = sorted(values)
+                count = len(values)
+                endpoints[endpoint] = {
+                    'requests': count,
+                    'throughput_rps': round(count / elapsed, 2) if elapsed else 0.0,
+                    'errors': self.errors[endpoint],
+                    'error_rate': round(self.errors[endpoint] / count, 4) if count else 0.0,
+                    'p50_ms': round(_percentile(values, 50), 1),
+                    'p90_ms': round(_percentile(values, 90), 1),
+                    'p95_ms': round(_percentile(values, 95), 1),
+                    'p99_ms': round(_percentile(values, 99), 1),
+                    'max_ms': round(values[-1], 1) if values else 0.0,
+                    'first_error': self.error_samples.get(endpoint)
+                }
+        return endpoints
+
+
+# ============================================================
+# FRAMES
+# ============================================================
+
+def _load_recorded_frames(folder):
+    paths = sorted(glob.glob(os.path.join(folder, '*.jpg')) + glob.glob(os.path.join(folder, '*.jpeg')))
+    frames = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            frames.append(f.read())
+    return frames
+
+
+def _synthetic_frames(count, width, height, seed=0):
+    """JPEGs sintéticos: fondo con ruido y tornillos (círculos) en posiciones variables"""
+    import numpy as np
+    import cv2
+
+    rng = np.random.RandomState(seed)
+    frames = []
+    for _ in range(count):
+        image = rng.randint(60, 120, (height, width, 3), dtype=np.uint8)
+        for _ in range(rng.randint(2, 7)):
+            center = (int(rng.randint(20, width - 20)), int(rng.randint(20, height - 20)))
+            cv2.circle(image, center, int(rng.randint(6, 14)), (200, 200, 210), -1)
+        ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        if ok:
+            frames.append(encoded.tobytes())
+    return frames
+
+
+def _as_data_urls(frames):
+    # Mismo formato que canvas.toDataURL('image/jpeg') en el navegador
+    return ['data:image/jpeg;base64,' + base64.b64encode(f).decode('ascii') for f in frames]
+
+
+# ============================================================
+# CLIENTES SIMULADOS
+# ============================================================
+
+class _Client:
+    """Conexión HTTP persistente (keep-alive) con token y medición de cada petición"""
+
+    def __init__(self, base_url, stats, timeout):
+        parsed = urlsplit(base_url)
+        self._connection_class = HTTPSConnection if parsed.scheme == 'https' else HTTPConnection
+        self._netloc = parsed.netloc
+        self.prefix = parsed.path.rstrip('/')
+        self.stats = stats
+        self.timeout = timeout
+        # Como el navegador: acepta gzip y paga la descompresión
+        self.headers = {'Accept-Encoding': 'gzip'}
+        self._connection = None
+
+    def _request(self, method, path, payload):
+        if self._connection is None:
+            self._connection = self._connection_class(self._netloc, timeout=self.timeout)
+        headers = dict(self.headers)
+        body = None
+        if payload is not None:
+            body = json.dumps(payload).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        try:
+            self._connection.request(method, self.prefix + path, body=body, headers=headers)
+            response = self._connection.getresponse()
+            data = response.read()
+            if response.getheader('Content-Encoding') == 'gzip':
+                data = gzip.decompress(data)
+            return response.status, data
+        except Exception:
+            # Conexión cerrada por el servidor: la próxima petición reconecta
+            self._connection.close()
+            self._connection = None
+            raise
+
+    def call(self, method, endpoint, path, json_body=None):
+        start = time.perf_counter()
+        try:
+            status, body = self._request(method, path, json_body)
+        except Exception as e:
+            self.stats.record(endpoint, time.perf_counter() - start, False, f"{type(e).__name__}: {e}")
+            return None
+        ok = status < 400
+        self.stats.record(endpoint, time.perf_counter() - start, ok,
+                          None if ok else f"HTTP {status}: {body[:200].decode('utf-8', 'replace')}")
+        if not ok:
+            return None
+        try:
+            return json.loads(body)
+        except ValueError:
+            return None
+
+    def login(self, username, password):
+        data = self.call('POST', 'login', '/api/auth/login', {'username': username, 'password': password})
+        if not data or not data.get('access_token'):
+            return False
+        self.headers['Authorization'] = f"Bearer {data['access_token']}"
+        return True
+
+
+def _station(index, args, frames, stats, stop):
+    client = _Client(args['url'], stats, args['timeout'])
+    if not client.login(args['username'], args['password']):
+        return
+    config = client.call('GET', 'config', '/api/detection/config')
+    if not config or not config.get('success'):
+        return
+    rules = config['data']
+    cycle_seconds = args['cycle_seconds'] or rules['inspection_cycle_time']
+    interval = 1.0 / args['fps'] if args['fps'] > 0 else 0.0
+    frame_index = index  # Cada estación arranca en un frame distinto
+
+    while not stop.is_set():
+        cycle_end = time.monotonic() + cycle_seconds
+        best_count, confidences, cycle_token = 0, [], None
+        while not stop.is_set() and time.monotonic() < cycle_end:
+            started = time.monotonic()
+            result = client.call('POST', 'process-frame', '/api/detection/process-frame',
+                                 {'frame': frames[frame_index % len(frames)], 'cycle': cycle_token})
+            frame_index += 1
+            if result and result.get('success'):
+                valid = [d['confidence'] for d in result['detections']
+                         if d['confidence'] >= rules['confidence_threshold']]
+                if len(valid) >= best_count:
+                    best_count, confidences = len(valid), valid
+                cycle = result.get('cycle')
+                if cycle:
+                    cycle_token = cycle['token']
+                    if cycle['early_exit']:
+                        best_count = rules['target_tornillos']
+                        break
+            wait = interval - (time.monotonic() - started)
+            if wait > 0:
+                stop.wait(wait)
+
+        if stop.is_set():
+            break
+        client.call('POST', 'save-inspection', '/api/detection/save-inspection', {
+            'status': 'PASS' if best_count >= rules['target_tornillos'] else 'FAIL',
+            'detection_count': best_count,
+            'expected_count': rules['target_tornillos'],
+            'confidence': sum(confidences) / len(confidences) if confidences else 0.0,
+            'model_name': rules['model_name'],
+            'cycle': cycle_token
+        })
+
+
+def _dashboard_user(args, stats, stop):
+    client = _Client(args['url'], stats, args['timeout'])
+    if not client.login(args['dashboard_username'], args['dashboard_password']):
+        return
+    while not stop.is_set():
+        client.call('GET', 'overview', '/api/dashboard/overview')
+        stop.wait(args['poll_interval'])
+
+
+# ============================================================
+# MODO EN PROCESO (CI)
+# ============================================================
+
+def _get_or_create_user(username, role, password):
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        user = User(
+            username=username,
+            email=f'{username}@loadtest.local',
+            password_hash=generate_password_hash(password),
+            team=LOADTEST_TEAM,
+            role=role
+        )
+        db.session.add(user)
+        db.session.commit()
+    return user
+
+
+def seed_loadtest_data(password, target=4, cycle_seconds=5):
+    """Usuarios de prueba y, si no hay uno activo, motor/modelo de AA simulados"""
+    db.create_all()
+    admin = _get_or_create_user(LOADTEST_ADMIN, 'admin', password)
+    _get_or_create_user(LOADTEST_USER, 'operario', password)
+
+    settings = Settings.query.first()
+    if settings and settings.ac_model_activo_id:
+        return
+    engine = InferenceEngine(tipo='yolov8', version='stub', ruta_archivo='stub.pt',
+                             creado_por_id=admin.id, activo=True, descripcion='Motor simulado (loadtest)')
+    db.session.add(engine)
+    db.session.flush()
+    model = ACModel(nombre='LoadTest', target_tornillos=target, confidence_threshold=0.5,
+                    inspection_cycle_time=cycle_seconds, motor_inferencia_id=engine.id, creado_por_id=admin.id)
+    db.session.add(model)
+    db.session.flush()
+    if settings is None:
+        settings = Settings()
+        db.session.add(settings)
+    settings.ac_model_activo_id = model.id
+    db.session.commit()
+
+
+def _start_in_process_server(app):
+    from werkzeug.serving import make_server, WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        # Sin una línea de log por petición: distorsiona la medición
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, name='loadtest-server', daemon=True).start()
+    return server
+
+
+# ============================================================
+# COMANDO
+# ============================================================
+
+def run_load_test(args, frames, echo=print):
+    """Ejecuta la prueba y devuelve el informe (dict)"""
+    stats = LoadStats()
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=_station, args=(i, args, frames, stats, stop), name=f'station-{i}', daemon=True)
+        for i in range(args['stations'])
+    ] + [
+        threading.Thread(target=_dashboard_user, args=(args, stats, stop), name=f'dashboard-{i}', daemon=True)
+        for i in range(args['dashboards'])
+    ]
+
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+        if args['ramp_up'] and threads:
+            time.sleep(args['ramp_up'] / len(threads))
+    echo(f"{args['stations']} estaciones y {args['dashboards']} usuarios de dashboard durante {args['duration']}s...")
+    stop.wait(max(0.0, args['duration'] - (time.monotonic() - started)))
+    stop.set()
+    for thread in threads:
+        thread.join(args['timeout'] + 1)
+    elapsed = time.monotonic() - started
+
+    endpoints = stats.report(elapsed)
+    frames_done = endpoints.get('process-frame', {}).get('requests', 0)
+    return {
+        'url': args['url'],
+        'stations': args['stations'],
+        'dashboards': args['dashboards'],
+        'target_fps': args['fps'],
+        'duration_s': round(elapsed, 1),
+        'achieved_fps_per_station': round(frames_done / elapsed / args['stations'], 2) if args['stations'] and elapsed else 0.0,
+        'endpoints': endpoints
+    }
+
+
+def _print_report(report):
+    click.echo(f"\nDuración: {report['duration_s']}s  |  FPS por estación: "
+               f"{report['achieved_fps_per_station']} (objetivo {report['target_fps']})")
+    click.echo(f"{'endpoint':<16}{'req':>8}{'req/s':>9}{'err%':>8}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name, e in report['endpoints'].items():
+        click.echo(f"{name:<16}{e['requests']:>8}{e['throughput_rps']:>9}{e['error_rate'] * 100:>7.2f}%"
+                   f"{e['p50_ms']:>9}{e['p90_ms']:>9}{e['p95_ms']:>9}{e['p99_ms']:>9}{e['max_ms']:>9}")
+    for name, e in report['endpoints'].items():
+        if e['first_error']:
+            click.echo(f"  Primer error en {name}: {e['first_error']}")
+
+
+@click.command('loadtest')
+@click.option('--url', default='http://127.0.0.1:5000', help='Servidor a probar.')
+@click.option('--in-process', is_flag=True, help='Levanta la app en este proceso con el detector simulado.')
+@click.option('--stations', type=int, default=4, help='Estaciones de inspección simuladas.')
+@click.option('--dashboards', type=int, default=1, help='Usuarios consultando /overview.')
+@click.option('--fps', type=float, default=5.0, help='Frames por segundo objetivo por estación (0 = sin pausa).')
+@click.option('--duration', type=float, default=60.0, help='Duración de la prueba en segundos.')
+@click.option('--cycle-seconds', type=float, default=None, help='Duración del ciclo (por defecto la del modelo de AA).')
+@click.option('--poll-interval', type=float, default=5.0, help='Segundos entre consultas del dashboard.')
+@click.option('--ramp-up', type=float, default=0.0, help='Segundos para arrancar todos los clientes.')
+@click.option('--frames', 'frames_dir', default=None, help='Carpeta con JPEGs grabados (por defecto, sintéticos).')
+@click.option('--frame-size', default='640x480', help='Tamaño de los frames sintéticos (AnchoxAlto).')
+@click.option('--username', default=LOADTEST_USER, help='Usuario de las estaciones.')
+@click.option('--password', default='loadtest', help='Contraseña de las estaciones.')
+@click.option('--dashboard-username', default=LOADTEST_ADMIN, help='Usuario admin/soporte del dashboard.')
+@click.option('--dashboard-password', default=None, help='Contraseña del dashboard (por defecto, --password).')
+@click.option('--timeout', type=float, default=30.0, help='Timeout por petición en segundos.')
+@click.option('--json', 'json_path', default=None, help='Guarda el informe en este archivo JSON.')
+@click.option('--max-error-rate', type=float, default=None, help='Sale con código 1 si algún endpoint lo supera.')
+def loadtest_command(url, in_process, stations, dashboards, fps, duration, cycle_seconds, poll_interval,
+                     ramp_up, frames_dir, frame_size, username, password, dashboard_username,
+                     dashboard_password, timeout, json_path, max_error_rate):
+    """Prueba de carga simulando estaciones de inspección."""
+    if frames_dir:
+        frames = _load_recorded_frames(frames_dir)
+        if not frames:
+            raise click.ClickException(f"No hay JPEGs en {frames_dir}")
+    else:
+        width, height = (int(v) for v in frame_size.lower().split('x'))
+        frames = _synthetic_frames(16, width, height)
+
+    server = None
+    if in_process:
+        from ..vision.manager import detector_manager, cascade_manager
+        app = current_app._get_current_object()
+        for manager in (detector_manager, cascade_manager):
+            manager.configure(upload_folder=app.config['UPLOAD_FOLDER'], stub=True,
+                              stub_latency_ms=app.config['INFERENCE_STUB_LATENCY_MS'])
+        # Los frames se repiten en bucle: con la caché por contenido casi
+        # ninguno llegaría al detector y la prueba no mediría la inferencia
+        from ..vision.result_cache import frame_result_cache
+        frame_result_cache.configure(0)
+        seed_loadtest_data(password)
+        server = _start_in_process_server(app)
+        url = f"http://127.0.0.1:{server.server_port}"
+        click.echo(f"Servidor en proceso (detector simulado) en {url}")
+
+    args = {
+        'url': url, 'stations': stations, 'dashboards': dashboards, 'fps': fps,
+        'duration': duration, 'cycle_seconds': cycle_seconds, 'poll_interval': poll_interval,
+        'ramp_up': ramp_up, 'username': username, 'password': password,
+        'dashboard_username': dashboard_username, 'dashboard_password': dashboard_password or password,
+        'timeout': timeout
+    }
+    try:
+        report = run_load_test(args, _as_data_urls(frames), echo=click.echo)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    _print_report(report)
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        click.echo(f"Informe guardado en {json_path}")
+
+    if max_error_rate is not None:
+        worst = max((e['error_rate'] for e in report['endpoints'].values()), default=0.0)
+        if worst > max_error_rate or not report['endpoints']:
+            raise SystemExit(1)
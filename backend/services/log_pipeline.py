@@ -0,0 +1,334 @@
+"""
+Logging no bloqueante
+Los módulos usan logging.getLogger(__name__) como siempre; el logger del
+paquete ('backend') tiene un único handler que, en el hilo de la petición,
+solo filtra, formatea y agrega el registro a una cola en memoria. Un hilo
+de fondo por worker vacía la cola cada LOG_DRAIN_MS:
+
+- escribe en stdout y en un archivo rotativo por worker (LOG_FOLDER),
+- junta los registros >= LOG_DB_LEVEL y los inserta en 'system_logs' en
+  lotes (cada LOG_DB_FLUSH_SECONDS o LOG_DB_BATCH_SIZE registros).
+
+Una ráfaga de errores iguales (p. ej. frames corruptos) no se convierte en
+I/O: cada mensaje deja pasar LOG_RATE_BURST registros por ventana de
+LOG_RATE_WINDOW segundos y luego solo 1 de cada LOG_RATE_SAMPLE; al cerrar
+la ventana se registra cuántos se omitieron. Si la cola se llena, los
+registros se descartan (y se cuentan) en lugar de bloquear.
+
+Con workers gevent el hilo de fondo es un hilo nativo: sus escrituras no
+pasan por el hub. Tras un fork (preload_app) la cola y el hilo se recrean
+en el hijo con el primer registro.
+"""
+
+import atexit
+import collections
+import copy
+import logging
+import logging.handlers
+import os
+import sys
+import time
+from datetime import datetime
+
+from ..database.engine import create_background_engine, is_memory_database
+
+PACKAGE_LOGGER = __name__.split('.')[0]   # Padre de los loggers de todos los módulos
+LOG_FORMAT = '%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s'
+DB_MESSAGE_MAX = 8000                     # Caracteres por fila de system_logs
+
+
+def native_primitives():
+    """(allocate_lock, start_new_thread, sleep) reales aunque gevent haya parcheado el proceso"""
+    # Sin gevent cargado no hay parcheo posible: no se importa para comprobarlo
+    if 'gevent' in sys.modules:
+        from gevent import monkey
+        if monkey.is_module_patched('threading'):
+            return (
+                monkey.get_original('_thread', 'allocate_lock'),
+                monkey.get_original('_thread', 'start_new_thread'),
+                monkey.get_original('time', 'sleep')
+            )
+    import _thread
+    return _thread.allocate_lock, _thread.start_new_thread, time.sleep
+
+
+class RateLimiter:
+    """Ráfaga + muestreo por mensaje (logger, nivel, plantilla) y ventana de tiempo"""
+
+    def __init__(self, window=60, burst=5, sample=100, max_keys=1000):
+        self.configure(window, burst, sample, max_keys)
+        self.reset()
+
+    def configure(self, window=60, burst=5, sample=100, max_keys=1000):
+        self.window = window
+        self.burst = burst
+        self.sample = max(1, sample)
+        self.max_keys = max_keys
+
+    def reset(self):
+        self._lock = native_primitives()[0]()
+        self._keys = collections.OrderedDict()   # key -> [inicio de ventana, vistos, omitidos]
+        self._next_sweep = 0.0
+        self.suppressed = 0
+
+    def check(self, record):
+        """(dejar pasar, [(key, omitidos)] de ventanas cerradas)"""
+        msg = record.msg if isinstance(record.msg, str) else type(record.msg).__name__
+        key = (record.name, record.levelno, msg)
+        now = record.created
+        closed = []
+        with self._lock:
+            if now >= self._next_sweep:
+                closed = self._sweep(now)
+            entry = self._keys.get(key)
+            if entry is None or now - entry[0] >= self.window:
+                if entry is not None and entry[2]:
+                    closed.append((key, entry[2]))
+                entry = self._keys[key] = [now, 0, 0]
+                self._keys.move_to_end(key)
+                if len(self._keys) > self.max_keys:
+                    self._keys.popitem(last=False)
+            entry[1] += 1
+            seen = entry[1]
+            if seen <= self.burst or (seen - self.burst) % self.sample == 0:
+                return True, closed
+            entry[2] += 1
+            self.suppressed += 1
+            return False, closed
+
+    def _sweep(self, now):
+        """Cierra las ventanas vencidas de mensajes que no se repitieron"""
+        self._next_sweep = now + self.window
+        closed = []
+        for key in [k for k, e in self._keys.items() if now - e[0] >= self.window]:
+            entry = self._keys.pop(key)
+            if entry[2]:
+                closed.append((key, entry[2]))
+        return closed
+
+
+class QueueingHandler(logging.Handler):
+    """Handler del camino caliente: filtra, formatea y encola; nunca escribe"""
+
+    def __init__(self, pipeline):
+        super().__init__()
+        self.pipeline = pipeline
+        self.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    def handle(self, record):
+        # Sin el lock del handler: la cola admite productores concurrentes
+        if not self.filter(record):
+            return False
+        self.emit(record)
+        return True
+
+    def emit(self, record):
+        try:
+            allowed, closed = self.pipeline.limiter.check(record)
+            for (name, levelno, msg), count in closed:
+                self.pipeline.submit(logging.makeLogRecord({
+                    'name': name, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                    'msg': f'{count} registro(s) repetido(s) omitido(s) en {self.pipeline.limiter.window}s: '
+                           f'[{logging.getLevelName(levelno)}] {msg}'
+                }))
+            if allowed:
+                self.pipeline.submit(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+    def prepare(self, record):
+        """Como QueueHandler.prepare: el traceback se formatea aquí (los frames no viajan)"""
+        message = record.getMessage()
+        record = copy.copy(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatter.formatException(record.exc_info)
+        record.msg = message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+class LogPipeline:
+    def __init__(self):
+        self.app = None
+        self.folder = None
+        self.max_bytes = 10 * 1024 * 1024
+        self.backup_count = 5
+        self.stdout = True
+        self.drain_seconds = 0.25
+        self.queue_size = 10000
+        self.db_level = logging.WARNING
+        self.db_flush_seconds = 2.0
+        self.db_batch_size = 100
+        self.db_enabled = False
+        self.limiter = RateLimiter()
+        self.handler = QueueingHandler(self)
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+        atexit.register(self._at_exit)
+
+    def _reset(self):
+        """Estado por proceso: el hilo de fondo no sobrevive al fork"""
+        allocate_lock = native_primitives()[0]
+        self._lock = allocate_lock()
+        self._write_lock = allocate_lock()
+        self._records = collections.deque()
+        self._pid = None
+        self._handlers = []
+        self._db_rows = []
+        self._db_engine = None
+        self._last_db_flush = time.monotonic()
+        self.dropped = 0
+        self.written_db = 0
+        self.db_errors = 0
+        self.limiter.reset()
+
+    def init_app(self, app):
+        self.app = app
+        cfg = app.config
+        self.folder = cfg['LOG_FOLDER']
+        self.max_bytes = cfg['LOG_MAX_BYTES']
+        self.backup_count = cfg['LOG_BACKUP_COUNT']
+        self.stdout = cfg['LOG_STDOUT']
+        self.drain_seconds = cfg['LOG_DRAIN_MS'] / 1000
+        self.queue_size = cfg['LOG_QUEUE_SIZE']
+        self.db_level = logging.getLevelName(cfg['LOG_DB_LEVEL'])
+        self.db_flush_seconds = cfg['LOG_DB_FLUSH_SECONDS']
+        self.db_batch_size = cfg['LOG_DB_BATCH_SIZE']
+        self.db_enabled = not is_memory_database(cfg['SQLALCHEMY_DATABASE_URI'])
+        self.limiter.configure(cfg['LOG_RATE_WINDOW'], cfg['LOG_RATE_BURST'], cfg['LOG_RATE_SAMPLE'])
+
+        logger = logging.getLogger(PACKAGE_LOGGER)
+        logger.setLevel(cfg['LOG_LEVEL'])
+        if self.handler not in logger.handlers:
+            logger.addHandler(self.handler)
+        # La salida es la del hilo de fondo (sin duplicar en el logger raíz)
+        logger.propagate = False
+
+    # --------------------------------------------------------
+    # Productores (hilo de la petición)
+    # --------------------------------------------------------
+    def submit(self, record):
+        if self._pid != os.getpid():
+            self._start()
+        if len(self._records) >= self.queue_size:
+            self.dropped += 1
+            return
+        self._records.append(record)
+
+    # --------------------------------------------------------
+    # Hilo de fondo
+    # --------------------------------------------------------
+    def _build_handlers(self):
+        formatter = logging.Formatter(LOG_FORMAT)
+        handlers = []
+        if self.stdout:
+            handlers.append(logging.StreamHandler(sys.stdout))
+        if self.app is not None and self.folder:
+            os.makedirs(self.folder, exist_ok=True)
+            # Un archivo por worker: la rotación no se coordina entre procesos
+            index = os.getenv('WORKER_INDEX')
+            name = f'tornillo-{index}.log' if index is not None else 'tornillo.log'
+            handlers.append(logging.handlers.RotatingFileHandler(
+                os.path.join(self.folder, name),
+                maxBytes=self.max_bytes,
+                backupCount=self.backup_count,
+                encoding='utf-8'
+            ))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        return handlers
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            _, start_new_thread, sleep = native_primitives()
+            try:
+                self._handlers = self._build_handlers()
+            except OSError as e:
+                sys.stderr.write(f'No se pudo abrir el archivo de log: {e}\n')
+                self._handlers = [logging.StreamHandler(sys.stderr)]
+            self._pid = os.getpid()
+            start_new_thread(self._run, (self._pid, sleep))
+
+    def _run(self, pid, sleep):
+        while self._pid == pid:
+            sleep(self.drain_seconds)
+            try:
+                self.drain()
+            except Exception as e:
+                sys.stderr.write(f'Error escribiendo logs: {e}\n')
+
+    def _at_exit(self):
+        if self._pid == os.getpid():
+            self.drain(final=True)
+
+    def drain(self, final=False):
+        """Escribe lo encolado; también se llama al salir del proceso"""
+        with self._write_lock:
+            while True:
+                try:
+                    record = self._records.popleft()
+                except IndexError:
+                    break
+                for handler in self._handlers:
+                    # emit() directo: el único escritor es este hilo (bajo _write_lock)
+                    try:
+                        handler.emit(record)
+                    except Exception:
+                        pass
+                if self.db_enabled and record.levelno >= self.db_level:
+                    self._db_rows.append(_db_row(record))
+            for handler in self._handlers:
+                try:
+                    handler.flush()
+                except Exception:
+                    pass
+            if self._db_rows and (final or len(self._db_rows) >= self.db_batch_size
+                                  or time.monotonic() - self._last_db_flush >= self.db_flush_seconds):
+                self._write_db()
+
+    def _write_db(self):
+        rows, self._db_rows = self._db_rows, []
+        self._last_db_flush = time.monotonic()
+        try:
+            from ..database.models import SystemLog
+            with self._get_db_engine().begin() as conn:
+                conn.execute(SystemLog.__table__.insert(), rows)
+            self.written_db += len(rows)
+        except Exception as e:
+            # Nunca por logging: un error aquí volvería a entrar en la cola
+            self.db_errors += 1
+            sys.stderr.write(f'No se pudieron guardar {len(rows)} registro(s) en system_logs: {e}\n')
+
+    def _get_db_engine(self):
+        """Engine propio sin pool: las conexiones del pool de la app no se comparten con este hilo"""
+        if self._db_engine is None:
+            self._db_engine = create_background_engine(self.app.config)
+        return self._db_engine
+
+    def status(self):
+        return {
+            'running': self._pid == os.getpid(),
+            'queued': len(self._records),
+            'dropped': self.dropped,
+            'suppressed': self.limiter.suppressed,
+            'written_db': self.written_db,
+            'db_errors': self.db_errors
+        }
+
+
+def _db_row(record):
+    message = f'[{record.name}] {record.getMessage()}'
+    if record.exc_text:
+        message = f'{message}\n{record.exc_text}'
+    return {
+        'level': record.levelname,
+        'message': message[:DB_MESSAGE_MAX],
+        'timestamp': datetime.utcfromtimestamp(record.created)
+    }
+
+
+log_pipeline = LogPipeline()
@@ -0,0 +1,98 @@
+"""
+Memoria por proceso (RSS, PSS y USS)
+El RSS cuenta dos veces las páginas compartidas: con preload_app los pesos
+del modelo aparecen en el RSS de cada worker aunque existan una sola vez.
+Lo que cada worker agrega de verdad es su memoria única (USS = páginas
+privadas), y el PSS reparte las compartidas entre quienes las usan. Se
+leen de /proc/<pid>/smaps_rollup (Linux >= 4.14).
+
+    flask memory-report --master-pid 1   # master de gunicorn y sus workers
+"""
+
+import json
+import os
+
+import click
+
+_FIELDS = {
+    'Rss': 'rss_mb',
+    'Pss': 'pss_mb',
+    'Shared_Clean': 'shared_clean_mb',
+    'Shared_Dirty': 'shared_dirty_mb',
+    'Private_Clean': 'private_clean_mb',
+    'Private_Dirty': 'private_dirty_mb',
+    'Swap': 'swap_mb',
+}
+
+
+def process_memory(pid='self'):
+    """Memoria del proceso en MB, o None si /proc no está disponible"""
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    values = {}
+    for line in lines:
+        key, _, rest = line.partition(':')
+        if key in _FIELDS:
+            values[_FIELDS[key]] = round(int(rest.split()[0]) / 1024, 1)
+    values['uss_mb'] = round(values.get('private_clean_mb', 0) + values.get('private_dirty_mb', 0), 1)
+    values['pid'] = os.getpid() if pid == 'self' else int(pid)
+    return values
+
+
+def child_pids(pid):
+    """PIDs de los hijos directos (workers) de un proceso"""
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # El nombre va entre paréntesis y puede contener espacios
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def memory_report(master_pid):
+    """Master + workers con sus totales: RSS sumado vs. memoria real (PSS)"""
+    processes = []
+    master = process_memory(master_pid)
+    if master:
+        processes.append(dict(master, role='master'))
+    for pid in child_pids(master_pid):
+        usage = process_memory(pid)
+        if usage:
+            processes.append(dict(usage, role='worker'))
+    workers = [p for p in processes if p['role'] == 'worker']
+    return {
+        'processes': processes,
+        'total_rss_mb': round(sum(p.get('rss_mb', 0) for p in processes), 1),
+        'total_pss_mb': round(sum(p.get('pss_mb', 0) for p in processes), 1),
+        'avg_worker_uss_mb': round(sum(p['uss_mb'] for p in workers) / len(workers), 1) if workers else None
+    }
+
+
+@click.command('memory-report')
+@click.option('--master-pid', type=int, required=True, help='PID del master de gunicorn.')
+@click.option('--json', 'as_json', is_flag=True, help='Salida en JSON.')
+def memory_report_command(master_pid, as_json):
+    """RSS/PSS/USS del master de gunicorn y de cada worker"""
+    report = memory_report(master_pid)
+    if as_json:
+        click.echo(json.dumps(report, indent=2))
+        return
+    if not report['processes']:
+        click.echo(f'No se pudo leer /proc/{master_pid}/smaps_rollup')
+        raise SystemExit(1)
+    click.echo(f"{'PID':>8}  {'ROL':<7} {'RSS MB':>9} {'PSS MB':>9} {'USS MB':>9} {'COMPART. MB':>12}")
+    for p in report['processes']:
+        shared = p.get('shared_clean_mb', 0) + p.get('shared_dirty_mb', 0)
+        click.echo(f"{p['pid']:>8}  {p['role']:<7} {p.get('rss_mb', 0):>9} {p.get('pss_mb', 0):>9} {p['uss_mb']:>9} {shared:>12.1f}")
+    click.echo(f"RSS sumado: {report['total_rss_mb']} MB | memoria real (PSS): {report['total_pss_mb']} MB"
+               f" | USS medio por worker: {report['avg_worker_uss_mb']} MB")
@@ -0,0 +1,438 @@
+"""
+Retención de detecciones y archivo frío
+Mueve las filas de 'detections' más antiguas que DETECTION_RETENTION_DAYS a
+archivos Parquet comprimidos particionados por día, dejando en la base de
+datos solo los agregados diarios (DetectionRollup). Incluye la ruta de
+lectura usada por la exportación del histórico y, para PostgreSQL, el
+particionado nativo por rango de tiempo como alternativa.
+
+Uso:
+    flask retention run [--days N]
+    flask retention partition-postgres [--months-ahead N]
+"""
+
+import os
+import uuid
+from datetime import datetime, timedelta, date
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import func, text
+
+from ..database.models import db, User, Detection, DetectionRollup
+from .jobs import register_job
+
+ARCHIVE_COLUMNS = [
+    'id', 'ac_model_id', 'user_id', 'username', 'motor_inferencia_id', 'team',
+    'status', 'confidence', 'detection_count', 'expected_count', 'diferencia',
+    'image_path', 'duracion_inferencia', 'timestamp'
+]
+
+PARTITION_PREFIX = 'day='
+
+
+def _archive_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ('id', pa.int64()),
+        ('ac_model_id', pa.int64()),
+        ('user_id', pa.int64()),
+        ('username', pa.string()),
+        ('motor_inferencia_id', pa.int64()),
+        ('team', pa.string()),
+        ('status', pa.string()),
+        ('confidence', pa.float64()),
+        ('detection_count', pa.int64()),
+        ('expected_count', pa.int64()),
+        ('diferencia', pa.int64()),
+        ('image_path', pa.string()),
+        ('duracion_inferencia', pa.float64()),
+        ('timestamp', pa.timestamp('us')),
+    ])
+
+
+def _archive_folder():
+    return current_app.config['DETECTION_ARCHIVE_FOLDER']
+
+
+# ============================================================
+# ESCRITURA: MOVER FILAS ANTIGUAS AL ARCHIVO
+# ============================================================
+
+def archive_old_detections(retention_days=None, batch_size=5000, on_batch=None):
+    """
+    Archiva (y elimina de la tabla caliente) las detecciones anteriores al
+    corte. El corte se redondea a medianoche para que cada partición diaria
+    quede completa. Devuelve un resumen con filas y días archivados.
+
+    `on_batch(archivadas, pendientes)` se llama tras cada lote confirmado.
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise RuntimeError("El archivo de detecciones requiere pyarrow instalado.")
+
+    if retention_days is None:
+        retention_days = current_app.config['DETECTION_RETENTION_DAYS']
+    if retention_days <= 0:
+        return {'archived': 0, 'days': [], 'cutoff': None}
+
+    cutoff = datetime.combine(datetime.utcnow().date() - timedelta(days=retention_days), datetime.min.time())
+    archived = 0
+    days = set()
+    pending = Detection.query.filter(Detection.timestamp < cutoff).count() if on_batch else 0
+
+    while True:
+        rows = db.session.query(
+            Detection.id, Detection.ac_model_id, Detection.user_id,
+            User.username, Detection.motor_inferencia_id, Detection.team,
+            Detection.status, Detection.confidence, Detection.detection_count,
+            Detection.expected_count, Detection.diferencia, Detection.image_path,
+            Detection.duracion_inferencia, Detection.timestamp
+        ).outerjoin(User, Detection.user_id == User.id).filter(
+            Detection.timestamp < cutoff
+        ).order_by(Detection.timestamp, Detection.id).limit(batch_size).all()
+
+        if not rows:
+            break
+
+        by_day = {}
+        for row in rows:
+            by_day.setdefault(row.timestamp.date(), []).append(row._asdict())
+
+        try:
+            for day, records in by_day.items():
+                _write_partition(day, records)
+                _merge_rollups(day, records)
+                days.add(day)
+
+            ids = [row.id for row in rows]
+            Detection.query.filter(Detection.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        archived += len(rows)
+        if on_batch:
+            on_batch(archived, max(pending - archived, 0))
+
+    return {
+        'archived': archived,
+        'days': sorted(d.isoformat() for d in days),
+        'cutoff': cutoff.isoformat()
+    }
+
+
+def _write_partition(day, records):
+    """Escribe un archivo Parquet en la partición del día (temporal + rename)"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    partition_dir = os.path.join(_archive_folder(), f"{PARTITION_PREFIX}{day.isoformat()}")
+    os.makedirs(partition_dir, exist_ok=True)
+
+    columns = {name: [r[name] for r in records] for name in ARCHIVE_COLUMNS}
+    table = pa.Table.from_pydict(columns, schema=_archive_schema())
+
+    final_path = os.path.join(partition_dir, f"part-{records[0]['id']}-{records[-1]['id']}.parquet")
+    tmp_path = os.path.join(partition_dir, f".{uuid.uuid4().hex}.tmp")
+    pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, final_path)
+
+
+def _merge_rollups(day, records):
+    """Suma los registros archivados a los agregados diarios"""
+    groups = {}
+    for r in records:
+        key = (r['team'], r['user_id'], r['ac_model_id'], r['status'])
+        count, conf, dur = groups.get(key, (0, 0.0, 0.0))
+        groups[key] = (count + 1, conf + (r['confidence'] or 0.0), dur + (r['duracion_inferencia'] or 0.0))
+
+    for (team, user_id, ac_model_id, status), (count, conf, dur) in groups.items():
+        rollup = DetectionRollup.query.filter_by(
+            day=day, team=team, user_id=user_id, ac_model_id=ac_model_id, status=status
+        ).first()
+        if not rollup:
+            rollup = DetectionRollup(
+                day=day, team=team, user_id=user_id, ac_model_id=ac_model_id, status=status,
+                count=0, sum_confidence=0.0, sum_duracion_inferencia=0.0
+            )
+            db.session.add(rollup)
+        rollup.count += count
+        rollup.sum_confidence += conf
+        rollup.sum_duracion_inferencia += dur
+
+
+# ============================================================
+# LECTURA: ARCHIVO Y AGREGADOS
+# ============================================================
+
+def archived_days(start_date=None):
+    """Días con partición en el archivo, del más reciente al más antiguo"""
+    folder = _archive_folder()
+    if not os.path.isdir(folder):
+        return []
+
+    days = []
+    for name in os.listdir(folder):
+        if not name.startswith(PARTITION_PREFIX):
+            continue
+        try:
+            day = date.fromisoformat(name[len(PARTITION_PREFIX):])
+        except ValueError:
+            continue
+        if start_date is None or day >= start_date.date():
+            days.append(day)
+    return sorted(days, reverse=True)
+
+
+def iter_archived_batches(team, start_date, batch_size=1000):
+    """
+    Lee del archivo las detecciones del equipo desde `start_date`, en el
+    mismo formato de registro que la exportación y ordenadas de más reciente
+    a más antigua. Se lee una partición (un día) a la vez.
+    """
+    days = archived_days(start_date)
+    if not days:
+        return
+
+    import pyarrow.parquet as pq
+
+    folder = _archive_folder()
+    for day in days:
+        partition_dir = os.path.join(folder, f"{PARTITION_PREFIX}{day.isoformat()}")
+        files = [
+            os.path.join(partition_dir, f) for f in os.listdir(partition_dir)
+            if f.endswith('.parquet')
+        ]
+        if not files:
+            continue
+
+        table = pq.read_table(
+            files,
+            columns=['id', 'username', 'status', 'confidence', 'detection_count', 'timestamp'],
+            filters=[('team', '=', team), ('timestamp', '>=', start_date)]
+        )
+        rows = sorted(table.to_pylist(), key=lambda r: (r['timestamp'], r['id']), reverse=True)
+
+        seen = set()
+        batch = []
+        for r in rows:
+            # Un reintento tras un fallo parcial puede haber escrito la fila dos veces
+            if r['id'] in seen:
+                continue
+            seen.add(r['id'])
+            batch.append({
+                'id': r['id'],
+                'user': r['username'],
+                'status': r['status'],
+                'confidence': r['confidence'],
+                'detection_count': r['detection_count'],
+                'timestamp': r['timestamp'].isoformat()
+            })
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def rollup_totals(team=None, user_id=None):
+    """
+    Totales de las detecciones archivadas: (count, passed, sum_confidence,
+    sum_duracion_inferencia). Todo en cero si no hay agregados.
+    """
+    query = db.session.query(
+        func.coalesce(func.sum(DetectionRollup.count), 0),
+        func.coalesce(func.sum(
+            db.case((DetectionRollup.status == 'PASS', DetectionRollup.count), else_=0)
+        ), 0),
+        func.coalesce(func.sum(DetectionRollup.sum_confidence), 0.0),
+        func.coalesce(func.sum(DetectionRollup.sum_duracion_inferencia), 0.0)
+    )
+    if team is not None:
+        query = query.filter(DetectionRollup.team == team)
+    if user_id is not None:
+        query = query.filter(DetectionRollup.user_id == user_id)
+    return tuple(query.one())
+
+
+# ============================================================
+# POSTGRESQL: PARTICIONADO NATIVO POR MES
+# ============================================================
+
+def _month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def _next_month(value):
+    return date(value.year + (value.month == 12), value.month % 12 + 1, 1)
+
+
+def _partition_name(month):
+    return f"detections_p{month.year:04d}{month.month:02d}"
+
+
+def _partition_ddl(parent, month):
+    return (
+        f"CREATE TABLE IF NOT EXISTS {_partition_name(month)} PARTITION OF {parent} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+    )
+
+
+def is_postgres_partitioned():
+    """Indica si 'detections' ya es una tabla particionada en PostgreSQL"""
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return bool(db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = 'detections'"
+    )).scalar())
+
+
+def convert_detections_to_postgres_partitions(months_ahead=3):
+    """
+    Convierte 'detections' en una tabla particionada por RANGE(timestamp)
+    con una partición mensual. Se ejecuta en una sola transacción.
+
+    PostgreSQL exige que la clave primaria de una tabla particionada incluya
+    la columna de partición, así que queda (id, timestamp) aunque el modelo
+    Detection declare solo 'id'. El ORM no lo nota ('id' sigue siendo único
+    por la secuencia), pero ninguna tabla puede tener una FK a detections.id
+    y una migración autogenerada no debe "corregir" esa clave.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        raise RuntimeError("El particionado nativo solo está disponible en PostgreSQL.")
+    if is_postgres_partitioned():
+        return ensure_postgres_partitions(months_ahead)
+
+    oldest = db.session.query(func.min(Detection.timestamp)).scalar() or datetime.utcnow()
+    month = _month_start(oldest)
+    last = _month_start(datetime.utcnow().date() + timedelta(days=31 * months_ahead))
+
+    statements = [
+        "UPDATE detections SET timestamp = now() AT TIME ZONE 'utc' WHERE timestamp IS NULL",
+        "CREATE TABLE detections_p (LIKE detections INCLUDING DEFAULTS) PARTITION BY RANGE (timestamp)",
+        "ALTER TABLE detections_p ALTER COLUMN timestamp SET NOT NULL",
+        "ALTER TABLE detections_p ADD CONSTRAINT pk_detections_p PRIMARY KEY (id, timestamp)",
+    ]
+    created = []
+    while month <= last:
+        statements.append(_partition_ddl('detections_p', month))
+        created.append(_partition_name(month))
+        month = _next_month(month)
+    statements += [
+        "CREATE TABLE IF NOT EXISTS detections_pdefault PARTITION OF detections_p DEFAULT",
+        "INSERT INTO detections_p SELECT * FROM detections",
+        "ALTER SEQUENCE detections_id_seq OWNED BY detections_p.id",
+        "DROP TABLE detections",
+        "ALTER TABLE detections_p RENAME TO detections",
+        "ALTER TABLE detections RENAME CONSTRAINT pk_detections_p TO pk_detections",
+        "CREATE INDEX ix_detections_team_timestamp ON detections (team, timestamp, id)",
+        "CREATE INDEX ix_detections_user_id_timestamp ON detections (user_id, timestamp, id)",
+        "CREATE INDEX ix_detections_status ON detections (status)",
+        "CREATE INDEX ix_detections_ac_model_id ON detections (ac_model_id)",
+        "CREATE INDEX ix_detections_team ON detections (team)",
+        "CREATE INDEX ix_detections_user_id ON detections (user_id)",
+        "CREATE INDEX ix_detections_timestamp ON detections (timestamp)",
+        "ALTER TABLE detections ADD CONSTRAINT fk_detections_ac_model_id_ac_models "
+        "FOREIGN KEY (ac_model_id) REFERENCES ac_models (id)",
+        "ALTER TABLE detections ADD CONSTRAINT fk_detections_user_id_users "
+        "FOREIGN KEY (user_id) REFERENCES users (id)",
+        "ALTER TABLE detections ADD CONSTRAINT fk_detections_motor_inferencia_id_inference_engines "
+        "FOREIGN KEY (motor_inferencia_id) REFERENCES inference_engines (id)",
+    ]
+
+    try:
+        for statement in statements:
+            db.session.execute(text(statement))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return created
+
+
+def ensure_postgres_partitions(months_ahead=3):
+    """Crea las particiones mensuales de los próximos `months_ahead` meses"""
+    month = _month_start(datetime.utcnow().date())
+    created = []
+    for _ in range(months_ahead + 1):
+        db.session.execute(text(_partition_ddl('detections', month)))
+        created.append(_partition_name(month))
+        month = _next_month(month)
+    db.session.commit()
+    return created
+
+
+def drop_archived_postgres_partitions():
+    """
+    Elimina las particiones mensuales que quedaron vacías tras archivar.
+    Con particionado nativo, retirar un mes es un DROP TABLE instantáneo.
+    """
+    if not is_postgres_partitioned():
+        return []
+
+    names = db.session.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'detections' AND c.relname ~ '^detections_p[0-9]{6}$'"
+    )).scalars().all()
+
+    current = _partition_name(_month_start(datetime.utcnow().date()))
+    dropped = []
+    for name in sorted(names):
+        if name >= current:
+            continue
+        has_rows = db.session.execute(text(f"SELECT EXISTS (SELECT 1 FROM {name})")).scalar()
+        if not has_rows:
+            db.session.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+    db.session.commit()
+    return dropped
+
+
+# ============================================================
+# TRABAJO EN SEGUNDO PLANO
+# ============================================================
+
+@register_job('retention.archive')
+def archive_job(ctx, days=None):
+    """Archivo de detecciones lanzado desde /api/admin/jobs"""
+    def on_batch(archived, pending):
+        total = archived + pending
+        ctx.progress(archived / total * 100 if total else 100, f"{archived} detecciones archivadas")
+        ctx.check_cancelled()
+
+    summary = archive_old_detections(days, on_batch=on_batch)
+    summary['dropped_partitions'] = drop_archived_postgres_partitions()
+    return summary
+
+
+# ============================================================
+# COMANDOS CLI
+# ============================================================
+
+retention_cli = AppGroup('retention', help='Retención y archivo de detecciones.')
+
+
+@retention_cli.command('run')
+@click.option('--days', type=int, default=None, help='Días a conservar en la tabla (por defecto DETECTION_RETENTION_DAYS).')
+def run_retention_command(days):
+    """Archiva las detecciones antiguas y actualiza los agregados."""
+    summary = archive_old_detections(days)
+    click.echo(f"✓ {summary['archived']} detecciones archivadas (corte: {summary['cutoff']})")
+    dropped = drop_archived_postgres_partitions()
+    if dropped:
+        click.echo(f"✓ Particiones eliminadas: {', '.join(dropped)}")
+
+
+@retention_cli.command('partition-postgres')
+@click.option('--months-ahead', type=int, default=3, help='Meses futuros a pre-crear.')
+def partition_postgres_command(months_ahead):
+    """Convierte 'detections' en tabla particionada (solo PostgreSQL)."""
+    created = convert_detections_to_postgres_partitions(months_ahead)
+    click.echo(f"✓ Particiones disponibles: {', '.join(created)}")
@@ -0,0 +1,95 @@
+"""
+Medición del tiempo de arranque
+- Fases de create_app() medidas en el propio proceso
+  (app.extensions['startup']).
+- Informe de tiempos de import por módulo usando `python -X importtime`
+  en un subproceso limpio, para seguir regresiones (p. ej. que torch vuelva
+  a importarse al arrancar).
+
+Uso:
+    flask startup-report [--top N] [--json]
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+import click
+
+# Módulos pesados que no deberían cargarse al arrancar la app
+HEAVY_MODULES = ('torch', 'ultralytics', 'cv2', 'pyarrow')
+
+_IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+class StartupTimer:
+    """Acumula la duración de cada fase del arranque"""
+
+    def __init__(self):
+        self.phases = []
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, (time.perf_counter() - start) * 1000))
+
+    def report(self):
+        return {
+            'pid': os.getpid(),
+            'phases_ms': {name: round(ms, 1) for name, ms in self.phases},
+            'since_import_ms': round((time.perf_counter() - self._started) * 1000, 1),
+            'heavy_modules_loaded': [m for m in HEAVY_MODULES if m in sys.modules]
+        }
+
+
+def import_time_report(top=25, target='backend.app'):
+    """
+    Ejecuta `import <target>; create_app()` con -X importtime en un proceso
+    nuevo y devuelve el tiempo total y los módulos más costosos (acumulado).
+    """
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    code = f"import time; t = time.perf_counter(); import {target} as m; m.create_app(); print((time.perf_counter() - t) * 1000)"
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=root, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else 'Error al medir el arranque')
+
+    modules = []
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, _, name = match.groups()
+            modules.append({'module': name, 'self_ms': int(self_us) / 1000, 'cumulative_ms': int(cumulative_us) / 1000})
+
+    loaded = {m['module'] for m in modules}
+    return {
+        'total_ms': round(float(proc.stdout.strip().splitlines()[-1]), 1),
+        'heavy_modules_loaded': [m for m in HEAVY_MODULES if m in loaded],
+        'modules': sorted(modules, key=lambda m: m['cumulative_ms'], reverse=True)[:top]
+    }
+
+
+@click.command('startup-report')
+@click.option('--top', type=int, default=25, help='Cantidad de módulos a listar.')
+@click.option('--json', 'as_json', is_flag=True, help='Salida en JSON.')
+def startup_report_command(top, as_json):
+    """Tiempos de import por módulo al arrancar la aplicación."""
+    report = import_time_report(top)
+    if as_json:
+        click.echo(json.dumps(report, indent=2))
+        return
+    click.echo(f"Arranque total: {report['total_ms']:.1f} ms")
+    heavy = ', '.join(report['heavy_modules_loaded']) or 'ninguno'
+    click.echo(f"Módulos pesados importados al arrancar: {heavy}")
+    for m in report['modules']:
+        click.echo(f"  {m['cumulative_ms']:9.1f} ms  {m['module']}")
@@ -0,0 +1,319 @@
+"""
+Subida de archivos de modelos en streaming, reanudable y con hash
+El archivo se escribe por bloques directamente a disco mientras se calcula
+el SHA-256 de forma incremental (en la subida multipart, desde el parser:
+el cuerpo no se lee antes a memoria ni a un temporal de werkzeug). Las subidas por partes guardan su estado en
+UPLOAD_FOLDER/.partial (metadatos JSON + archivo .part), así que cualquier
+worker puede continuar una subida interrumpida desde el último byte recibido.
+Cada parte se escribe con un lock (fcntl) sobre el .part, de modo que dos
+PUT con el mismo offset en workers distintos no pueden agregarse ambos.
+El archivo final se publica con un rename atómico.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+from flask import current_app
+
+BLOCK_SIZE = 1024 * 1024  # 1 MB por lectura
+CHUNK_SIZE = 8 * 1024 * 1024  # Tamaño de parte sugerido al cliente
+STALE_UPLOAD_SECONDS = 24 * 3600
+
+_UPLOAD_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+# Hashers en curso de este worker: upload_id -> (offset, hasher)
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+class UploadError(ValueError):
+    """Error de validación de una subida"""
+
+
+class UploadOffsetMismatch(UploadError):
+    """La parte recibida no empieza donde termina lo ya escrito"""
+
+    def __init__(self, offset):
+        super().__init__(f"Offset incorrecto; el servidor tiene {offset} bytes")
+        self.offset = offset
+
+
+def _upload_folder():
+    return current_app.config['UPLOAD_FOLDER']
+
+
+def _partial_dir():
+    return os.path.join(_upload_folder(), '.partial')
+
+
+def _paths(upload_id):
+    if not _UPLOAD_ID_RE.match(upload_id or ''):
+        raise UploadError("Identificador de subida inválido")
+    base = os.path.join(_partial_dir(), upload_id)
+    return f"{base}.json", f"{base}.part"
+
+
+def _lock_file(f):
+    """Lock exclusivo entre procesos (sin fcntl, p. ej. Windows, no se bloquea)"""
+    try:
+        import fcntl
+    except ImportError:
+        return
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+
+def _hash_file(path, hasher=None):
+    hasher = hasher or hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            hasher.update(block)
+    return hasher
+
+
+# ============================================================
+# SUBIDA DIRECTA (multipart)
+# ============================================================
+
+class _HashingTempFile:
+    """
+    Destino de un archivo del multipart (stream_factory de werkzeug): cada
+    bloque que entrega el parser va directo a UPLOAD_FOLDER/.partial y al
+    SHA-256, sin pasar por la memoria ni por un temporal de werkzeug.
+    """
+
+    def __init__(self, max_size=None):
+        os.makedirs(_partial_dir(), exist_ok=True)
+        self.path = os.path.join(_partial_dir(), f"{uuid.uuid4().hex}.tmp")
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.max_size = max_size
+        self._file = open(self.path, 'w+b')
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_size and self.size > self.max_size:
+            raise UploadError("El archivo supera el tamaño máximo permitido")
+        self.hasher.update(data)
+        return self._file.write(data)
+
+    def discard(self):
+        self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __getattr__(self, name):
+        # seek/read/close/... los usa werkzeug al envolverlo en un FileStorage
+        return getattr(self._file, name)
+
+
+def stream_multipart_upload(req, field, max_size=None):
+    """
+    Parsea el multipart de la petición escribiendo el archivo `field` a disco
+    mientras llega (no se debe haber leído request.files/form antes).
+    Devuelve (form, ruta_temporal, sha256, tamaño, nombre del archivo).
+    """
+    from werkzeug.formparser import FormDataParser
+
+    targets = []
+
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        target = _HashingTempFile(max_size)
+        targets.append(target)
+        return target
+
+    parser = FormDataParser(
+        stream_factory=stream_factory,
+        max_form_memory_size=current_app.config.get('MAX_FORM_MEMORY_SIZE'),
+        silent=False
+    )
+    try:
+        _, form, files = parser.parse(req.stream, req.mimetype, req.content_length, req.mimetype_params)
+    except ValueError as e:
+        for target in targets:
+            target.discard()
+        if isinstance(e, UploadError):
+            raise
+        raise UploadError("El cuerpo multipart es inválido") from e
+    except Exception:
+        for target in targets:
+            target.discard()
+        raise
+
+    file = files.get(field)
+    result = None
+    for storage in (s for values in files.listvalues() for s in values):
+        target = storage.stream
+        if storage is file and result is None:
+            target.close()
+            result = (target.path, target.hasher.hexdigest(), target.size, file.filename)
+        else:
+            target.discard()
+    if result is None:
+        raise UploadError("No se proporcionó archivo")
+    return (form,) + result
+
+
+def publish_file(tmp_path, filename):
+    """Mueve el temporal a su nombre definitivo (rename atómico)"""
+    final_path = os.path.join(_upload_folder(), filename)
+    os.replace(tmp_path, final_path)
+    return final_path
+
+
+# ============================================================
+# SUBIDA POR PARTES (reanudable)
+# ============================================================
+
+def create_upload(metadata):
+    """Registra una subida nueva y devuelve su identificador"""
+    os.makedirs(_partial_dir(), exist_ok=True)
+    _purge_stale_uploads()
+
+    upload_id = uuid.uuid4().hex
+    meta_path, part_path = _paths(upload_id)
+    open(part_path, 'wb').close()
+    with open(meta_path, 'w') as f:
+        json.dump(metadata, f)
+    return upload_id
+
+
+def get_upload(upload_id):
+    """Metadatos y offset actual de la subida, o None si no existe"""
+    meta_path, part_path = _paths(upload_id)
+    if not os.path.exists(meta_path) or not os.path.exists(part_path):
+        return None
+    with open(meta_path) as f:
+        metadata = json.load(f)
+    metadata['offset'] = os.path.getsize(part_path)
+    return metadata
+
+
+def append_chunk(upload_id, offset, stream):
+    """
+    Añade al .part los bytes del stream a partir de `offset`. El offset debe
+    coincidir con lo ya escrito; si no, se informa el offset correcto para
+    que el cliente reanude desde ahí. Devuelve el nuevo offset.
+    """
+    upload = get_upload(upload_id)
+    if upload is None:
+        with _hashers_lock:
+            _hashers.pop(upload_id, None)
+        raise UploadError("La subida no existe o ya expiró")
+    if offset != upload['offset']:
+        raise UploadOffsetMismatch(upload['offset'])
+
+    # El hasher en curso se retira del dict mientras se escribe la parte: si
+    # la parte falla no vuelve, y la siguiente lo recalcula desde disco
+    _, part_path = _paths(upload_id)
+    with open(part_path, 'r+b') as f:
+        _lock_file(f)
+        # Con el lock tomado: otra petición pudo escribir esta misma parte
+        current = os.fstat(f.fileno()).st_size
+        if offset != current:
+            raise UploadOffsetMismatch(current)
+
+        with _hashers_lock:
+            state = _hashers.pop(upload_id, None)
+        if state and state[0] == offset:
+            hasher = state[1]
+        else:
+            # Otro worker recibió las partes anteriores: retomamos el hash desde disco
+            hasher = _hash_file(part_path)
+
+        size = offset
+        f.seek(offset)
+        try:
+            for block in iter(lambda: stream.read(BLOCK_SIZE), b''):
+                size += len(block)
+                if size > upload['size']:
+                    raise UploadError("Se recibieron más bytes que el tamaño declarado")
+                hasher.update(block)
+                f.write(block)
+            f.flush()
+        except Exception:
+            # Se descarta lo escrito de esta parte para que el offset sea consistente
+            f.flush()
+            f.truncate(offset)
+            raise
+
+    with _hashers_lock:
+        _hashers[upload_id] = (size, hasher)
+    return size
+
+
+def finish_upload(upload_id):
+    """
+    Verifica que la subida esté completa y devuelve (ruta_temporal, sha256,
+    tamaño, metadatos). La ruta temporal queda lista para publish_file().
+    """
+    upload = get_upload(upload_id)
+    if upload is None:
+        raise UploadError("La subida no existe o ya expiró")
+    if upload['offset'] != upload['size']:
+        raise UploadOffsetMismatch(upload['offset'])
+
+    meta_path, part_path = _paths(upload_id)
+    # Borrar los metadatos reclama la subida: si dos 'complete' compiten, solo uno sigue
+    try:
+        os.remove(meta_path)
+    except FileNotFoundError:
+        raise UploadError("La subida ya se completó o fue descartada")
+    finally:
+        with _hashers_lock:
+            state = _hashers.pop(upload_id, None)
+
+    if state and state[0] == upload['size']:
+        sha256 = state[1].hexdigest()
+    else:
+        sha256 = _hash_file(part_path).hexdigest()
+
+    expected = upload.get('sha256')
+    if expected and expected.lower() != sha256:
+        discard_upload(upload_id)
+        raise UploadError("El hash SHA-256 no coincide con el declarado; la subida se descartó")
+
+    return part_path, sha256, upload['size'], upload
+
+
+def discard_upload(upload_id):
+    """Elimina los archivos de una subida incompleta"""
+    with _hashers_lock:
+        _hashers.pop(upload_id, None)
+    for path in _paths(upload_id):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _purge_stale_uploads():
+    """
+    Borra subidas sin actividad hace más de STALE_UPLOAD_SECONDS. La
+    actividad es la del .part (cambia con cada parte), no la de los
+    metadatos, que se escriben una sola vez al iniciar.
+    """
+    limit = time.time() - STALE_UPLOAD_SECONDS
+    folder = _partial_dir()
+    names = set(os.listdir(folder))
+    for name in names:
+        upload_id, ext = os.path.splitext(name)
+        if ext == '.part' and f'{upload_id}.json' in names:
+            continue  # Se decide junto con sus metadatos
+        paths = [os.path.join(folder, name)]
+        if ext == '.json' and f'{upload_id}.part' in names:
+            paths.insert(0, os.path.join(folder, f'{upload_id}.part'))
+        try:
+            if os.path.getmtime(paths[0]) >= limit:
+                continue
+            for path in paths:
+                os.remove(path)
+        except OSError:
+            pass
+
+    # Hashers de subidas que ya no existen (purgadas o descartadas en otro worker)
+    with _hashers_lock:
+        for upload_id in [u for u in _hashers if not os.path.exists(os.path.join(folder, f'{u}.part'))]:
+            del _hashers[upload_id]
@@ -134,7 +134,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     async function handleUserSubmit(e) { e.preventDefault(); const data = { username: document.getElementById('username').value, email: document.getElementById('email').value, password: document.getElementById('password').value, role: document.getElementById('role').value, team: document.getElementById('team').value }; await api.saveUser(state.currentUserId, data); }
     async function handleModelSubmit(e) { e.preventDefault(); const data = { nombre: document.getElementById('nombre-modelo').value, descripcion: document.getElementById('descripcion-modelo').value, target_tornillos: parseInt(document.getElementById('target-tornillos').value), confidence_threshold: parseFloat(document.getElementById('confidence-threshold').value), inspection_cycle_time: parseInt(document.getElementById('inspection-cycle-time').value), motor_inferencia_id: parseInt(document.getElementById('motor-select').value) }; await api.saveModel(state.currentModelId, data); }
-    async function handleEngineSubmit(e) { e.preventDefault(); const form = document.getElementById('engineForm'); if (form.querySelector('#engine-file').files.length === 0) { showAlert('Por favor, selecciona un archivo .pt', 'danger'); return; } const formData = new FormData(form); await api.saveEngine(formData); }
+    async function handleEngineSubmit(e) { e.preventDefault(); const form = document.getElementById('engineForm'); if (form.querySelector('#engine-file').files.length === 0) { showAlert('Por favor, selecciona un archivo .pt', 'danger'); return; } await api.uploadEngine(form); }
 
     function switchSection(sectionId) { document.querySelectorAll('.config-section').forEach(s => s.classList.remove('active-section')); document.querySelectorAll('.menu-item').forEach(btn => btn.classList.remove('active')); document.getElementById(sectionId).classList.add('active-section'); document.querySelector(`[data-section="${sectionId}"]`).classList.add('active'); }
     function openModal(modalId, entity = null) {
@@ -158,12 +158,36 @@ document.addEventListener('DOMContentLoaded', () => {
         const modeloActivoSelect = document.getElementById('modelo-activo'); if (modeloActivoSelect) { modeloActivoSelect.innerHTML = `<option value="">-- Seleccionar --</option>` + state.allModels.filter(m => m.activo).map(m => `<option value="${m.id}">${m.nombre}</option>`).join(''); if (state.settings.ac_model_activo_id) modeloActivoSelect.value = state.settings.ac_model_activo_id; }
     }
     async function updateConfiguration() { const data = { ac_model_activo_id: document.getElementById('modelo-activo').value ? parseInt(document.getElementById('modelo-activo').value) : null, permitir_registro_publico: document.getElementById('registro-publico').checked }; const result = await api.makeRequest('/settings', 'PUT', data); if (result) { showAlert('Configuración guardada.'); state.settings = result.data; renderAll(); } }
+    // Subida reanudable por partes: si se corta la red se retoma desde el último byte confirmado
+    async function uploadEngineInChunks(form) {
+        const file = form.querySelector('#engine-file').files[0];
+        const fields = Object.fromEntries(new FormData(form).entries());
+        const headers = { 'Authorization': `Bearer ${authToken}` };
+        const start = await api.makeRequest('/inference-engines/uploads', 'POST', { filename: file.name, size: file.size, tipo: fields.tipo, version: fields.version, descripcion: fields.descripcion || '' });
+        if (!start) return null;
+        if (!start.upload_id) return start; // Deduplicado por hash
+        let offset = start.offset, retries = 0;
+        while (offset < file.size) {
+            try {
+                const response = await fetch(`${API_URL}/inference-engines/uploads/${start.upload_id}?offset=${offset}`, { method: 'PUT', headers, body: file.slice(offset, offset + start.chunk_size) });
+                const result = await response.json();
+                if (response.ok || response.status === 409) { offset = result.offset; retries = 0; showAlert(`Subiendo motor... ${Math.round(offset / file.size * 100)}%`); continue; }
+                throw new Error(result.error || 'Error en la subida');
+            } catch (error) {
+                if (++retries > 5) { showAlert('Error de red: ' + error.message, 'danger'); return null; }
+                await new Promise(r => setTimeout(r, 1000 * retries));
+                const status = await fetch(`${API_URL}/inference-engines/uploads/${start.upload_id}`, { headers }).then(r => r.json()).catch(() => null);
+                if (status && status.success) offset = status.offset;
+            }
+        }
+        return api.makeRequest(`/inference-engines/uploads/${start.upload_id}/complete`, 'POST');
+    }
     const api = {
         makeRequest: async (endpoint, method = 'GET', data = null, isFormData = false) => { const options = { method, headers: { 'Authorization': `Bearer ${authToken}` } }; if (!isFormData) { options.headers['Content-Type'] = 'application/json'; if (data) options.body = JSON.stringify(data); } else { if (data) options.body = data; } try { const response = await fetch(`${API_URL}${endpoint}`, options); const result = await response.json(); if (!response.ok) { showAlert(result.message || result.error || 'Error', 'danger'); return null; } return result; } catch (error) { showAlert('Error de red: ' + error.message, 'danger'); return null; } },
         reloadData: async () => { const settingsResult = await api.makeRequest('/settings'); if (settingsResult) state.settings = settingsResult.data; await Promise.all([ api.makeRequest('/users').then(r => state.allUsers = r?.data || []), api.makeRequest('/inference-engines').then(r => state.allEngines = r?.data || []) ]); await api.makeRequest('/ac-models').then(r => state.allModels = r?.data || []); renderAll(); },
         saveUser: async (id, data) => { const result = await api.makeRequest(id ? `/users/${id}` : '/users', id ? 'PUT' : 'POST', data); if (result) { document.getElementById('userModal').classList.remove('active'); showAlert(result.message || 'Usuario guardado.'); await api.reloadData(); } },
         saveModel: async (id, data) => { const result = await api.makeRequest(id ? `/ac-models/${id}` : '/ac-models', id ? 'PUT' : 'POST', data); if (result) { document.getElementById('modelModal').classList.remove('active'); showAlert(result.message || 'Modelo guardado.'); await api.reloadData(); } },
-        saveEngine: async (formData) => { const result = await api.makeRequest('/inference-engines', 'POST', formData, true); if (result) { document.getElementById('engineModal').classList.remove('active'); showAlert(result.message || 'Motor cargado.'); await api.reloadData(); } },
+        uploadEngine: async (form) => { const result = await uploadEngineInChunks(form); if (result) { document.getElementById('engineModal').classList.remove('active'); showAlert(result.message || 'Motor cargado.'); await api.reloadData(); } },
         toggleUserStatus: async (id) => { const result = await api.makeRequest(`/users/${id}/toggle-status`, 'POST'); if (result) { showAlert(result.message); await api.reloadData(); } },
         deleteUser: async (id) => { const result = await api.makeRequest(`/users/${id}`, 'DELETE'); if (result) { showAlert(result.message); await api.reloadData(); } },
         toggleModelStatus: async (id) => { const result = await api.makeRequest(`/ac-models/${id}/toggle-status`, 'POST'); if (result) { showAlert(result.message); await api.reloadData(); } },
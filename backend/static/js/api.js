@@ -45,11 +45,22 @@ class API {
     }
 
     // DETECTION ENDPOINTS
-    async processFrame(frameData) {
+    async processFrame(frameData, cycleToken = null) {
+        // Blob JPEG: se envía tal cual (sin base64); el servidor lo lee a un buffer reutilizado
+        if (frameData instanceof Blob) {
+            const headers = { 'Content-Type': 'image/jpeg', 'Authorization': `Bearer ${this.token}` };
+            if (cycleToken) headers['X-Cycle-Token'] = cycleToken;
+            const response = await fetch(`${API_URL}/detection/process-frame`, {
+                method: 'POST',
+                headers,
+                body: frameData
+            });
+            return this._handleResponse(response);
+        }
         const response = await fetch(`${API_URL}/detection/process-frame`, {
             method: 'POST',
             headers: this.getHeaders(),
-            body: JSON.stringify({ frame: frameData })
+            body: JSON.stringify({ frame: frameData, cycle: cycleToken })
         });
         return this._handleResponse(response);
     }
@@ -103,8 +114,9 @@ class API {
         return this._handleResponse(response);
     }
     
-    async getUserHistory(page = 1, perPage = 20, status = null) {
-        let url = `${API_URL}/history/user?page=${page}&per_page=${perPage}`;
+    async getUserHistory(cursor = null, perPage = 20, status = null) {
+        let url = `${API_URL}/history/user?per_page=${perPage}`;
+        if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
         if (status) url += `&status=${status}`;
         const response = await fetch(url, {
             method: 'GET',
@@ -137,6 +149,26 @@ class API {
         });
         return this._handleResponse(response);
     }
+
+    async getEngineLoadJob(jobId) {
+        const response = await fetch(`${API_URL}/detection/change-engine/jobs/${jobId}`, {
+            method: 'GET',
+            headers: this.getHeaders()
+        });
+        return this._handleResponse(response);
+    }
+
+    // La carga del motor corre como trabajo en el servidor: espera a que termine
+    async waitForEngineLoad(jobId, intervalMs = 500) {
+        while (true) {
+            const { data: job } = await this.getEngineLoadJob(jobId);
+            if (job.status === 'succeeded') return job;
+            if (job.status === 'failed' || job.status === 'cancelled') {
+                throw new Error(job.error || 'Error al cargar el nuevo motor');
+            }
+            await new Promise(resolve => setTimeout(resolve, intervalMs));
+        }
+    }
 }
 
 // Instancia global de API
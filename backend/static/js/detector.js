@@ -7,6 +7,8 @@ document.addEventListener('DOMContentLoaded', () => {
     let stream, animationFrameId, inspectionInterval;
     let isInspecting = false;
     let maxDetectionsInCycle = 0;
+    let cycleToken = null; // Estado del ciclo firmado por el servidor (salida anticipada)
+    let slotsSeen = []; // Posiciones de la plantilla ocupadas en algún frame del ciclo
     let config = { target_tornillos: 0, confidence_threshold: 0.5, inspection_cycle_time: 20, model_name: "N/A" };
     let stats = { totalInspected: 0, totalPass: 0, totalFail: 0 };
     let currentConfidence = 0.5;
@@ -125,6 +127,7 @@ document.addEventListener('DOMContentLoaded', () => {
             try {
                 const result = await api.changeEngine(selectedEngine);
                 console.log('Motor cambiado:', result);
+                await api.waitForEngineLoad(result.data.id);
                 
                 // Detener la detección actual si está corriendo
                 if (isInspecting) {
@@ -286,6 +289,8 @@ document.addEventListener('DOMContentLoaded', () => {
             
             isInspecting = true;
             maxDetectionsInCycle = 0;
+            cycleToken = null;
+            slotsSeen = new Array(config.template_slots || 0).fill(false);
             trackedScrews = []; // Resetear tracking de tornillos únicos
             updateDetectionCountUI();
             let timeLeft = ui.cycleTimeSlider.value;
@@ -311,7 +316,11 @@ document.addEventListener('DOMContentLoaded', () => {
         isInspecting = false;
         cancelAnimationFrame(animationFrameId);
         stats.totalInspected++;
-        const finalStatus = maxDetectionsInCycle === config.target_tornillos ? 'PASS' : 'FAIL';
+        // Con plantilla, cada posición debe haberse visto ocupada (el conteo no basta)
+        const positions = slotsSeen.length ? slotsSeen.map(seen => seen ? '1' : '0').join('') : null;
+        const finalStatus = positions !== null
+            ? (positions.includes('0') ? 'FAIL' : 'PASS')
+            : (maxDetectionsInCycle === config.target_tornillos ? 'PASS' : 'FAIL');
         finalStatus === 'PASS' ? stats.totalPass++ : stats.totalFail++;
         setStatus(finalStatus, finalStatus.toLowerCase());
         updateStatsUI();
@@ -320,7 +329,9 @@ document.addEventListener('DOMContentLoaded', () => {
             detection_count: maxDetectionsInCycle,
             expected_count: config.target_tornillos,
             confidence: currentConfidence,
-            model_name: config.model_name
+            model_name: config.model_name,
+            cycle: cycleToken,
+            posiciones: positions
         });
         setTimeout(() => {
             if (stream && stream.active) { // Solo reinicia si no se ha detenido manualmente
@@ -352,8 +363,8 @@ document.addEventListener('DOMContentLoaded', () => {
             }
             
             // 5. Enviar el frame al backend para procesamiento (async)
-            const imageData = lastProcessedFrame.toDataURL('image/jpeg', 0.95);
-            const result = await api.processFrame(imageData);
+            const imageData = await new Promise(resolve => lastProcessedFrame.toBlob(resolve, 'image/jpeg', 0.95));
+            const result = await api.processFrame(imageData, cycleToken);
             
             console.log('Respuesta del backend:', result);
             
@@ -448,6 +459,26 @@ document.addEventListener('DOMContentLoaded', () => {
                     console.log(`📊 Tornillos confirmados: ${finalCount} de ${config.target_tornillos} esperados`);
                 }
                 
+                // 8. PLANTILLA: acumular las posiciones ocupadas en el ciclo
+                if (result.slots && slotsSeen.length === result.slots.slots.length) {
+                    [...result.slots.slots].forEach((state, idx) => { if (state === '1') slotsSeen[idx] = true; });
+                    maxDetectionsInCycle = slotsSeen.filter(Boolean).length;
+                    updateDetectionCountUI();
+                }
+                
+                // 9. SALIDA ANTICIPADA: el servidor confirmó el objetivo en N frames seguidos
+                if (result.cycle) {
+                    cycleToken = result.cycle.token;
+                    if (result.cycle.early_exit) {
+                        console.log(`⏩ Salida anticipada a los ${result.cycle.elapsed_s}s (${result.cycle.stable_frames} frames estables)`);
+                        clearInterval(inspectionInterval);
+                        maxDetectionsInCycle = config.target_tornillos;
+                        updateDetectionCountUI();
+                        finishInspectionCycle();
+                        return;
+                    }
+                }
+                
                 // IMPORTANTE: Solicitar el siguiente frame SOLO después de procesar completamente este
                 animationFrameId = requestAnimationFrame(detectionLoop);
             } else {
@@ -0,0 +1,357 @@
+"""
+Registro de backends de inferencia
+Cada InferenceEngine.tipo se resuelve a una clase con la misma interfaz:
+
+    backend = get_backend(tipo)(ruta_modelo, tipo=tipo)
+    resultados = backend.predict_batch([frame1, frame2])  # -> [Detections, ...]
+
+predict_batch() recibe frames BGR (uint8, HxWx3) y devuelve, por frame,
+arrays de NumPy (cajas xyxy, confianzas y clases). Cada backend declara su
+tamaño de lote preferido, tamaño de entrada y necesidades de hilos para que
+quien lo ejecute (gestor, executor) lo haga de forma eficiente.
+
+Registro de un backend nuevo:
+
+    @register_backend('yolox', extensions=('.pth',))
+    class YoloXBackend(EngineBackend):
+        def predict_batch(self, frames): ...
+"""
+
+import logging
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+MAX_INPUT_BUFFERS = 16   # Tensores de entrada reutilizados por backend y hilo (ver TorchDetectionBackend)
+
+
+def register_backend(tipo, extensions=('.pt',)):
+    """Decorador que asocia un tipo de motor (y sus extensiones) a una clase"""
+    def decorator(cls):
+        _registry[tipo] = (cls, tuple(extensions))
+        return cls
+    return decorator
+
+
+def get_backend(tipo):
+    if tipo not in _registry:
+        raise ValueError(f"No hay backend de inferencia para el tipo '{tipo}'")
+    return _registry[tipo][0]
+
+
+def backend_extensions(tipo):
+    """Extensiones de archivo aceptadas para el tipo (None si no está registrado)"""
+    entry = _registry.get(tipo)
+    return entry[1] if entry else None
+
+
+def registered_backends():
+    return {tipo: dict(cls.describe(), extensions=list(ext)) for tipo, (cls, ext) in sorted(_registry.items())}
+
+
+class Detections:
+    """Detecciones de un frame como arrays paralelos"""
+
+    __slots__ = ('boxes', 'scores', 'classes')
+
+    def __init__(self, boxes, scores, classes):
+        self.boxes = boxes      # (N, 4) int32, xyxy en píxeles
+        self.scores = scores    # (N,) float32
+        self.classes = classes  # (N,) int32
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, 4), np.int32), np.zeros(0, np.float32), np.zeros(0, np.int32))
+
+    def __len__(self):
+        return len(self.scores)
+
+    def to_dicts(self, class_names):
+        """Formato de la API: [{'box', 'confidence', 'class_name'}, ...]"""
+        return [
+            {
+                "box": self.boxes[i],
+                "confidence": self.scores[i],
+                "class_name": class_names.get(cls, str(cls))
+            }
+            for i, cls in enumerate(self.classes.tolist())
+        ]
+
+
+class EngineBackend:
+    """Interfaz común de los backends"""
+
+    batch_size = 1        # Lote preferido por llamada a predict_batch
+    input_size = 640      # Lado de la imagen que procesa el modelo
+    uses_torch = True     # Aplicar hilos de torch/OpenCV antes de cargar
+    thread_safe = False   # Admite llamadas concurrentes a predict_batch
+    requires_file = True
+
+    def __init__(self, model_path, tipo=None, **options):
+        if self.requires_file and not os.path.isfile(model_path):
+            raise FileNotFoundError(f"El modelo no se encontró en la ruta: {model_path}")
+        self.model_path = model_path
+        self.model_filename = os.path.basename(model_path)
+        self.tipo = tipo
+        self.class_names = {}
+
+    def predict_batch(self, frames):
+        raise NotImplementedError
+
+    def torch_modules(self):
+        """nn.Module con los pesos del modelo (para compartirlos entre workers)"""
+        return []
+
+    def fuse(self):
+        """
+        Transformaciones que el backend haría en la primera predicción; en el
+        master (preload) se hacen antes del fork para que los workers no
+        creen sus propias copias de los pesos
+        """
+
+    def share_weights(self):
+        """
+        Prepara los pesos para compartirse entre workers tras el fork: sin
+        gradientes y en memoria compartida (read-only en la práctica). Se
+        llama en el master de gunicorn con preload_app (ver preload.py).
+        """
+        shared = 0
+        for module in self.torch_modules():
+            for param in module.parameters():
+                param.requires_grad_(False)
+            module.share_memory()
+            shared += sum(t.numel() * t.element_size() for t in module.state_dict().values())
+        return shared
+
+    def detect(self, frame):
+        """Un frame -> lista de detecciones en el formato de la API ([] si falla)"""
+        return self.try_detect(frame)[0]
+
+    def try_detect(self, frame):
+        """(detecciones, ok); ok=False si la inferencia falló y el [] no es un resultado real"""
+        try:
+            return self.predict_batch([frame])[0].to_dicts(self.class_names), True
+        except Exception:
+            logger.exception('Error en detección (%s)', self.tipo)
+            return [], False
+
+    @classmethod
+    def describe(cls):
+        return {
+            'backend': cls.__name__,
+            'batch_size': cls.batch_size,
+            'input_size': cls.input_size,
+            'uses_torch': cls.uses_torch,
+            'thread_safe': cls.thread_safe
+        }
+
+
+# ============================================================
+# ULTRALYTICS (YOLOv5/v8/v11, RT-DETR)
+# ============================================================
+
+@register_backend('yolov5')
+@register_backend('yolov8')
+@register_backend('yolov11')
+@register_backend('rtdetr')
+class UltralyticsBackend(EngineBackend):
+    batch_size = 4
+
+    def __init__(self, model_path, tipo=None, conf=0.10, iou=0.45, max_det=300, **options):
+        super().__init__(model_path, tipo=tipo)
+        # Import diferido: ultralytics arrastra torch (segundos y cientos de MB),
+        # así que solo lo paga el proceso que realmente carga un modelo
+        if tipo == 'rtdetr':
+            from ultralytics import RTDETR as model_class
+        else:
+            from ultralytics import YOLO as model_class
+
+        logger.info('Cargando modelo desde: %s', model_path)
+        self.model = model_class(model_path)
+        self.class_names = dict(self.model.names)
+        # Umbral bajo a propósito: el filtrado final se hace con el del modelo de AA
+        self.options = dict(conf=conf, iou=iou, max_det=max_det, imgsz=self.input_size, verbose=False)
+        logger.info('Modelo %s cargado: %s', tipo or 'YOLO', self.model_filename)
+
+    def torch_modules(self):
+        module = getattr(self.model, 'model', None)
+        return [module] if module is not None and hasattr(module, 'parameters') else []
+
+    def fuse(self):
+        # ultralytics fusiona Conv+BN en la primera predicción, creando tensores
+        # nuevos en cada worker; fusionado antes, los workers reutilizan estos
+        if hasattr(self.model, 'fuse'):
+            self.model.fuse()
+
+    def share_weights(self):
+        self.fuse()
+        return super().share_weights()
+
+    def predict_batch(self, frames):
+        results = self.model(list(frames), **self.options)
+        out = []
+        for result in results:
+            # Una sola copia a CPU por frame
+            boxes = result.boxes
+            out.append(Detections(
+                boxes.xyxy.cpu().numpy().astype(np.int32),
+                boxes.conf.cpu().numpy().astype(np.float32),
+                boxes.cls.cpu().numpy().astype(np.int32)
+            ))
+        return out
+
+
+# ============================================================
+# TORCH / TORCHVISION (EfficientDet, Mask R-CNN)
+# ============================================================
+
+@register_backend('efficientdet', extensions=('.pth',))
+@register_backend('maskrcnn', extensions=('.weights', '.pth'))
+class TorchDetectionBackend(EngineBackend):
+    """
+    Modelos con salida estilo torchvision ([{'boxes', 'scores', 'labels'}]).
+    Acepta TorchScript, un nn.Module serializado o, para Mask R-CNN, un
+    state_dict de torchvision.models.detection.maskrcnn_resnet50_fpn.
+    """
+
+    batch_size = 2
+    input_size = 800
+
+    def __init__(self, model_path, tipo=None, min_score=0.10, **options):
+        super().__init__(model_path, tipo=tipo)
+        import torch
+        self._torch = torch
+
+        try:
+            model = torch.jit.load(model_path, map_location='cpu')
+        except RuntimeError:
+            model = torch.load(model_path, map_location='cpu', weights_only=False)
+
+        if isinstance(model, dict):
+            names = model.get('names') or model.get('classes')
+            if names:
+                self.class_names = dict(enumerate(names)) if isinstance(names, (list, tuple)) else dict(names)
+            model = self._from_state_dict(model.get('model') or model.get('state_dict') or model)
+
+        self.model = model.eval()
+        self.min_score = min_score
+        # Tensores de entrada reutilizados por (posición en el lote, alto, ancho);
+        # en memoria fijada si hay CUDA para copiar a la GPU sin staging. Son
+        # por hilo: con INFERENCE_THREADS > 1 dos peticiones del mismo tamaño
+        # no deben escribir sobre el tensor que el modelo todavía está leyendo
+        self._local = threading.local()
+        self._pin = torch.cuda.is_available()
+        logger.info('Modelo %s cargado: %s', tipo, self.model_filename)
+
+    def torch_modules(self):
+        return [self.model] if isinstance(self.model, self._torch.nn.Module) else []
+
+    def _input_tensor(self, index, frame):
+        """BGR uint8 HxWx3 -> RGB float CxHxW en [0, 1], sobre un tensor reutilizado"""
+        torch = self._torch
+        height, width = frame.shape[:2]
+        key = (index, height, width)
+        inputs = getattr(self._local, 'inputs', None)
+        if inputs is None:
+            inputs = self._local.inputs = {}
+        tensor = inputs.get(key)
+        if tensor is None:
+            if len(inputs) >= MAX_INPUT_BUFFERS:
+                inputs.clear()  # Recortes de la cascada: tamaños que no se repiten
+            tensor = torch.empty((3, height, width), dtype=torch.float32)
+            if self._pin:
+                tensor = tensor.pin_memory()
+            inputs[key] = tensor
+        source = torch.from_numpy(frame)  # Vista, sin copia
+        for channel in range(3):
+            tensor[channel].copy_(source[:, :, 2 - channel])
+        return tensor.div_(255)
+
+    def _from_state_dict(self, state):
+        if isinstance(state, self._torch.nn.Module):
+            return state
+        if self.tipo != 'maskrcnn':
+            raise ValueError(f"{self.tipo} requiere un modelo completo (TorchScript o nn.Module), no un state_dict")
+        from torchvision.models.detection import maskrcnn_resnet50_fpn
+        num_classes = state['roi_heads.box_predictor.cls_score.weight'].shape[0]
+        model = maskrcnn_resnet50_fpn(weights=None, weights_backbone=None, num_classes=num_classes)
+        model.load_state_dict(state)
+        return model
+
+    def predict_batch(self, frames):
+        torch = self._torch
+        tensors = [self._input_tensor(i, f) for i, f in enumerate(frames)]
+        with torch.inference_mode():
+            outputs = self.model(tensors)
+        # Los modelos de torchvision en TorchScript devuelven (pérdidas, detecciones)
+        if isinstance(outputs, tuple):
+            outputs = outputs[1]
+
+        out = []
+        for output in outputs:
+            keep = output['scores'] >= self.min_score
+            out.append(Detections(
+                output['boxes'][keep].cpu().numpy().astype(np.int32),
+                output['scores'][keep].cpu().numpy().astype(np.float32),
+                output['labels'][keep].cpu().numpy().astype(np.int32)
+            ))
+        return out
+
+
+# ============================================================
+# STUB (pruebas, CI y benchmarks sin pesos)
+# ============================================================
+
+@register_backend('stub')
+class StubBackend(EngineBackend):
+    """
+    Detecciones deterministas derivadas del contenido del frame y latencia
+    simulada con un sleep (que, como torch, libera el GIL).
+    """
+
+    batch_size = 8
+    input_size = None
+    uses_torch = False
+    thread_safe = True
+    requires_file = False
+
+    def __init__(self, model_path='stub.pt', tipo='stub', latency_ms=20, boxes=4, **options):
+        super().__init__(model_path, tipo=tipo)
+        self.latency_ms = latency_ms
+        self.boxes = boxes
+        self.class_names = {0: 'tornillo'}
+
+    def _predict_one(self, frame):
+        height, width = frame.shape[:2]
+        # Semilla estable: checksum de una muestra del frame
+        seed = zlib.crc32(frame[::max(1, height // 16), ::max(1, width // 16)].tobytes())
+        # Cantidad variable alrededor del objetivo para tener PASS y FAIL
+        count = max(0, self.boxes + (seed % 3) - 1)
+        size = max(8, min(width, height) // 12)
+
+        boxes = np.zeros((count, 4), np.int32)
+        scores = np.zeros(count, np.float32)
+        for i in range(count):
+            value = zlib.crc32(i.to_bytes(2, 'little'), seed)
+            x = value % max(1, width - size)
+            y = (value >> 12) % max(1, height - size)
+            boxes[i] = (x, y, x + size, y + size)
+            scores[i] = 0.5 + (value % 500) / 1000
+        return Detections(boxes, scores, np.zeros(count, np.int32))
+
+    def predict_batch(self, frames):
+        start = time.perf_counter()
+        out = [self._predict_one(frame) for frame in frames]
+        # Cada frame extra del lote cuesta una fracción de la latencia base
+        latency = self.latency_ms * (1 + 0.25 * (len(frames) - 1)) / 1000
+        remaining = latency - (time.perf_counter() - start)
+        if remaining > 0:
+            time.sleep(remaining)
+        return out
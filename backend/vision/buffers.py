@@ -0,0 +1,155 @@
+"""
+Pool de buffers para el camino ingesta -> decodificación -> inferencia
+A 10+ FPS por estación, reservar por frame el cuerpo de la petición, los
+bytes del JPEG y el array BGR decodificado genera gigabytes por minuto de
+trabajo para el allocator. Aquí esos buffers se reutilizan:
+
+- Cuerpo: los frames enviados como image/jpeg se leen con readinto() en un
+  bytearray del pool (sin base64 ni copias intermedias).
+- Decodificación: con simplejpeg (opcional) el JPEG se decodifica dentro de
+  un array del pool; sin él se usa cv2.imdecode, que reserva un array nuevo
+  por frame (queda registrado en las estadísticas).
+
+Las estadísticas cuentan, por tipo de buffer, cuántas veces se tomó uno del
+pool y cuántas hubo que reservarlo: en régimen estable las reservas por
+frame deben tender a cero (útil como prueba de regresión).
+"""
+
+import threading
+from collections import defaultdict
+
+MAX_FREE_PER_KEY = 8   # Buffers libres que se conservan por tamaño
+
+
+class InvalidFrameError(ValueError):
+    """Los bytes recibidos no se pueden decodificar como imagen (error del cliente)"""
+
+
+def _bucket(size):
+    """Capacidad redondeada a potencia de 2 (>= 64 KB) para reutilizar entre tamaños parecidos"""
+    capacity = 64 * 1024
+    while capacity < size:
+        capacity *= 2
+    return capacity
+
+
+class BufferPool:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._free = defaultdict(list)
+        self.frames = 0
+        self.acquired = defaultdict(int)
+        self.allocated = defaultdict(int)
+
+    # --------------------------------------------------------
+    # Reserva y devolución
+    # --------------------------------------------------------
+    def _take(self, key, kind):
+        with self._lock:
+            self.acquired[kind] += 1
+            free = self._free.get(key)
+            if free:
+                return free.pop()
+            self.allocated[kind] += 1
+        return None
+
+    def _give(self, key, buf):
+        with self._lock:
+            free = self._free[key]
+            if len(free) < MAX_FREE_PER_KEY:
+                free.append(buf)
+
+    def acquire_bytes(self, size):
+        """bytearray con capacidad >= size (usar memoryview(buf)[:size])"""
+        capacity = _bucket(size)
+        buf = self._take(('bytes', capacity), 'body')
+        return buf if buf is not None else bytearray(capacity)
+
+    def release_bytes(self, buf):
+        self._give(('bytes', len(buf)), buf)
+
+    def acquire_array(self, shape):
+        """Array uint8 de la forma indicada (contenido sin inicializar)"""
+        import numpy as np
+        shape = tuple(shape)
+        arr = self._take(('array', shape), 'frame')
+        return arr if arr is not None else np.empty(shape, np.uint8)
+
+    def release_array(self, arr):
+        self._give(('array', arr.shape), arr)
+
+    def record_allocation(self, kind):
+        """Reserva fuera del pool (p. ej. cv2.imdecode o base64 del JSON)"""
+        with self._lock:
+            self.acquired[kind] += 1
+            self.allocated[kind] += 1
+
+    def count_frame(self):
+        with self._lock:
+            self.frames += 1
+
+    # --------------------------------------------------------
+    # Estadísticas
+    # --------------------------------------------------------
+    def reset_stats(self):
+        with self._lock:
+            self.frames = 0
+            self.acquired.clear()
+            self.allocated.clear()
+
+    def status(self):
+        with self._lock:
+            total = sum(self.allocated.values())
+            return {
+                'frames': self.frames,
+                'decoder': 'simplejpeg' if _simplejpeg() else 'cv2',
+                'acquired': dict(self.acquired),
+                'allocated': dict(self.allocated),
+                'allocations_per_frame': round(total / self.frames, 4) if self.frames else 0.0,
+                'free_buffers': sum(len(v) for v in self._free.values())
+            }
+
+
+_SIMPLEJPEG = None
+
+
+def _simplejpeg():
+    global _SIMPLEJPEG
+    if _SIMPLEJPEG is None:
+        try:
+            import simplejpeg
+            _SIMPLEJPEG = simplejpeg
+        except ImportError:
+            _SIMPLEJPEG = False
+    return _SIMPLEJPEG
+
+
+def decode_jpeg(pool, data):
+    """
+    JPEG (bytes/memoryview) -> (array BGR, pooled). Si pooled es True el
+    array pertenece al pool y debe devolverse con release_array().
+    """
+    simplejpeg = _simplejpeg()
+    if simplejpeg:
+        try:
+            height, width, _, _ = simplejpeg.decode_jpeg_header(data)
+            arr = pool.acquire_array((height, width, 3))
+            try:
+                simplejpeg.decode_jpeg(data, colorspace='BGR', buffer=arr, strict=False)
+            except Exception:
+                pool.release_array(arr)
+                raise
+            return arr, True
+        except ValueError:
+            pass  # No es un JPEG baseline/progresivo legible: lo intenta OpenCV
+
+    import cv2
+    import numpy as np
+    frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise InvalidFrameError('El frame recibido no es una imagen válida')
+    pool.record_allocation('frame')
+    return frame, False
+
+
+frame_pool = BufferPool()
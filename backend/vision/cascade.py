@@ -0,0 +1,200 @@
+"""
+Inferencia en cascada por modelo de AA
+El motor activo (rápido) procesa cada frame. Solo si el resultado es
+ambiguo para el perfil del ACModel se consulta al motor de cascada (pesado):
+
+- 'count': el conteo válido está cerca del objetivo sin alcanzarlo exacto
+  (|conteo - objetivo| <= cascada_margen).
+- 'ambiguous': hay detecciones con confianza dentro de la banda
+  [cascada_conf_min, cascada_conf_max) que podrían cambiar el resultado.
+
+Con cascada_modo='regions' y motivo 'ambiguous', el motor pesado solo
+verifica recortes alrededor de las detecciones dudosas (en lote); en el
+resto de los casos reprocesa el frame completo.
+"""
+
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+
+import numpy as np
+
+from .backends import Detections
+
+logger = logging.getLogger(__name__)
+
+LATENCY_WINDOW = 2000
+REGION_PADDING = 1.0   # Margen del recorte, en múltiplos del tamaño de la caja
+REGION_MIN_IOU = 0.3   # Solapamiento mínimo para aceptar la verificación
+
+
+def escalation_reason(first, profile):
+    """Motivo para escalar al motor pesado, o None si el frame es claro"""
+    threshold = profile['confidence_threshold']
+    target = profile['target_tornillos']
+    margin = profile['cascada_margen']
+    scores = first.scores
+
+    valid = int((scores >= threshold).sum())
+    distance = abs(valid - target)
+    if 0 < distance <= margin:
+        return 'count'
+    uncertain = int(((scores >= profile['cascada_conf_min']) & (scores < profile['cascada_conf_max'])).sum())
+    if uncertain and distance <= max(margin, uncertain):
+        return 'ambiguous'
+    return None
+
+
+def _iou(box, boxes):
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1)
+
+
+def _verify_regions(heavy, frame, first, profile):
+    """
+    Reprocesa con el motor pesado solo recortes alrededor de las detecciones
+    dudosas. Devuelve (detecciones confiables del rápido, verificadas del pesado).
+    """
+    height, width = frame.shape[:2]
+    uncertain = (first.scores >= profile['cascada_conf_min']) & (first.scores < profile['cascada_conf_max'])
+    kept = Detections(first.boxes[~uncertain], first.scores[~uncertain], first.classes[~uncertain])
+
+    crops, origins = [], []
+    for box in first.boxes[uncertain]:
+        x1, y1, x2, y2 = (int(v) for v in box)
+        pad_x = int((x2 - x1) * REGION_PADDING)
+        pad_y = int((y2 - y1) * REGION_PADDING)
+        cx1, cy1 = max(0, x1 - pad_x), max(0, y1 - pad_y)
+        cx2, cy2 = min(width, x2 + pad_x), min(height, y2 + pad_y)
+        crops.append(frame[cy1:cy2, cx1:cx2])
+        origins.append((cx1, cy1, np.array([x1, y1, x2, y2])))
+
+    results = []
+    batch_size = max(1, heavy.batch_size)
+    for i in range(0, len(crops), batch_size):
+        results.extend(heavy.predict_batch(crops[i:i + batch_size]))
+
+    boxes, scores, classes = [], [], []
+    for result, (ox, oy, original) in zip(results, origins):
+        if not len(result):
+            continue  # El motor pesado no ve nada: se descarta la dudosa
+        translated = result.boxes + np.array([ox, oy, ox, oy], dtype=np.int32)
+        overlap = _iou(original, translated)
+        best = int(np.argmax(overlap))
+        if overlap[best] >= REGION_MIN_IOU:
+            boxes.append(translated[best])
+            scores.append(result.scores[best])
+            classes.append(result.classes[best])
+
+    verified = Detections(
+        np.array(boxes, dtype=np.int32).reshape(-1, 4),
+        np.array(scores, dtype=np.float32),
+        np.array(classes, dtype=np.int32)
+    )
+    return kept, verified
+
+
+class CascadeStats:
+    """Tasa de escalado y latencia por etapa de este worker"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.escalated = defaultdict(int)
+        self.stage1_ms = deque(maxlen=LATENCY_WINDOW)
+        self.stage2_ms = deque(maxlen=LATENCY_WINDOW)
+        self.total_ms = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, stage1_ms, stage2_ms=None, reason=None):
+        with self._lock:
+            self.frames += 1
+            self.stage1_ms.append(stage1_ms)
+            self.total_ms.append(stage1_ms + (stage2_ms or 0.0))
+            if reason:
+                self.escalated[reason] += 1
+                self.stage2_ms.append(stage2_ms)
+
+    @staticmethod
+    def _summary(values):
+        if not values:
+            return None
+        ordered = sorted(values)
+        return {
+            'avg_ms': round(sum(ordered) / len(ordered), 2),
+            'p50_ms': round(ordered[len(ordered) // 2], 2),
+            'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2)
+        }
+
+    def status(self):
+        with self._lock:
+            escalated = sum(self.escalated.values())
+            return {
+                'frames': self.frames,
+                'escalated': escalated,
+                'escalation_rate': round(escalated / self.frames, 4) if self.frames else 0.0,
+                'escalated_by_reason': dict(self.escalated),
+                'stage1': self._summary(self.stage1_ms),
+                'stage2': self._summary(self.stage2_ms),
+                'total': self._summary(self.total_ms)
+            }
+
+
+cascade_stats = CascadeStats()
+
+
+def detect_with_cascade(fast, heavy, frame, profile):
+    """
+    Ejecuta la cascada sobre un frame decodificado. Devuelve
+    (detecciones en formato de la API, info de la cascada para la respuesta).
+    Si alguna etapa falló, la info lleva 'degraded': True (no es cacheable).
+    """
+    start = time.perf_counter()
+    try:
+        first = fast.predict_batch([frame])[0]
+    except Exception:
+        logger.exception('Error en detección (%s)', fast.tipo)
+        return [], {'escalated': False, 'reason': None, 'stage1_ms': 0.0, 'stage2_ms': None, 'degraded': True}
+    stage1_ms = (time.perf_counter() - start) * 1000
+
+    reason = escalation_reason(first, profile) if heavy is not None else None
+    if reason is None:
+        cascade_stats.record(stage1_ms)
+        return first.to_dicts(fast.class_names), {
+            'escalated': False, 'reason': None, 'stage1_ms': round(stage1_ms, 2), 'stage2_ms': None
+        }
+
+    start = time.perf_counter()
+    mode = 'frame'
+    degraded = False
+    try:
+        if reason == 'ambiguous' and profile['cascada_modo'] == 'regions':
+            mode = 'regions'
+            kept, verified = _verify_regions(heavy, frame, first, profile)
+            detections = kept.to_dicts(fast.class_names) + verified.to_dicts(heavy.class_names)
+        else:
+            detections = heavy.predict_batch([frame])[0].to_dicts(heavy.class_names)
+    except Exception:
+        # Si falla la etapa pesada se responde con la rápida
+        logger.exception('Error en la etapa de cascada (%s)', heavy.tipo)
+        detections = first.to_dicts(fast.class_names)
+        degraded = True
+    stage2_ms = (time.perf_counter() - start) * 1000
+
+    cascade_stats.record(stage1_ms, stage2_ms, reason)
+    info = {
+        'escalated': True, 'reason': reason, 'mode': mode,
+        'stage1_ms': round(stage1_ms, 2), 'stage2_ms': round(stage2_ms, 2)
+    }
+    if degraded:
+        info['degraded'] = True
+    return detections, info
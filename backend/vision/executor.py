@@ -0,0 +1,71 @@
+"""
+Ejecución de la inferencia fuera del hub de gevent
+Con workers gevent, una llamada a torch dentro del greenlet de la petición
+bloquea el hub y congela al resto de peticiones (login, dashboard, guardado)
+hasta que termina. Aquí las llamadas de inferencia se envían al threadpool
+nativo de gevent: el greenlet espera de forma cooperativa mientras un hilo
+real del sistema ejecuta el modelo (torch y OpenCV liberan el GIL).
+
+Con workers sync/gthread no hay hub que proteger y la llamada es directa.
+"""
+
+import threading
+
+
+def _gevent_active():
+    """True si el proceso corre con threading parcheado por gevent"""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
+
+class InferenceExecutor:
+    """Ejecuta funciones de inferencia en hilos nativos cuando gevent está activo"""
+
+    def __init__(self, max_threads=1):
+        self._max_threads = max_threads
+        self._pool = None
+        self._lock = threading.Lock()
+        self._gevent = None
+
+    def configure(self, max_threads):
+        with self._lock:
+            self._max_threads = max_threads
+            self._pool = None
+
+    def reset(self):
+        """
+        Tras un fork (preload_app): el modo se calculó en el master, antes de
+        que gevent parchee el worker, y el pool no sobrevive al fork
+        """
+        with self._lock:
+            self._pool = None
+            self._gevent = None
+
+    @property
+    def mode(self):
+        if self._gevent is None:
+            self._gevent = _gevent_active()
+        return 'gevent-threadpool' if self._gevent else 'direct'
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                from gevent.threadpool import ThreadPool
+                # Un hilo por defecto: el modelo no es seguro para llamadas concurrentes
+                self._pool = ThreadPool(self._max_threads)
+            return self._pool
+
+    def run(self, fn, *args, **kwargs):
+        """Ejecuta fn(*args, **kwargs) y devuelve su resultado"""
+        if self.mode == 'direct':
+            return fn(*args, **kwargs)
+        return self._get_pool().apply(fn, args, kwargs)
+
+    def status(self):
+        return {'mode': self.mode, 'max_threads': self._max_threads}
+
+
+inference_executor = InferenceExecutor()
@@ -0,0 +1,198 @@
+"""
+Gestor del detector activo por worker
+Mantiene el detector cargado y lo sustituye en caliente cuando cambia el
+motor activo. El cambio se detecta comparando con la caché de configuración
+(que solo consulta la BD cuando cambia la versión compartida), así que
+ningún frame paga una consulta; la carga del modelo nuevo corre en un hilo
+aparte y el detector anterior sigue atendiendo hasta que termina.
+
+El cambio de motor pedido desde la interfaz corre como trabajo en segundo
+plano ('engine.load'): la petición responde con el trabajo y el cliente
+sigue el progreso.
+"""
+
+import logging
+import os
+import threading
+
+from ..services.jobs import register_job
+from .executor import inference_executor
+from .resources import cpu_resources
+
+logger = logging.getLogger(__name__)
+
+
+def _engine_key(engine):
+    if not engine:
+        return None
+    return (engine['id'], engine['ruta_archivo'], engine.get('hash_archivo'))
+
+
+class DetectorManager:
+    """Detector activo + estado de carga, compartido por los hilos del worker"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Serializa la primera carga: peticiones simultáneas no cargan los pesos dos veces
+        self._first_load_lock = threading.Lock()
+        self.detector = None
+        self.active_engine = None
+        self.model_loaded = False  # Se intentó al menos una carga
+        self.last_error = None
+        self._loading_key = None
+        self._failed_key = None  # Motor cuya carga falló (no se reintenta en bucle)
+        self._upload_folder = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
+        self._stub = False
+        self._stub_latency_ms = 20
+
+    def configure(self, upload_folder=None, stub=False, stub_latency_ms=20):
+        """stub=True sustituye el modelo real por el backend 'stub' (pruebas de carga/CI)"""
+        if upload_folder:
+            self._upload_folder = upload_folder
+        self._stub = stub
+        self._stub_latency_ms = stub_latency_ms
+
+    # --------------------------------------------------------
+    # Carga
+    # --------------------------------------------------------
+    def _build(self, engine):
+        # numpy/backends se importan con el primer modelo, no al arrancar
+        from .backends import get_backend
+
+        logger.info('Motor encontrado: %s v%s (%s)', engine['tipo'], engine['version'], engine['ruta_archivo'])
+        if self._stub:
+            backend_class = get_backend('stub')
+            options = {'latency_ms': self._stub_latency_ms}
+        else:
+            backend_class = get_backend(engine['tipo'])
+            options = {}
+        if backend_class.uses_torch:
+            cpu_resources.apply_to_libraries()
+        model_path = os.path.join(self._upload_folder, engine['ruta_archivo'])
+        # La carga (torch.load) también es CPU pesado: fuera del hub de gevent
+        return inference_executor.run(backend_class, model_path, tipo=engine['tipo'], **options)
+
+    def load(self, engine):
+        """Carga sincrónica del motor indicado (dict) o descarga si es None"""
+        detector = None
+        error = None
+        if engine and engine.get('ruta_archivo'):
+            try:
+                detector = self._build(engine)
+                logger.info('Modelo activo cargado: %s v%s', engine['tipo'], engine['version'])
+            except Exception as e:
+                logger.exception('Error al cargar el modelo %s v%s', engine['tipo'], engine['version'])
+                error = str(e)
+        else:
+            logger.warning('No hay motor de IA activo configurado (Configuración → Motores de IA)')
+
+        with self._lock:
+            self.detector = detector
+            self.active_engine = engine if detector else None
+            self.model_loaded = True
+            self.last_error = error
+            self._failed_key = _engine_key(engine) if error else None
+        return detector
+
+    def _swap_in_background(self, engine):
+        key = _engine_key(engine)
+        with self._lock:
+            if self._loading_key == key:
+                return
+            self._loading_key = key
+
+        def worker():
+            try:
+                logger.info('Cambio de motor detectado, cargando en segundo plano')
+                if engine is None:
+                    self.load(None)
+                    return
+                try:
+                    detector = self._build(engine)
+                except Exception as e:
+                    logger.exception('Error al cargar el nuevo motor, se mantiene el anterior')
+                    with self._lock:
+                        self.last_error = str(e)
+                        self._failed_key = key
+                    return
+                with self._lock:
+                    self.detector = detector
+                    self.active_engine = engine
+                    self.last_error = None
+                    self._failed_key = None
+                logger.info('Motor sustituido en caliente: %s v%s', engine['tipo'], engine['version'])
+            finally:
+                with self._lock:
+                    if self._loading_key == key:
+                        self._loading_key = None
+
+        threading.Thread(target=worker, name='detector-swap', daemon=True).start()
+
+    # --------------------------------------------------------
+    # Sincronización con la configuración activa
+    # --------------------------------------------------------
+    def sync(self, engine):
+        """
+        Asegura que el detector corresponda al motor activo `engine` (dict
+        de la caché de configuración). La primera carga es sincrónica; los
+        cambios posteriores se aplican en segundo plano.
+        """
+        if not self.model_loaded:
+            with self._first_load_lock:
+                # Otra petición pudo completar la carga mientras se esperaba el lock
+                if not self.model_loaded:
+                    logger.info('Cargando el motor de IA activo')
+                    return self.load(engine)
+
+        key = _engine_key(engine)
+        if key != _engine_key(self.active_engine) and key != self._failed_key:
+            self._swap_in_background(engine)
+        return self.detector
+
+    def key_for(self, detector):
+        """
+        (id, ruta, hash) del motor del que proviene `detector`, o None si ya
+        fue sustituido (sus resultados no deben asociarse al motor nuevo)
+        """
+        with self._lock:
+            if detector is None or detector is not self.detector:
+                return None
+            return _engine_key(self.active_engine)
+
+    def status(self):
+        engine = self.active_engine
+        return {
+            'model_loaded_attempted': self.model_loaded,
+            'detector_initialized': self.detector is not None,
+            'swap_in_progress': self._loading_key is not None,
+            'last_error': self.last_error,
+            'stub': self._stub,
+            'backend': self.detector.describe() if self.detector else None,
+            'active_engine': {
+                'id': engine['id'],
+                'tipo': engine['tipo'],
+                'version': engine['version'],
+                'ruta_archivo': engine['ruta_archivo']
+            } if engine else None
+        }
+
+
+detector_manager = DetectorManager()
+# Motor pesado de la cascada del modelo de AA activo (ver cascade.py)
+cascade_manager = DetectorManager()
+
+
+@register_job('engine.load')
+def load_engine_job(ctx, engine_id):
+    """Carga en este worker el motor `engine_id` si sigue siendo el activo"""
+    from ..services.config_cache import config_cache
+
+    ctx.progress(5, 'Leyendo el motor activo')
+    engine = config_cache.get_active_engine()
+    if not engine or engine['id'] != engine_id:
+        raise RuntimeError(f'El motor {engine_id} ya no es el motor activo')
+    ctx.check_cancelled()
+    ctx.progress(20, f"Cargando {engine['tipo']} v{engine['version']}")
+    if detector_manager.load(engine) is None:
+        raise RuntimeError(detector_manager.last_error or 'Error al cargar el nuevo motor')
+    return {'engine_id': engine['id'], 'tipo': engine['tipo'], 'version': engine['version']}
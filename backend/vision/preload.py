@@ -0,0 +1,100 @@
+"""
+Carga de modelos en el master de gunicorn (preload_app)
+Con carga perezosa cada worker lee sus propios pesos: N workers = N copias.
+Con GUNICORN_PRELOAD=true el master crea la app, carga el motor activo (y
+el de cascada) y recién entonces hace fork: los workers comparten esas
+páginas copy-on-write y solo crean su propio contexto de ejecución (hilos
+de torch, pool de inferencia, conexiones a la BD).
+
+- Los modelos se fusionan (Conv+BN en ultralytics) en el master: si no, la
+  primera predicción de cada worker crea tensores fusionados privados.
+- PRELOAD_SHARE_MEMORY=true además mueve los pesos a memoria compartida,
+  de modo que ninguna escritura accidental los duplique.
+- gc.freeze() deja los objetos del master fuera del recolector: si no, el
+  GC de cada worker escribe en sus cabeceras y rompe el copy-on-write.
+- En el master no se ejecuta ninguna inferencia y torch queda con un solo
+  hilo: un pool de OpenMP activo antes del fork puede bloquear a los hijos.
+
+La memoria única por worker se mide con `flask memory-report`.
+"""
+
+import gc
+import logging
+import os
+import time
+
+from ..database.models import db
+from ..services.config_cache import config_cache
+from .executor import inference_executor
+from .manager import detector_manager, cascade_manager
+from .resources import cpu_resources
+
+logger = logging.getLogger(__name__)
+
+
+def _configure_cpu(app, worker_index, workers, torch_threads, pin):
+    return cpu_resources.configure(
+        workers=workers,
+        worker_index=worker_index,
+        torch_threads=torch_threads,
+        interop_threads=app.config['TORCH_INTEROP_THREADS'],
+        pin=pin
+    )
+
+
+def preload_models(app):
+    """Carga (en el master) los motores que usará la configuración activa"""
+    start = time.perf_counter()
+    summary = {'engines': [], 'shared_bytes': 0}
+    # Un solo hilo de torch en el master (sin pool de OpenMP antes del fork)
+    _configure_cpu(app, 0, 1, 1, pin=False)
+    with app.app_context():
+        engine = config_cache.get_active_engine()
+        profile = config_cache.get_active_ac_model()
+        heavy = None
+        if profile and profile['cascada_activa'] and profile['motor_cascada_id']:
+            heavy = config_cache.get_engine(profile['motor_cascada_id'])
+
+        for manager, target in ((detector_manager, engine), (cascade_manager, heavy)):
+            if target is None:
+                continue
+            detector = manager.load(target)
+            if detector is None:
+                continue
+            summary['engines'].append(f"{target['tipo']} v{target['version']}")
+            # Siempre: si no, cada worker fusiona en su primera predicción (pesos privados)
+            detector.fuse()
+            if app.config['PRELOAD_SHARE_MEMORY']:
+                try:
+                    summary['shared_bytes'] += detector.share_weights()
+                except Exception:
+                    logger.exception('No se pudieron compartir los pesos de %s', target['tipo'])
+
+        # Las conexiones abiertas por el master no deben heredarse
+        db.engine.dispose()
+
+    gc.collect()
+    gc.freeze()
+    summary['seconds'] = round(time.perf_counter() - start, 2)
+    logger.info('Modelos precargados en el master (%s) en %ss; %.1f MB en memoria compartida',
+                ', '.join(summary['engines']) or 'ninguno', summary['seconds'], summary['shared_bytes'] / 1e6)
+    return summary
+
+
+def after_fork(app):
+    """Contexto de ejecución propio del worker recién creado"""
+    with app.app_context():
+        # Conexiones del pool heredadas del master: se descartan sin cerrarlas
+        db.engine.dispose(close=False)
+    inference_executor.reset()
+    _configure_cpu(
+        app,
+        int(os.getenv('WORKER_INDEX', 0)),
+        int(os.getenv('GUNICORN_WORKERS', app.config['WORKER_COUNT'])),
+        app.config['TORCH_THREADS'],
+        pin=app.config['CPU_PINNING']
+    )
+    loaded = [m.detector for m in (detector_manager, cascade_manager) if m.detector is not None]
+    if any(d.uses_torch for d in loaded):
+        # torch ya está importado: los hilos del worker se aplican ahora
+        cpu_resources.apply_to_libraries()
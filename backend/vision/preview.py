@@ -0,0 +1,229 @@
+"""
+Vista previa anotada de las estaciones (MJPEG)
+Cada frame procesado se anota una sola vez (cajas y conteo, sobre un buffer
+reutilizado por estación), se codifica a JPEG una sola vez y se reparte como
+multipart/x-mixed-replace a cualquier cantidad de visores: pantallas de
+supervisión, monitores de planta, etc. Ningún cliente provoca una
+recodificación.
+
+Los frames de una estación pueden caer en cualquier worker de gunicorn, así
+que el último JPEG se publica en PREVIEW_FOLDER/<estación>.jpg (reemplazo
+atómico). Los visores de cada worker comparten una única lectura por frame
+nuevo. Solo se anota mientras alguien mira: los visores renuevan
+PREVIEW_FOLDER/<estación>.watch y quien procesa el frame lo consulta con un
+os.stat cacheado (y, de paso, renueva <estación>.alive para el listado).
+
+Los streams son conexiones largas: con workers sync ocupan el worker
+entero, por eso se cortan a los PREVIEW_STREAM_SECONDS y el cliente
+reconecta. Con gevent no hay ese problema.
+"""
+
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+BOUNDARY = 'frame'
+VIEWER_TTL = 5.0        # Segundos sin visores antes de dejar de anotar
+WATCH_CHECK_S = 1.0     # Frecuencia de os.stat del archivo de visores
+ACTIVE_STATION_S = 10.0  # Una estación sin frames nuevos en este tiempo no se lista
+
+COLOR_VALID = (0, 200, 0)
+COLOR_LOW = (150, 150, 150)
+COLOR_FAIL = (0, 0, 230)
+
+
+class FrameAnnotator:
+    """Dibuja las detecciones sobre un buffer propio de cada estación"""
+
+    def __init__(self, max_width=960, quality=75):
+        self.max_width = max_width
+        self.quality = quality
+        self._buffers = {}
+
+    def _buffer(self, station, height, width):
+        import numpy as np
+        buf = self._buffers.get(station)
+        if buf is None or buf.shape[:2] != (height, width):
+            buf = np.empty((height, width, 3), np.uint8)
+            self._buffers[station] = buf
+        return buf
+
+    def render(self, station, frame, detections, threshold, target, template=None, slots=None):
+        """Frame BGR + detecciones de la API (+ posiciones de la plantilla) -> bytes JPEG anotados"""
+        import cv2
+        import numpy as np
+
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.max_width / width) if self.max_width else 1.0
+        out_w, out_h = max(1, int(width * scale)), max(1, int(height * scale))
+        buf = self._buffer(station, out_h, out_w)
+        # Copia (o reducción) al buffer de la estación: sin frame.copy() por frame
+        if scale < 1.0:
+            cv2.resize(frame, (out_w, out_h), dst=buf, interpolation=cv2.INTER_AREA)
+        else:
+            np.copyto(buf, frame)
+
+        valid = 0
+        for det in detections:
+            x1, y1, x2, y2 = (int(v * scale) for v in det['box'])
+            if det['confidence'] >= threshold:
+                valid += 1
+                cv2.rectangle(buf, (x1, y1), (x2, y2), COLOR_VALID, 2)
+                cv2.putText(buf, f"{det['confidence']:.2f}", (x1, max(12, y1 - 6)),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.45, COLOR_VALID, 1, cv2.LINE_AA)
+            else:
+                cv2.rectangle(buf, (x1, y1), (x2, y2), COLOR_LOW, 1)
+
+        if template is not None and slots is not None:
+            # Posiciones esperadas: verde ocupada, rojo faltante
+            radius = max(4, int(template.tolerance * out_w))
+            for (x, y), state in zip(template.positions, slots['slots']):
+                cv2.circle(buf, (int(x * out_w), int(y * out_h)), radius,
+                           COLOR_VALID if state == '1' else COLOR_FAIL, 2)
+            valid, target = slots['present'], len(template)
+
+        color = COLOR_VALID if valid == target else COLOR_FAIL
+        cv2.putText(buf, f"{valid} / {target}", (10, 28), cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2, cv2.LINE_AA)
+
+        ok, jpeg = cv2.imencode('.jpg', buf, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            raise RuntimeError('No se pudo codificar el frame anotado')
+        return jpeg.tobytes()
+
+
+class PreviewHub:
+    """Publicación y reparto del último frame anotado de cada estación"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.folder = None
+        self.fps = 5
+        self.stream_seconds = 60
+        self.annotator = FrameAnnotator()
+        self._watch_cache = {}   # estación -> (hora de consulta, hay visores)
+        self._frames = {}        # estación -> (mtime_ns, chunk multipart)
+        self.published = 0
+
+    def configure(self, folder, max_width=960, quality=75, fps=5, stream_seconds=60):
+        self.folder = folder
+        self.fps = max(1, fps)
+        self.stream_seconds = stream_seconds
+        self.annotator = FrameAnnotator(max_width, quality)
+
+    def _path(self, station, ext):
+        return os.path.join(self.folder, f'{int(station)}.{ext}')
+
+    # ------------------------------------------------------------
+    # Lado del procesamiento (/process-frame)
+    # ------------------------------------------------------------
+
+    def wanted(self, station):
+        """
+        True si algún visor (de cualquier worker) miró la estación hace poco.
+        Se llama en cada frame, pero solo toca el disco una vez por segundo.
+        """
+        if self.folder is None:
+            return False
+        now = time.monotonic()
+        cached = self._watch_cache.get(station)
+        if cached and now - cached[0] < WATCH_CHECK_S:
+            return cached[1]
+        self._touch(station, 'alive')
+        try:
+            watching = time.time() - os.stat(self._path(station, 'watch')).st_mtime < VIEWER_TTL
+        except OSError:
+            watching = False
+        self._watch_cache[station] = (now, watching)
+        return watching
+
+    def publish(self, station, frame, detections, profile, template=None, slots=None):
+        """Anota y publica el frame; los errores no afectan a la detección"""
+        try:
+            threshold = profile['confidence_threshold'] if profile else 0.5
+            target = profile['target_tornillos'] if profile else 0
+            jpeg = self.annotator.render(station, frame, detections, threshold, target, template, slots)
+            os.makedirs(self.folder, exist_ok=True)
+            path = self._path(station, 'jpg')
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(jpeg)
+            os.replace(tmp_path, path)
+            self.published += 1
+        except Exception:
+            logger.exception('Error publicando la vista previa de la estación %s', station)
+
+    def _touch(self, station, ext):
+        path = self._path(station, ext)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            os.makedirs(self.folder, exist_ok=True)
+            open(path, 'a').close()
+
+    # ------------------------------------------------------------
+    # Lado de los visores
+    # ------------------------------------------------------------
+
+    def latest(self, station):
+        """(mtime_ns, chunk multipart) del último frame; se lee una vez por worker"""
+        try:
+            mtime = os.stat(self._path(station, 'jpg')).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._frames.get(station)
+            if cached and cached[0] == mtime:
+                return cached
+            try:
+                with open(self._path(station, 'jpg'), 'rb') as f:
+                    jpeg = f.read()
+            except OSError:
+                return cached
+            chunk = (
+                f'--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n'.encode()
+                + jpeg + b'\r\n'
+            )
+            self._frames[station] = (mtime, chunk)
+            return self._frames[station]
+
+    def stream(self, station):
+        """Generador multipart/x-mixed-replace para un visor"""
+        interval = 1.0 / self.fps
+        deadline = time.monotonic() + self.stream_seconds if self.stream_seconds else None
+        last_mtime, last_touch = None, 0.0
+        while deadline is None or time.monotonic() < deadline:
+            now = time.monotonic()
+            if now - last_touch >= 1.0:
+                self._touch(station, 'watch')
+                last_touch = now
+            frame = self.latest(station)
+            if frame and frame[0] != last_mtime:
+                last_mtime = frame[0]
+                yield frame[1]
+            time.sleep(interval)
+
+    def stations(self):
+        """IDs de las estaciones con frames publicados recientemente"""
+        if self.folder is None or not os.path.isdir(self.folder):
+            return []
+        now = time.time()
+        active = []
+        for name in os.listdir(self.folder):
+            stem, ext = os.path.splitext(name)
+            if ext != '.alive' or not stem.isdigit():
+                continue
+            try:
+                if now - os.stat(os.path.join(self.folder, name)).st_mtime < ACTIVE_STATION_S:
+                    active.append(int(stem))
+            except OSError:
+                continue
+        return sorted(active)
+
+    def status(self):
+        return {'folder': self.folder, 'fps': self.fps, 'published_frames': self.published}
+
+
+preview_hub = PreviewHub()
@@ -0,0 +1,96 @@
+"""
+Reparto de CPU entre workers de gunicorn
+Con varios workers y torch usando por defecto tantos hilos como núcleos,
+los hilos de inferencia se pisan entre sí y la latencia se vuelve errática.
+Este módulo calcula al arrancar cada worker cuántos hilos le corresponden
+(núcleos disponibles / workers), lo aplica a OpenMP/MKL, OpenCV y torch y,
+opcionalmente, fija el worker a un subconjunto disjunto de núcleos.
+
+torch y OpenCV no se importan al arrancar: el límite se exporta por
+variables de entorno y se aplica a las librerías justo antes de construir
+el detector.
+"""
+
+import os
+import threading
+
+
+def available_cores():
+    """Núcleos que este proceso puede usar (respeta cgroups/affinity en Linux)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class CpuResourceManager:
+    """Calcula y aplica la distribución de hilos/núcleos del worker actual"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.layout = None
+        self._torch_applied = False
+
+    def configure(self, workers, worker_index=0, torch_threads=0, interop_threads=1, pin=False):
+        """
+        Calcula el layout del worker `worker_index` de `workers` y lo aplica a
+        nivel de proceso (variables de entorno, OpenCV, afinidad).
+        """
+        cores = available_cores()
+        workers = max(1, workers)
+        worker_index = worker_index % workers
+        per_worker = max(1, len(cores) // workers)
+
+        pinned = None
+        if pin and len(cores) >= workers:
+            start = worker_index * per_worker
+            pinned = cores[start:start + per_worker]
+
+        threads = torch_threads if torch_threads > 0 else per_worker
+        layout = {
+            'workers': workers,
+            'worker_index': worker_index,
+            'available_cores': len(cores),
+            'intra_op_threads': threads,
+            'inter_op_threads': max(1, interop_threads),
+            'opencv_threads': threads,
+            'pinned_cores': pinned,
+            'torch_applied': False
+        }
+
+        # Deben fijarse antes de que torch/OpenMP se importen
+        for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+            os.environ.setdefault(var, str(threads))
+
+        if pinned and hasattr(os, 'sched_setaffinity'):
+            try:
+                os.sched_setaffinity(0, pinned)
+            except OSError:
+                layout['pinned_cores'] = None
+
+        with self._lock:
+            self.layout = layout
+            self._torch_applied = False
+        return layout
+
+    def apply_to_libraries(self):
+        """Aplica los hilos a OpenCV y torch; se llama antes de construir el detector"""
+        with self._lock:
+            if self._torch_applied or self.layout is None:
+                return
+            import cv2
+            import torch
+            cv2.setNumThreads(self.layout['opencv_threads'])
+            torch.set_num_threads(self.layout['intra_op_threads'])
+            try:
+                # Solo se puede fijar una vez y antes de cualquier trabajo paralelo
+                torch.set_interop_threads(self.layout['inter_op_threads'])
+            except RuntimeError:
+                self.layout['inter_op_threads'] = torch.get_num_interop_threads()
+            self._torch_applied = True
+            self.layout['torch_applied'] = True
+
+    def status(self):
+        return dict(self.layout) if self.layout else None
+
+
+cpu_resources = CpuResourceManager()
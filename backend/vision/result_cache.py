@@ -0,0 +1,80 @@
+"""
+Caché de resultados de inferencia por contenido del frame
+Reintentos del navegador, reconexiones y fuentes de video en pausa reenvían
+JPEGs idénticos byte a byte. La clave es un hash rápido de los bytes del
+JPEG más el motor (id, ruta y hash del archivo), el motor de cascada y la
+versión del perfil activo; un acierto devuelve las detecciones sin
+decodificar ni llamar al modelo.
+
+LRU acotada por worker (FRAME_CACHE_SIZE entradas; 0 la desactiva). Los
+resultados se comparten entre respuestas y no deben modificarse.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def frame_digest(frame_bytes):
+    """Hash de 128 bits del JPEG (blake2b: ~1 GB/s, sin dependencias)"""
+    return hashlib.blake2b(frame_bytes, digest_size=16).digest()
+
+
+class FrameResultCache:
+    def __init__(self, max_entries=64):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, max_entries):
+        with self._lock:
+            self.max_entries = max_entries
+            self._entries.clear()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @staticmethod
+    def make_key(digest, engine_key, heavy_key, profile):
+        profile_key = (profile['id'], profile['updated_at']) if profile else None
+        return (digest, engine_key, heavy_key, profile_key)
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def status(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'max_entries': self.max_entries,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+frame_result_cache = FrameResultCache()
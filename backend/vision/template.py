@@ -0,0 +1,194 @@
+"""
+Plantillas de posiciones de tornillos por modelo de AA
+Un ACModel puede guardar las posiciones esperadas de sus tornillos
+(coordenadas normalizadas [0, 1] capturadas de un frame de referencia). En
+cada frame las detecciones válidas se asignan a las posiciones y el
+resultado por posición (presente/ausente) reemplaza al conteo: un tornillo
+faltante ya no se compensa con un falso positivo en otro lugar.
+
+- Índice espacial: rejilla uniforme con celdas del tamaño de la tolerancia;
+  cada detección solo se compara con las posiciones de sus 9 celdas vecinas.
+- Asignación óptima (Hungarian) por componente conexa del grafo de
+  candidatos; en la práctica casi todas son de 1x1 y se resuelven directo.
+
+El resultado se guarda como una cadena compacta, una posición por carácter
+('1' presente, '0' ausente), en el mismo orden que la plantilla.
+"""
+
+import math
+from collections import defaultdict
+
+DEFAULT_TOLERANCE = 0.04   # Distancia máxima (normalizada) detección-posición
+_NO_EDGE = 1e6             # Costo de un par que no es candidato
+
+_templates = {}
+
+
+class SlotTemplate:
+    """Posiciones esperadas de un ACModel con su índice de rejilla"""
+
+    def __init__(self, positions, tolerance=DEFAULT_TOLERANCE):
+        self.positions = [(float(x), float(y)) for x, y in positions]
+        self.tolerance = float(tolerance)
+        self._cells = defaultdict(list)
+        for index, (x, y) in enumerate(self.positions):
+            self._cells[self._cell(x, y)].append(index)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _cell(self, x, y):
+        return int(x // self.tolerance), int(y // self.tolerance)
+
+    def candidates(self, x, y):
+        """[(posición, distancia)] dentro de la tolerancia del punto"""
+        cx, cy = self._cell(x, y)
+        found = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for index in self._cells.get((cx + dx, cy + dy), ()):
+                    px, py = self.positions[index]
+                    distance = math.hypot(px - x, py - y)
+                    if distance <= self.tolerance:
+                        found.append((index, distance))
+        return found
+
+    def match(self, points):
+        """
+        Asigna puntos normalizados a posiciones. Devuelve (lista posición ->
+        índice del punto o None, cantidad de puntos sin posición).
+        """
+        edges = [self.candidates(x, y) for x, y in points]
+        assigned = [None] * len(self)
+        extra = 0
+        for slots, dets in _components(edges):
+            if not slots:
+                extra += len(dets)
+                continue
+            if len(slots) == 1 and len(dets) == 1:
+                assigned[slots[0]] = dets[0]
+                continue
+            distances = {(s, d): dist for d in dets for s, dist in edges[d]}
+            # Filas = lado más chico (requisito del Hungarian rectangular)
+            transpose = len(dets) < len(slots)
+            rows, cols = (dets, slots) if transpose else (slots, dets)
+            cost = [
+                [distances.get((c, r) if transpose else (r, c), _NO_EDGE) for c in cols]
+                for r in rows
+            ]
+            matched = 0
+            for i, j in _assign(cost).items():
+                if cost[i][j] >= _NO_EDGE:
+                    continue
+                slot, det = (cols[j], rows[i]) if transpose else (rows[i], cols[j])
+                assigned[slot] = det
+                matched += 1
+            extra += len(dets) - matched
+        return assigned, extra
+
+
+def _components(edges):
+    """Componentes conexas (posiciones, detecciones) del grafo de candidatos"""
+    by_slot = defaultdict(list)
+    for det, candidates in enumerate(edges):
+        for slot, _ in candidates:
+            by_slot[slot].append(det)
+
+    seen = set()
+    for start in range(len(edges)):
+        if start in seen:
+            continue
+        seen.add(start)
+        dets, slots, stack = [], set(), [start]
+        while stack:
+            det = stack.pop()
+            dets.append(det)
+            for slot, _ in edges[det]:
+                if slot in slots:
+                    continue
+                slots.add(slot)
+                for other in by_slot[slot]:
+                    if other not in seen:
+                        seen.add(other)
+                        stack.append(other)
+        yield sorted(slots), dets
+
+
+def _assign(cost):
+    """
+    Asignación de costo mínimo (Hungarian con potenciales, O(n²m)) para una
+    matriz n x m con n <= m. Devuelve {fila: columna}.
+    """
+    n, m = len(cost), len(cost[0])
+    u, v = [0.0] * (n + 1), [0.0] * (m + 1)
+    p, way = [0] * (m + 1), [0] * (m + 1)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [math.inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0, delta, j1 = p[j0], math.inf, 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    current = cost[i0 - 1][j - 1] - u[i0] - v[j]
+                    if current < minv[j]:
+                        minv[j], way[j] = current, j0
+                    if minv[j] < delta:
+                        delta, j1 = minv[j], j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    return {p[j] - 1: j - 1 for j in range(1, m + 1) if p[j]}
+
+
+def template_for(profile):
+    """SlotTemplate del perfil (cacheada por modelo y fecha de edición) o None"""
+    if not profile or not profile.get('plantilla'):
+        return None
+    key = (profile['id'], profile['updated_at'])
+    template = _templates.get(key)
+    if template is None:
+        template = SlotTemplate(profile['plantilla'], profile.get('plantilla_tolerancia') or DEFAULT_TOLERANCE)
+        _templates.clear()  # Solo se usa el perfil activo: no se acumulan versiones viejas
+        _templates[key] = template
+    return template
+
+
+def box_centers(detections, width, height, threshold):
+    """Centros normalizados de las detecciones con confianza >= threshold"""
+    centers = []
+    for det in detections:
+        if det['confidence'] >= threshold:
+            x1, y1, x2, y2 = (float(v) for v in det['box'])
+            centers.append(((x1 + x2) / 2 / width, (y1 + y2) / 2 / height))
+    return centers
+
+
+def match_slots(template, detections, width, height, threshold):
+    """Resultado por posición para la respuesta de /process-frame"""
+    assigned, extra = template.match(box_centers(detections, width, height, threshold))
+    slots = ''.join('0' if det is None else '1' for det in assigned)
+    return {
+        'slots': slots,
+        'present': slots.count('1'),
+        'missing': [i for i, det in enumerate(assigned) if det is None],
+        'extra': extra
+    }
+
+
+def positions_from_detections(detections, width, height, threshold):
+    """Plantilla a partir de un frame de referencia: centros ordenados por fila y columna"""
+    centers = box_centers(detections, width, height, threshold)
+    return [[round(x, 4), round(y, 4)] for x, y in sorted(centers, key=lambda c: (round(c[1], 2), c[0]))]
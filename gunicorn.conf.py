@@ -0,0 +1,53 @@
+"""
+Configuración de Gunicorn para Tornillo Detector
+Los valores se pueden ajustar con variables de entorno sin reconstruir la imagen.
+
+- GUNICORN_WORKERS: número de procesos (por defecto 2)
+- GUNICORN_WORKER_CLASS: 'sync' (por defecto) o 'gevent'. Con gevent la
+  inferencia corre en el threadpool nativo (backend/vision/executor.py) y un
+  solo worker atiende muchas peticiones livianas concurrentes.
+- GUNICORN_WORKER_CONNECTIONS: greenlets máximos por worker gevent
+- GUNICORN_TIMEOUT: segundos antes de reiniciar un worker bloqueado
+- GUNICORN_PRELOAD: 'true' crea la app y carga el motor activo en el master
+  antes del fork; los workers comparten los pesos copy-on-write
+  (backend/vision/preload.py). Medir con `flask memory-report`.
+"""
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', 2))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 500))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'false').lower() in ('1', 'true', 'yes')
+
+
+# ============================================================
+# PRECARGA DE MODELOS (solo con preload_app)
+# ============================================================
+def when_ready(server):
+    """En el master, con la app ya creada y antes de lanzar los workers"""
+    if server.cfg.preload_app:
+        from backend.vision.preload import preload_models
+        preload_models(server.app.wsgi())
+
+
+# ============================================================
+# ÍNDICE DE WORKER (para el reparto de CPU en backend/vision/resources.py)
+# ============================================================
+def pre_fork(server, worker):
+    """Asigna al worker nuevo el menor índice libre (se reutiliza al reiniciar)"""
+    used = {getattr(w, 'worker_index', None) for w in server.WORKERS.values()}
+    index = 0
+    while index in used:
+        index += 1
+    worker.worker_index = index
+
+
+def post_fork(server, worker):
+    os.environ['WORKER_INDEX'] = str(worker.worker_index)
+    os.environ['GUNICORN_WORKERS'] = str(server.num_workers)
+    if server.cfg.preload_app:
+        # La app viene del master: el reparto de CPU y los pools son del worker
+        from backend.vision.preload import after_fork
+        after_fork(server.app.wsgi())
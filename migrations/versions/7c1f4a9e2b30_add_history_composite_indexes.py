@@ -0,0 +1,28 @@
+"""Add composite indexes for history keyset pagination
+
+Revision ID: 7c1f4a9e2b30
+Revises: 412ecdad13d2
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1f4a9e2b30'
+down_revision = '412ecdad13d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('detections', schema=None) as batch_op:
+        batch_op.create_index('ix_detections_team_timestamp', ['team', 'timestamp', 'id'], unique=False)
+        batch_op.create_index('ix_detections_user_id_timestamp', ['user_id', 'timestamp', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('detections', schema=None) as batch_op:
+        batch_op.drop_index('ix_detections_user_id_timestamp')
+        batch_op.drop_index('ix_detections_team_timestamp')
@@ -0,0 +1,45 @@
+"""Add detection_rollups table for archived detections
+
+Revision ID: a3d5e8f1c742
+Revises: 7c1f4a9e2b30
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d5e8f1c742'
+down_revision = '7c1f4a9e2b30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('detection_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('team', sa.String(length=80), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('ac_model_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('sum_confidence', sa.Float(), nullable=False),
+    sa.Column('sum_duracion_inferencia', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_detection_rollups')),
+    sa.UniqueConstraint('day', 'team', 'user_id', 'ac_model_id', 'status', name='uq_detection_rollups_key')
+    )
+    with op.batch_alter_table('detection_rollups', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_detection_rollups_day'), ['day'], unique=False)
+        batch_op.create_index(batch_op.f('ix_detection_rollups_team'), ['team'], unique=False)
+        batch_op.create_index(batch_op.f('ix_detection_rollups_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('detection_rollups', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_detection_rollups_user_id'))
+        batch_op.drop_index(batch_op.f('ix_detection_rollups_team'))
+        batch_op.drop_index(batch_op.f('ix_detection_rollups_day'))
+
+    op.drop_table('detection_rollups')
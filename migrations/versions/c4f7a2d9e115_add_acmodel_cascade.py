@@ -0,0 +1,41 @@
+"""Add cascade inference settings to ACModel
+
+Revision ID: c4f7a2d9e115
+Revises: b8e2c4d6f913
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f7a2d9e115'
+down_revision = 'b8e2c4d6f913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ac_models', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('cascada_activa', sa.Boolean(), nullable=True))
+        batch_op.add_column(sa.Column('motor_cascada_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('cascada_modo', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('cascada_margen', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('cascada_conf_min', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('cascada_conf_max', sa.Float(), nullable=True))
+        batch_op.create_foreign_key(
+            batch_op.f('fk_ac_models_motor_cascada_id_inference_engines'),
+            'inference_engines', ['motor_cascada_id'], ['id']
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('ac_models', schema=None) as batch_op:
+        batch_op.drop_constraint(batch_op.f('fk_ac_models_motor_cascada_id_inference_engines'), type_='foreignkey')
+        batch_op.drop_column('cascada_conf_max')
+        batch_op.drop_column('cascada_conf_min')
+        batch_op.drop_column('cascada_margen')
+        batch_op.drop_column('cascada_modo')
+        batch_op.drop_column('motor_cascada_id')
+        batch_op.drop_column('cascada_activa')
@@ -0,0 +1,36 @@
+"""Add early-exit rules to ACModel and exit time to Detection
+
+Revision ID: d1b3e5f7a926
+Revises: c4f7a2d9e115
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1b3e5f7a926'
+down_revision = 'c4f7a2d9e115'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ac_models', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('salida_anticipada_activa', sa.Boolean(), nullable=True))
+        batch_op.add_column(sa.Column('salida_anticipada_frames', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('salida_anticipada_conf_min', sa.Float(), nullable=True))
+
+    with op.batch_alter_table('detections', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('tiempo_salida_anticipada', sa.Float(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('detections', schema=None) as batch_op:
+        batch_op.drop_column('tiempo_salida_anticipada')
+
+    with op.batch_alter_table('ac_models', schema=None) as batch_op:
+        batch_op.drop_column('salida_anticipada_conf_min')
+        batch_op.drop_column('salida_anticipada_frames')
+        batch_op.drop_column('salida_anticipada_activa')
@@ -0,0 +1,34 @@
+"""Add screw-position templates to ACModel and per-slot results to Detection
+
+Revision ID: e6a2c8b4f057
+Revises: d1b3e5f7a926
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6a2c8b4f057'
+down_revision = 'd1b3e5f7a926'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ac_models', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('plantilla_posiciones', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('plantilla_tolerancia', sa.Float(), nullable=True))
+
+    with op.batch_alter_table('detections', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('posiciones', sa.String(length=255), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('detections', schema=None) as batch_op:
+        batch_op.drop_column('posiciones')
+
+    with op.batch_alter_table('ac_models', schema=None) as batch_op:
+        batch_op.drop_column('plantilla_tolerancia')
+        batch_op.drop_column('plantilla_posiciones')
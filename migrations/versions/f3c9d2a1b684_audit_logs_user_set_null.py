@@ -0,0 +1,34 @@
+"""Keep audit_logs rows when their user is deleted
+
+Revision ID: f3c9d2a1b684
+Revises: e6a2c8b4f057
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c9d2a1b684'
+down_revision = 'e6a2c8b4f057'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('audit_logs', schema=None) as batch_op:
+        batch_op.drop_constraint(batch_op.f('fk_audit_logs_usuario_id_users'), type_='foreignkey')
+        batch_op.alter_column('usuario_id', existing_type=sa.Integer(), nullable=True)
+        batch_op.create_foreign_key(batch_op.f('fk_audit_logs_usuario_id_users'), 'users',
+                                    ['usuario_id'], ['id'], ondelete='SET NULL')
+
+
+def downgrade():
+    # Las entradas de usuarios eliminados (usuario_id NULL) no caben en NOT NULL
+    op.execute('DELETE FROM audit_logs WHERE usuario_id IS NULL')
+    with op.batch_alter_table('audit_logs', schema=None) as batch_op:
+        batch_op.drop_constraint(batch_op.f('fk_audit_logs_usuario_id_users'), type_='foreignkey')
+        batch_op.alter_column('usuario_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_foreign_key(batch_op.f('fk_audit_logs_usuario_id_users'), 'users',
+                                    ['usuario_id'], ['id'])
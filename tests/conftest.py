@@ -0,0 +1,85 @@
+"""
+Fixtures comunes: aplicación con la configuración 'testing' (SQLite en
+memoria), un administrador y un modelo de AA sobre el motor 'stub', que no
+necesita archivo ni torch.
+"""
+
+import os
+import tempfile
+
+# Antes de importar la configuración: logs, subidas, exportaciones, archivo
+# y respaldo de auditoría fuera del árbol, y sin stdout (pytest cierra su captura antes del vaciado al salir)
+_TMP = tempfile.mkdtemp(prefix='tornillo-tests-')
+os.environ.setdefault('LOG_STDOUT', 'false')
+os.environ.setdefault('UPLOAD_FOLDER', os.path.join(_TMP, 'uploads'))
+os.environ.setdefault('EXPORT_FOLDER', os.path.join(_TMP, 'exports'))
+os.environ.setdefault('DETECTION_ARCHIVE_FOLDER', os.path.join(_TMP, 'archive'))
+os.environ.setdefault('LOG_FOLDER', os.path.join(_TMP, 'logs'))
+os.environ.setdefault('AUDIT_FALLBACK_FILE', os.path.join(_TMP, 'audit.jsonl'))
+
+import pytest  # noqa: E402
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from backend.app import create_app  # noqa: E402
+from backend.database.models import db, User, ACModel, InferenceEngine, Settings, Detection  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app('testing')
+    ctx = app.app_context()
+    ctx.push()
+    db.create_all()
+    admin = User(username='admin', email='admin@test', password_hash='x', team='T1', role='admin')
+    db.session.add(admin)
+    db.session.commit()
+    engine = InferenceEngine(tipo='stub', version='1', ruta_archivo='stub.pt',
+                             creado_por_id=admin.id, activo=True)
+    db.session.add(engine)
+    db.session.commit()
+    model = ACModel(nombre='M1', target_tornillos=4, motor_inferencia_id=engine.id, creado_por_id=admin.id)
+    db.session.add(model)
+    db.session.commit()
+    db.session.add(Settings(ac_model_activo_id=model.id))
+    db.session.commit()
+    yield app
+    ctx.pop()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers(app):
+    admin = User.query.filter_by(username='admin').one()
+    token = create_access_token(identity=str(admin.id), additional_claims={'role': 'admin', 'team': 'T1'})
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture
+def ac_model(app):
+    return ACModel.query.filter_by(nombre='M1').one()
+
+
+@pytest.fixture
+def add_detections(app, ac_model):
+    """Crea detecciones del equipo con los timestamps dados; se borran al terminar"""
+    created = []
+
+    def add(team, timestamps, status='PASS'):
+        rows = [
+            Detection(ac_model_id=ac_model.id, user_id=ac_model.creado_por_id,
+                      motor_inferencia_id=ac_model.motor_inferencia_id, team=team, status=status,
+                      confidence=0.9, detection_count=4, expected_count=4, timestamp=ts)
+            for ts in timestamps
+        ]
+        db.session.add_all(rows)
+        db.session.commit()
+        created.extend(row.id for row in rows)
+        return rows
+
+    yield add
+    Detection.query.filter(Detection.id.in_(created)).delete(synchronize_session=False)
+    db.session.commit()
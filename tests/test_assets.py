@@ -0,0 +1,14 @@
+import pytest
+
+
+@pytest.mark.parametrize('path', ['/../config.py', '/js/../../config.py', '/%2e%2e/config.py'])
+def test_static_path_traversal_returns_404(client, path):
+    response = client.get(path)
+    assert response.status_code == 404
+    assert b'SQLALCHEMY' not in response.data
+
+
+def test_static_file_is_served(app, client):
+    from backend.services.assets import _iter_static_files
+    path = next(p for p in _iter_static_files(app.static_folder) if '.' in p)
+    assert client.get('/' + path).status_code == 200
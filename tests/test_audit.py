@@ -0,0 +1,58 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from backend.services import audit
+from backend.services.audit import AuditWriter, _diff, _redact
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    entries = []
+    monkeypatch.setattr(audit.audit_writer, 'submit', entries.append)
+    return entries
+
+
+def test_update_is_audited_with_only_the_changed_fields(client, auth_headers, ac_model, submitted):
+    previous = ac_model.cascada_margen
+    response = client.put(f'/api/admin/ac-models/{ac_model.id}', json={'cascada_margen': previous + 1},
+                          headers=auth_headers)
+    assert response.status_code == 200
+
+    assert len(submitted) == 1
+    entry = submitted[0]
+    assert entry['accion'] == 'ac_models.update'
+    assert entry['tabla_afectada'] == 'ac_models' and entry['registro_id'] == ac_model.id
+    assert entry['usuario_id'] == ac_model.creado_por_id
+    before, after = json.loads(entry['detalles_anteriores']), json.loads(entry['detalles_nuevos'])
+    assert before['cascada_margen'] == previous and after['cascada_margen'] == previous + 1
+    assert 'nombre' not in after
+
+    client.put(f'/api/admin/ac-models/{ac_model.id}', json={'cascada_margen': previous}, headers=auth_headers)
+
+
+def test_rejected_request_is_not_audited(client, auth_headers, ac_model, submitted):
+    response = client.put(f'/api/admin/ac-models/{ac_model.id}', json={'cascada_conf_min': 'x'}, headers=auth_headers)
+    assert response.status_code == 400
+    assert submitted == []
+
+
+def test_redact_and_diff():
+    assert _redact({'id': 1, 'password_hash': 'x', 'api_token': 'y', 'nombre': 'n'}) == {'id': 1, 'nombre': 'n'}
+    assert _diff({'a': 1, 'b': 2}, {'a': 1, 'b': 3}) == ({'b': 2}, {'b': 3})
+    assert _diff(None, {'a': 1}) == (None, {'a': 1})
+
+
+def test_writer_falls_back_to_file_without_database(app, tmp_path):
+    writer = AuditWriter()
+    writer.init_app(app)
+    writer.fallback_file = str(tmp_path / 'audit.jsonl')
+    assert writer.db_enabled is False  # SQLite en memoria
+
+    writer.submit({'usuario_id': 1, 'accion': 'x.update', 'fecha': datetime(2026, 1, 1)})
+    writer.flush()
+
+    lines = (tmp_path / 'audit.jsonl').read_text(encoding='utf-8').splitlines()
+    assert [json.loads(line)['accion'] for line in lines] == ['x.update']
+    assert writer.status()['queued'] == 0
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from backend.vision.backends import (
+    Detections, EngineBackend, StubBackend, backend_extensions, get_backend, registered_backends
+)
+
+
+def _frame(value=0, size=64):
+    frame = np.zeros((size, size, 3), np.uint8)
+    frame[::7, ::5] = value
+    return frame
+
+
+def _plain(detections):
+    return [(d['box'].tolist(), float(d['confidence']), d['class_name']) for d in detections]
+
+
+def test_registry_resolves_types_and_extensions():
+    assert get_backend('stub') is StubBackend
+    assert {'stub', 'yolov8', 'efficientdet'} <= set(registered_backends())
+    assert backend_extensions('efficientdet') == ('.pth',)
+    assert backend_extensions('no-existe') is None
+    with pytest.raises(ValueError):
+        get_backend('no-existe')
+
+
+def test_stub_is_deterministic_per_frame():
+    backend = StubBackend(latency_ms=0)
+    first = backend.detect(_frame(10))
+    assert _plain(first) == _plain(backend.detect(_frame(10)))
+    assert all(d['class_name'] == 'tornillo' for d in first)
+    counts = {len(backend.detect(_frame(v))) for v in range(0, 255, 5)}
+    # Alrededor del objetivo (boxes=4): hay frames con más y con menos
+    assert counts <= {3, 4, 5} and len(counts) > 1
+
+
+def test_stub_batches_keep_frame_order():
+    backend = StubBackend(latency_ms=0)
+    frames = [_frame(v) for v in (1, 2, 3)]
+    batch = backend.predict_batch(frames)
+    assert [_plain(b.to_dicts(backend.class_names)) for b in batch] == [_plain(backend.detect(f)) for f in frames]
+
+
+class _Failing(EngineBackend):
+    requires_file = False
+
+    def predict_batch(self, frames):
+        raise RuntimeError('sin memoria')
+
+
+def test_try_detect_reports_failure_instead_of_raising():
+    backend = _Failing('x.pt', tipo='falla')
+    assert backend.try_detect(_frame()) == ([], False)
+    assert backend.detect(_frame()) == []
+    detections, ok = StubBackend(latency_ms=0).try_detect(_frame(3))
+    assert ok and detections
+
+
+def test_empty_detections():
+    empty = Detections.empty()
+    assert len(empty) == 0
+    assert empty.to_dicts({0: 'tornillo'}) == []
@@ -0,0 +1,104 @@
+import numpy as np
+
+from backend.vision.backends import Detections, EngineBackend
+from backend.vision.cascade import detect_with_cascade, escalation_reason
+
+PROFILE = {
+    'confidence_threshold': 0.5, 'target_tornillos': 4, 'cascada_margen': 1,
+    'cascada_conf_min': 0.25, 'cascada_conf_max': 0.6, 'cascada_modo': 'frame'
+}
+
+
+def _dets(boxes, scores):
+    return Detections(np.array(boxes, np.int32).reshape(-1, 4), np.array(scores, np.float32),
+                      np.zeros(len(scores), np.int32))
+
+
+def _boxes(n):
+    return [[10 + 20 * i, 10, 20 + 20 * i, 20] for i in range(n)]
+
+
+class _Fixed(EngineBackend):
+    """Devuelve siempre las mismas detecciones (o una por recorte) y registra las llamadas"""
+    requires_file = False
+    batch_size = 4
+
+    def __init__(self, result, per_crop=None, fail=False):
+        super().__init__('fijo.pt', tipo='fijo')
+        self.class_names = {0: 'tornillo'}
+        self.result = result
+        self.per_crop = per_crop
+        self.fail = fail
+        self.calls = []
+
+    def predict_batch(self, frames):
+        self.calls.append([f.shape for f in frames])
+        if self.fail:
+            raise RuntimeError('fallo del motor')
+        if self.per_crop is not None:
+            return [self.per_crop(f) for f in frames]
+        return [self.result for _ in frames]
+
+
+FRAME = np.zeros((60, 200, 3), np.uint8)
+
+
+def test_escalation_reasons():
+    assert escalation_reason(_dets(_boxes(4), [0.9] * 4), PROFILE) is None
+    assert escalation_reason(_dets(_boxes(3), [0.9] * 3), PROFILE) == 'count'
+    assert escalation_reason(_dets(_boxes(5), [0.9] * 4 + [0.4]), PROFILE) == 'ambiguous'
+    # Lejos del objetivo y sin dudas: no hay nada que el motor pesado pueda resolver
+    assert escalation_reason(_dets(_boxes(1), [0.9]), PROFILE) is None
+
+
+def test_clear_frame_does_not_escalate():
+    fast = _Fixed(_dets(_boxes(4), [0.9] * 4))
+    heavy = _Fixed(_dets([], []))
+    detections, info = detect_with_cascade(fast, heavy, FRAME, PROFILE)
+    assert len(detections) == 4 and info['escalated'] is False
+    assert heavy.calls == []
+
+
+def test_count_reason_reprocesses_full_frame():
+    fast = _Fixed(_dets(_boxes(3), [0.9] * 3))
+    heavy = _Fixed(_dets(_boxes(4), [0.95] * 4))
+    detections, info = detect_with_cascade(fast, heavy, FRAME, PROFILE)
+    assert info['reason'] == 'count' and info['mode'] == 'frame'
+    assert len(detections) == 4
+    assert heavy.calls == [[FRAME.shape]]
+
+
+def test_regions_mode_verifies_only_uncertain_boxes():
+    boxes = _boxes(6)
+    fast = _Fixed(_dets(boxes, [0.9, 0.9, 0.9, 0.9, 0.4, 0.3]))
+
+    def confirm_first_crop(crop):
+        # Confirma la dudosa solo en el primer recorte (el de la caja 4)
+        if heavy.confirmed:
+            return _dets([], [])
+        heavy.confirmed = True
+        return _dets([[10, 10, 20, 20]], [0.8])
+
+    heavy = _Fixed(None, per_crop=confirm_first_crop)
+    heavy.confirmed = False
+    detections, info = detect_with_cascade(fast, heavy, FRAME, dict(PROFILE, cascada_modo='regions'))
+    assert info['reason'] == 'ambiguous' and info['mode'] == 'regions'
+    # Un solo lote con los dos recortes, más chicos que el frame
+    assert len(heavy.calls) == 1 and len(heavy.calls[0]) == 2
+    assert all(shape[1] < FRAME.shape[1] for shape in heavy.calls[0])
+    # 4 confiables + la dudosa confirmada, en coordenadas del frame
+    assert len(detections) == 5
+    assert detections[-1]['box'].tolist() == boxes[4]
+
+
+def test_heavy_failure_falls_back_to_fast_and_marks_degraded():
+    fast = _Fixed(_dets(_boxes(3), [0.9] * 3))
+    heavy = _Fixed(None, fail=True)
+    detections, info = detect_with_cascade(fast, heavy, FRAME, PROFILE)
+    assert len(detections) == 3
+    assert info['degraded'] is True
+
+
+def test_fast_failure_is_degraded():
+    detections, info = detect_with_cascade(_Fixed(None, fail=True), None, FRAME, PROFILE)
+    assert detections == [] and info['degraded'] is True
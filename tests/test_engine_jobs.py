@@ -0,0 +1,31 @@
+import time
+
+from backend.database.models import InferenceEngine
+from backend.vision.manager import detector_manager
+
+
+def _wait_job(client, headers, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f'/api/detection/change-engine/jobs/{job_id}', headers=headers).get_json()['data']
+        if job['status'] in ('succeeded', 'failed', 'cancelled'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'El trabajo {job_id} no terminó')
+
+
+def test_change_engine_loads_model_as_background_job(client, auth_headers):
+    engine = InferenceEngine.query.filter_by(tipo='stub').first()
+    response = client.post(f'/api/detection/change-engine/{engine.id}', headers=auth_headers)
+    assert response.status_code == 202
+    job = response.get_json()['data']
+    assert job['tipo'] == 'engine.load'
+
+    job = _wait_job(client, auth_headers, job['id'])
+    assert job['status'] == 'succeeded'
+    assert job['progress'] == 100.0
+    assert detector_manager.status()['active_engine']['id'] == engine.id
+
+
+def test_engine_load_job_endpoint_only_serves_engine_jobs(client, auth_headers):
+    assert client.get('/api/detection/change-engine/jobs/999999', headers=auth_headers).status_code == 404
@@ -0,0 +1,69 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.database.models import Detection
+from backend.services.export import csv_stream, gzip_stream, json_stream, ndjson_stream
+
+RECORDS = [
+    [{'id': 2, 'user': 'ana', 'status': 'PASS', 'confidence': 0.9, 'detection_count': 4, 'timestamp': '2026-01-02T00:00:00'}],
+    [{'id': 1, 'user': 'luis', 'status': 'FAIL', 'confidence': 0.5, 'detection_count': 3, 'timestamp': '2026-01-01T00:00:00'}],
+]
+
+
+def test_json_stream_is_a_single_document():
+    document = json.loads(b''.join(json_stream(iter(RECORDS), {'team': 'T1'})))
+    assert document['export']['team'] == 'T1'
+    assert [d['id'] for d in document['export']['detections']] == [2, 1]
+    assert document['export']['total_records'] == 2
+
+
+def test_json_stream_without_rows():
+    document = json.loads(b''.join(json_stream(iter([]), {'team': 'T1'})))
+    assert document['export']['detections'] == [] and document['export']['total_records'] == 0
+
+
+def test_ndjson_and_csv_streams():
+    lines = b''.join(ndjson_stream(iter(RECORDS))).decode().splitlines()
+    assert [json.loads(line)['user'] for line in lines] == ['ana', 'luis']
+    rows = list(csv.DictReader(io.StringIO(b''.join(csv_stream(iter(RECORDS))).decode())))
+    assert [(r['id'], r['status']) for r in rows] == [('2', 'PASS'), ('1', 'FAIL')]
+
+
+def test_gzip_stream_round_trip():
+    chunks = [b'a' * 1000, b'', b'b' * 10]
+    assert gzip.decompress(b''.join(gzip_stream(iter(chunks)))) == b''.join(chunks)
+
+
+@pytest.fixture
+def team_rows(add_detections):
+    now = datetime.utcnow()
+    add_detections('T1', [now - timedelta(hours=i) for i in range(5)])
+    return Detection.query.filter(Detection.team == 'T1', Detection.timestamp >= now - timedelta(days=7)).count()
+
+
+@pytest.mark.parametrize('params, parse', [
+    ('format=json', lambda body: json.loads(body)['export']['detections']),
+    ('format=ndjson', lambda body: body.decode().splitlines()),
+    ('format=csv', lambda body: list(csv.DictReader(io.StringIO(body.decode())))),
+    ('format=csv&compress=gzip', lambda body: list(csv.DictReader(io.StringIO(gzip.decompress(body).decode())))),
+])
+def test_export_endpoint_formats(client, auth_headers, team_rows, params, parse):
+    response = client.get(f'/api/history/export?{params}', headers=auth_headers)
+    assert response.status_code == 200
+    assert len(parse(response.get_data())) == team_rows
+
+
+def test_export_endpoint_parquet(client, auth_headers, team_rows):
+    pq = pytest.importorskip('pyarrow.parquet')
+    response = client.get('/api/history/export?format=parquet', headers=auth_headers)
+    assert response.status_code == 200
+    assert pq.read_table(io.BytesIO(response.get_data())).num_rows == team_rows
+
+
+def test_export_endpoint_rejects_unknown_format(client, auth_headers):
+    assert client.get('/api/history/export?format=xml', headers=auth_headers).status_code == 400
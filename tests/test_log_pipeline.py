@@ -0,0 +1,43 @@
+import logging
+import sys
+
+from backend.services.log_pipeline import RateLimiter, native_primitives
+
+
+def _record(msg='Frame corrupto %s', created=1000.0, level=logging.ERROR, args=('x',)):
+    record = logging.makeLogRecord({'name': 'backend.routes.detection', 'levelno': level,
+                                    'msg': msg, 'args': args})
+    record.created = created
+    return record
+
+
+def test_burst_then_sampling_within_a_window():
+    limiter = RateLimiter(window=60, burst=3, sample=10)
+    allowed = [limiter.check(_record(created=1000.0 + i * 0.01))[0] for i in range(33)]
+    # 3 de la ráfaga y luego 1 de cada 10 (el 13º, 23º y 33º)
+    assert [i + 1 for i, ok in enumerate(allowed) if ok] == [1, 2, 3, 13, 23, 33]
+    assert limiter.suppressed == 27
+
+
+def test_messages_are_limited_by_template_not_by_arguments():
+    limiter = RateLimiter(window=60, burst=1, sample=1000)
+    assert limiter.check(_record(args=('a',)))[0]
+    assert not limiter.check(_record(args=('b',)))[0]
+    assert limiter.check(_record(msg='Otro mensaje'))[0]
+
+
+def test_closed_window_reports_suppressed_count():
+    limiter = RateLimiter(window=60, burst=1, sample=1000)
+    for i in range(5):
+        limiter.check(_record(created=1000.0 + i))
+    allowed, closed = limiter.check(_record(created=1100.0))
+    assert allowed
+    assert closed == [(('backend.routes.detection', logging.ERROR, 'Frame corrupto %s'), 4)]
+
+
+def test_native_primitives_without_gevent():
+    if 'gevent' not in sys.modules:
+        allocate_lock, start_new_thread, sleep = native_primitives()
+        assert 'gevent' not in sys.modules
+        with allocate_lock():
+            pass
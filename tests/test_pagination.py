@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.database.models import db, Detection
+from backend.database.pagination import InvalidCursorError, decode_cursor, encode_cursor, keyset_paginate
+
+
+def test_cursor_round_trip():
+    timestamp = datetime(2026, 1, 2, 3, 4, 5, 678000)
+    cursor = encode_cursor(timestamp, 42)
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == (timestamp, 42)
+
+
+@pytest.mark.parametrize('cursor', ['no-es-un-cursor', '!!!', encode_cursor(datetime(2026, 1, 1), 1)[:-4]])
+def test_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
+
+
+def test_keyset_walks_all_rows_once_with_timestamp_ties(add_detections):
+    base = datetime(2026, 3, 1, 12, 0, 0)
+    # Tres filas por timestamp: el id desempata sin perder ni repetir filas
+    rows = add_detections('PAGINAS', [base - timedelta(minutes=i // 3) for i in range(20)])
+    query = db.session.query(Detection.id, Detection.timestamp).filter(Detection.team == 'PAGINAS')
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        items, cursor = keyset_paginate(query, Detection.timestamp, Detection.id, 6, cursor)
+        seen.extend(item.id for item in items)
+        pages += 1
+        if cursor is None:
+            break
+
+    expected = [r.id for r in sorted(rows, key=lambda r: (r.timestamp, r.id), reverse=True)]
+    assert seen == expected
+    assert pages == 4
+
+
+def test_history_endpoint_rejects_bad_cursor(client, auth_headers):
+    response = client.get('/api/history/team?cursor=basura', headers=auth_headers)
+    assert response.status_code == 400
@@ -0,0 +1,48 @@
+import base64
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+
+
+def _jpeg(value=0):
+    frame = np.full((96, 128, 3), value, np.uint8)
+    frame[::9, ::7] = 255 - value
+    return cv2.imencode('.jpg', frame)[1].tobytes()
+
+
+def _post_jpeg(client, headers, body):
+    return client.post('/api/detection/process-frame', data=body,
+                       headers={**headers, 'Content-Type': 'image/jpeg'})
+
+
+def test_valid_frame_returns_detections(client, auth_headers):
+    response = _post_jpeg(client, auth_headers, _jpeg(40))
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['success'] is True
+    assert body['detections'] and all(d['class_name'] == 'tornillo' for d in body['detections'])
+
+
+def test_data_url_frame_is_accepted(client, auth_headers):
+    frame = 'data:image/jpeg;base64,' + base64.b64encode(_jpeg(80)).decode()
+    response = client.post('/api/detection/process-frame', json={'frame': frame}, headers=auth_headers)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('body', [b'no es un jpeg', b'\xff\xd8\xff\xe0' + b'\x00' * 64, _jpeg()[:40]])
+def test_corrupt_jpeg_returns_400(client, auth_headers, body):
+    response = _post_jpeg(client, auth_headers, body)
+    assert response.status_code == 400
+    assert 'Frame inválido' in response.get_json()['error']
+
+
+def test_malformed_data_url_returns_400(client, auth_headers):
+    response = client.post('/api/detection/process-frame', json={'frame': 'data:image/jpeg;base64,abc'},
+                           headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_empty_body_returns_400(client, auth_headers):
+    assert _post_jpeg(client, auth_headers, b'').status_code == 400
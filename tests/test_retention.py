@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.database.models import Detection
+from backend.services.retention import archive_old_detections, iter_archived_batches, rollup_totals
+
+pytest.importorskip('pyarrow')
+
+
+def test_archive_cutoff_is_utc_midnight(add_detections):
+    days = 30
+    cutoff = datetime.combine(datetime.utcnow().date() - timedelta(days=days), datetime.min.time())
+    old = add_detections('RETENCION', [cutoff - timedelta(minutes=1), cutoff - timedelta(days=2)], status='FAIL')
+    kept = add_detections('RETENCION', [cutoff + timedelta(minutes=1)])
+    old_ids = sorted(r.id for r in old)
+
+    result = archive_old_detections(retention_days=days)
+
+    assert result['cutoff'] == cutoff.isoformat()
+    assert result['archived'] == 2
+    remaining = [d.id for d in Detection.query.filter_by(team='RETENCION')]
+    assert remaining == [kept[0].id]
+
+    archived = [r for batch in iter_archived_batches('RETENCION', cutoff - timedelta(days=5)) for r in batch]
+    assert sorted(r['id'] for r in archived) == old_ids
+    count, passed, _, _ = rollup_totals(team='RETENCION')
+    assert (count, passed) == (2, 0)
+
+
+def test_archive_disabled_with_zero_days():
+    assert archive_old_detections(retention_days=0) == {'archived': 0, 'days': [], 'cutoff': None}
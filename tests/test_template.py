@@ -0,0 +1,72 @@
+import itertools
+import random
+
+import numpy as np
+
+from backend.vision.template import SlotTemplate, _assign, match_slots, positions_from_detections
+
+GRID = [[0.2, 0.2], [0.5, 0.2], [0.8, 0.2], [0.2, 0.8], [0.5, 0.8], [0.8, 0.8]]
+
+
+def test_each_detection_fills_its_nearest_slot():
+    template = SlotTemplate(GRID, tolerance=0.05)
+    assigned, extra = template.match([(0.81, 0.79), (0.21, 0.2), (0.5, 0.83)])
+    assert assigned == [1, None, None, None, 2, 0]
+    assert extra == 0
+
+
+def test_false_positive_does_not_compensate_a_missing_screw():
+    template = SlotTemplate(GRID, tolerance=0.05)
+    points = [tuple(p) for p in GRID[:5]] + [(0.5, 0.5)]  # Falta la 6ª, sobra una en el centro
+    assigned, extra = template.match(points)
+    assert assigned[5] is None
+    assert extra == 1
+
+
+def test_contested_slots_use_optimal_assignment():
+    # Dos detecciones entre dos posiciones cercanas: la asignación voraz de la
+    # primera a su más cercana dejaría a la segunda sin posición
+    template = SlotTemplate([[0.50, 0.5], [0.56, 0.5]], tolerance=0.05)
+    assigned, extra = template.match([(0.53, 0.5), (0.49, 0.5)])
+    assert assigned == [1, 0]
+    assert extra == 0
+
+
+def test_more_detections_than_slots_in_a_component():
+    template = SlotTemplate([[0.5, 0.5]], tolerance=0.05)
+    assigned, extra = template.match([(0.52, 0.5), (0.5, 0.51), (0.48, 0.5)])
+    assert assigned == [1]
+    assert extra == 2
+
+
+def test_hungarian_matches_brute_force():
+    rng = random.Random(7)
+    for _ in range(50):
+        n, m = rng.randint(1, 4), rng.randint(4, 6)
+        cost = [[rng.random() for _ in range(m)] for _ in range(n)]
+        result = _assign(cost)
+        best = min(
+            sum(cost[i][j] for i, j in enumerate(cols))
+            for cols in itertools.permutations(range(m), n)
+        )
+        assert sorted(result) == list(range(n))
+        assert len(set(result.values())) == n
+        assert abs(sum(cost[i][j] for i, j in result.items()) - best) < 1e-9
+
+
+def _det(x, y, confidence=0.9, size=10):
+    return {'box': np.array([x - size / 2, y - size / 2, x + size / 2, y + size / 2]),
+            'confidence': confidence, 'class_name': 'tornillo'}
+
+
+def test_match_slots_ignores_low_confidence_and_reports_missing():
+    template = SlotTemplate([[0.25, 0.5], [0.75, 0.5]], tolerance=0.05)
+    result = match_slots(template, [_det(50, 100), _det(150, 100, confidence=0.2)], 200, 200, 0.5)
+    assert result == {'slots': '10', 'present': 1, 'missing': [1], 'extra': 0}
+
+
+def test_positions_from_detections_are_ordered_by_row():
+    detections = [_det(150, 150), _det(50, 150), _det(150, 50), _det(50, 50)]
+    assert positions_from_detections(detections, 200, 200, 0.5) == [
+        [0.25, 0.25], [0.75, 0.25], [0.25, 0.75], [0.75, 0.75]
+    ]
@@ -0,0 +1,42 @@
+import base64
+
+import pytest
+
+
+def _put(client, headers, model, body):
+    return client.put(f'/api/admin/ac-models/{model.id}/template', json=body, headers=headers)
+
+
+@pytest.mark.parametrize('body', [
+    {'positions': [[0.1, 0.2]], 'tolerancia': 'x'},
+    {'positions': [[0.1, 0.2]], 'tolerancia': 0.9},
+    {'positions': [1, 2]},
+    {'positions': [None]},
+    {'positions': [{'x': 0.1, 'y': 0.2}]},
+    {'positions': {'x': 0.1}},
+    {'positions': [[0.1, 1.5]]},
+    {'positions': [[True, 0.5]]},
+])
+def test_invalid_template_payload_returns_400(client, auth_headers, ac_model, body):
+    response = _put(client, auth_headers, ac_model, body)
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+@pytest.mark.parametrize('frame', [
+    'data:image/jpeg;base64,abc',
+    'data:image/jpeg;base64,' + base64.b64encode(b'no es un jpeg').decode(),
+    123,
+])
+def test_corrupt_template_frame_returns_400(client, auth_headers, ac_model, frame):
+    response = _put(client, auth_headers, ac_model, {'frame': frame})
+    assert response.status_code == 400
+    assert 'Frame inválido' in response.get_json()['error']
+
+
+def test_template_accepts_numeric_string_tolerance(client, auth_headers, ac_model):
+    response = _put(client, auth_headers, ac_model, {'positions': [[0.1, 0.2], [0.8, 0.9]], 'tolerancia': '0.2'})
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert data['target_tornillos'] == 2
+    assert client.delete(f'/api/admin/ac-models/{ac_model.id}/template', headers=auth_headers).status_code == 200
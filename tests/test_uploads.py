@@ -0,0 +1,130 @@
+import hashlib
+import io
+import os
+import time
+
+import pytest
+
+from backend.database.models import db, InferenceEngine
+from backend.services import uploads
+from backend.services.uploads import create_upload, append_chunk, get_upload
+
+
+def _post_engine(client, headers, content, filename='modelo.pt', tipo='yolov8', version='9'):
+    return client.post('/api/admin/inference-engines', headers=headers, content_type='multipart/form-data', data={
+        'tipo': tipo, 'version': version, 'archivo': (io.BytesIO(content), filename)
+    })
+
+
+def _partial_files(app):
+    folder = os.path.join(app.config['UPLOAD_FOLDER'], '.partial')
+    return os.listdir(folder) if os.path.isdir(folder) else []
+
+
+def test_multipart_upload_is_hashed_and_deduplicated(app, client, auth_headers):
+    content = os.urandom(3 * 1024 * 1024 + 17)
+    response = _post_engine(client, auth_headers, content)
+    assert response.status_code == 201
+    engine = response.get_json()['data']
+    assert db.session.get(InferenceEngine, engine['id']).hash_archivo == hashlib.sha256(content).hexdigest()
+    with open(os.path.join(app.config['UPLOAD_FOLDER'], engine['ruta_archivo']), 'rb') as f:
+        assert f.read() == content
+
+    again = _post_engine(client, auth_headers, content, version='10')
+    assert again.status_code == 200
+    assert again.get_json()['data']['id'] == engine['id']
+    assert not [name for name in _partial_files(app) if name.endswith('.tmp')]
+
+
+def test_multipart_upload_rejects_bad_filename_without_leftovers(app, client, auth_headers):
+    response = _post_engine(client, auth_headers, b'x' * 100, filename='modelo.exe')
+    assert response.status_code == 400
+    assert not [name for name in _partial_files(app) if name.endswith('.tmp')]
+
+
+def test_multipart_upload_without_file_returns_400(client, auth_headers):
+    response = client.post('/api/admin/inference-engines', headers=auth_headers,
+                           content_type='multipart/form-data', data={'tipo': 'yolov8', 'version': '1'})
+    assert response.status_code == 400
+
+
+def _age(path, seconds):
+    old = time.time() - seconds
+    os.utime(path, (old, old))
+
+
+def test_purge_uses_data_file_activity_and_drops_hashers(app):
+    active = create_upload({'filename': 'a.pt', 'size': 8, 'tipo': 'yolov8', 'version': '1'})
+    append_chunk(active, 0, io.BytesIO(b'abcd'))
+    abandoned = create_upload({'filename': 'b.pt', 'size': 8, 'tipo': 'yolov8', 'version': '1'})
+    append_chunk(abandoned, 0, io.BytesIO(b'abcd'))
+    assert active in uploads._hashers and abandoned in uploads._hashers
+
+    stale = uploads.STALE_UPLOAD_SECONDS + 60
+    # Metadatos viejos pero con partes recientes: la subida sigue activa
+    _age(uploads._paths(active)[0], stale)
+    for path in uploads._paths(abandoned):
+        _age(path, stale)
+
+    create_upload({'filename': 'c.pt', 'size': 8, 'tipo': 'yolov8', 'version': '1'})
+
+    assert get_upload(active)['offset'] == 4
+    assert get_upload(abandoned) is None
+    assert not any(os.path.exists(path) for path in uploads._paths(abandoned))
+    assert abandoned not in uploads._hashers
+    assert append_chunk(active, 4, io.BytesIO(b'efgh')) == 8
+
+
+def _start(client, headers, content, **extra):
+    body = {'filename': 'grande.pt', 'size': len(content), 'tipo': 'yolov8', 'version': '3', **extra}
+    return client.post('/api/admin/inference-engines/uploads', json=body, headers=headers)
+
+
+def _put_chunk(client, headers, upload_id, offset, data):
+    return client.put(f'/api/admin/inference-engines/uploads/{upload_id}?offset={offset}', data=data, headers=headers)
+
+
+def test_chunked_upload_resumes_and_deduplicates(app, client, auth_headers):
+    content = os.urandom(2500)
+    upload_id = _start(client, auth_headers, content).get_json()['upload_id']
+
+    assert _put_chunk(client, auth_headers, upload_id, 0, content[:1000]).get_json()['offset'] == 1000
+    # Parte repetida (reintento tras un corte): 409 con el offset real
+    repeated = _put_chunk(client, auth_headers, upload_id, 0, content[:1000])
+    assert repeated.status_code == 409 and repeated.get_json()['offset'] == 1000
+    # Completar antes de tiempo tampoco se acepta
+    assert client.post(f'/api/admin/inference-engines/uploads/{upload_id}/complete',
+                       headers=auth_headers).status_code == 409
+    status = client.get(f'/api/admin/inference-engines/uploads/{upload_id}', headers=auth_headers).get_json()
+    assert _put_chunk(client, auth_headers, upload_id, status['offset'], content[1000:]).get_json()['offset'] == 2500
+
+    done = client.post(f'/api/admin/inference-engines/uploads/{upload_id}/complete', headers=auth_headers)
+    assert done.status_code == 201
+    engine_id = done.get_json()['data']['id']
+    assert db.session.get(InferenceEngine, engine_id).hash_archivo == hashlib.sha256(content).hexdigest()
+    # Un segundo 'complete' (carrera entre workers) no crea otro motor
+    assert client.post(f'/api/admin/inference-engines/uploads/{upload_id}/complete',
+                       headers=auth_headers).status_code == 400
+
+    # Con el hash conocido ni siquiera se sube
+    again = _start(client, auth_headers, content, sha256=hashlib.sha256(content).hexdigest())
+    assert again.status_code == 200 and again.get_json()['data']['id'] == engine_id
+
+
+def test_chunked_upload_rejects_extra_bytes_and_bad_hash(client, auth_headers):
+    content = b'modelo' * 10
+    upload_id = _start(client, auth_headers, content).get_json()['upload_id']
+    assert _put_chunk(client, auth_headers, upload_id, 0, content + b'x').status_code == 400
+    assert _put_chunk(client, auth_headers, upload_id, 0, content).get_json()['offset'] == len(content)
+
+    wrong = _start(client, auth_headers, content, sha256='0' * 64).get_json()['upload_id']
+    _put_chunk(client, auth_headers, wrong, 0, content)
+    assert client.post(f'/api/admin/inference-engines/uploads/{wrong}/complete',
+                       headers=auth_headers).status_code == 400
+    assert client.get(f'/api/admin/inference-engines/uploads/{wrong}', headers=auth_headers).status_code == 404
+
+
+@pytest.mark.parametrize('size', [None, 'abc', 0, -5])
+def test_chunked_upload_requires_a_valid_size(client, auth_headers, size):
+    body = {'filename': 'm.pt', 'size': size, 'tipo': 'yolov8', 'version': '1'}
+    assert client.post('/api/admin/inference-engines/uploads', json=body, headers=auth_headers).status_code == 400